@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""Benchmark the OCR pipeline stages on synthetic documents.
+
+The ``ocr`` package does not import Odoo, so this runs with a plain Python
+interpreter that has the module's external dependencies installed::
+
+    python benchmarks/run.py                         # every scenario
+    python benchmarks/run.py -s grid_20x6_300dpi -r 5
+    python benchmarks/run.py --no-ocr                # OpenCV stages only
+    python benchmarks/run.py --save opencv-4.10      # record a baseline
+    python benchmarks/run.py --compare opencv-4.10   # compare against it
+
+Each scenario runs in a fresh worker process, so its peak memory is not
+hidden by the scenarios before it. Baselines are JSON files in
+``benchmarks/baselines``; they also record the library versions and the
+machine they were made on, only compare baselines from the same machine.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_DIR = os.path.join(BENCHMARK_DIR, 'baselines')
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+import pytesseract  # noqa: E402
+
+from ocr import pipeline  # noqa: E402
+from ocr.engine import get_engine  # noqa: E402
+from ocr.metrics import current_rss_mb  # noqa: E402
+from synthetic import SCENARIOS, make_document  # noqa: E402
+
+# Fixed pipeline options (the defaults of ocr.job._get_ocr_options), kept
+# here so that changing a server default does not silently move the numbers.
+OPTIONS = {
+    'ocr_engine': 'auto',
+    'lang': 'eng',
+    'text_config': '',
+    'cell_config': '--psm 6',
+    'threshold': 150,
+    'memory_budget_mb': 512,
+    'cell_workers': 1,
+    'cell_timeout': 300,
+    'cell_max_documents': 1,
+    'grid_ocr_mode': 'page',
+    'grid_page_config': '--psm 11',
+    'grid_page_text': 'cells',
+    'cell_blank_ratio': 0.0005,
+    'cell_dedup': True,
+    'cell_cache_size': 0,
+    'grid_fast_path': True,
+    'grid_fast_max_side': 1000,
+    'max_pixels': 50000000,
+    'max_rss_mb': 0,
+    'tile_min_pixels': 16000000,
+    'tile_height': 2048,
+    'tile_overlap': 128,
+    'output_format': 'xlsx',
+}
+
+# Stages recorded by ocr.metrics in run_page (in the order they run), then
+# the output file. A stage only appears in the runs which went through it.
+STAGES = ('decode', 'threshold', 'morphology', 'grid_fast', 'hough', 'contours', 'template_match', 'zone_ocr',
+          'cell_ocr', 'page_ocr', 'write')
+
+# A stage is only reported as slower past this ratio and this many seconds
+# (MB for the peak memory), smaller differences are mostly noise.
+DEFAULT_THRESHOLD = 0.2
+MIN_DELTA = 0.005
+MIN_RSS_DELTA = 32
+
+
+def run_document(document, options, ocr=True):
+    """Run a document through ``pipeline.run_page`` and ``write_pages``, as the job workers do.
+
+    The stage times are the ones the pipeline records itself, so they
+    follow the stages production actually runs. Without ``ocr`` the 'none'
+    engine recognises nothing and only the image stages are left.
+    """
+    if not ocr:
+        options = dict(options, ocr_engine='none')
+    page = pipeline.run_page(document.source, 0, options)
+    timings = dict(page['metrics']['stages'])
+
+    start = time.perf_counter()
+    output_path = pipeline.write_pages([page], options)
+    timings['write'] = time.perf_counter() - start
+    os.unlink(output_path)
+
+    return timings, {
+        'has_grid_lines': page['has_grid_lines'],
+        'raw_text': page['raw_text'],
+        'table': page['table'],
+        'cell_count': page['metrics']['counts'].get('cells', 0),
+    }
+
+
+def score(document, result, ocr=True):
+    """Quality of a result against the text drawn on the document"""
+    scores = {'grid_correct': result['has_grid_lines'] == document.has_grid}
+    if document.kind == 'grid':
+        expected_cells = [_normalize(text) for row in document.expected for text in row]
+        scores['cells_found'] = result['cell_count'] / float(len(expected_cells))
+        if ocr:
+            found = [_normalize(text) for row in result['table'] or [] for text in row]
+            matches = sum(1 for expected, text in zip(expected_cells, found) if expected == text)
+            scores['cell_accuracy'] = matches / float(len(expected_cells))
+    elif ocr:
+        expected_words = Counter(_normalize(document.expected).split())
+        found_words = Counter(_normalize(result['raw_text']).split())
+        scores['word_recall'] = sum((expected_words & found_words).values()) / float(sum(expected_words.values()))
+    return scores
+
+
+def _normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def run_scenario(document, options, repeat, warmup, ocr):
+    """Executed in a fresh process: time ``repeat`` runs of one document"""
+    rss_start = current_rss_mb()
+    for _i in range(warmup):
+        run_document(document, options, ocr)
+
+    runs = []
+    result = None
+    for _i in range(repeat):
+        timings, result = run_document(document, options, ocr)
+        runs.append(timings)
+    # ru_maxrss is in KB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+    stages = {}
+    # A stage added to the pipeline is reported before it is listed in STAGES
+    recorded = set().union(*runs)
+    for stage in [stage for stage in STAGES if stage in recorded] + sorted(recorded - set(STAGES)):
+        values = [timings[stage] for timings in runs if stage in timings]
+        if values:
+            stages[stage] = {'median': statistics.median(values), 'min': min(values), 'max': max(values)}
+    totals = [sum(timings.values()) for timings in runs]
+    total = statistics.median(totals)
+    return {
+        'size': f"{document.width}x{document.height}",
+        'stages': stages,
+        'total': total,
+        'throughput': 60.0 / total if total else 0.0,
+        'peak_rss_mb': peak_rss,
+        'peak_delta_mb': max(0.0, peak_rss - rss_start),
+        'scores': score(document, result, ocr),
+    }
+
+
+def run(scenarios, repeat=3, warmup=1, ocr=True, seed=0, options=None):
+    options = dict(OPTIONS, **(options or {}))
+    results = {}
+    for scenario in scenarios:
+        document = make_document(scenario, seed=seed)
+        # One process per scenario; fork like the job runner's pool does
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('fork')) as executor:
+            results[scenario.name] = executor.submit(
+                run_scenario, document, options, repeat, warmup, ocr).result()
+        print_result(scenario.name, results[scenario.name])
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(options),
+        'options': options,
+        'repeat': repeat,
+        'seed': seed,
+        'ocr': ocr,
+        'results': results,
+    }
+
+
+def environment(options):
+    try:
+        tesseract = str(pytesseract.get_tesseract_version())
+    except Exception:
+        tesseract = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'opencv_threads': cv2.getNumThreads(),
+        'numpy': np.__version__,
+        'tesseract': tesseract,
+        'engine': get_engine(options).name,
+    }
+
+
+def print_result(name, result):
+    stages = ' '.join(
+        f"{stage}={timing['median'] * 1000:.1f}ms" for stage, timing in result['stages'].items())
+    scores = ' '.join(
+        f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+        for key, value in sorted(result['scores'].items()))
+    print(f"{name:<28} {result['size']:>10} total={result['total'] * 1000:.1f}ms "
+          f"{result['throughput']:.1f} docs/min peak={result['peak_rss_mb']:.0f}MB "
+          f"(+{result['peak_delta_mb']:.0f}MB)")
+    print(f"    {stages}")
+    print(f"    {scores}")
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """Print the changes against a baseline report, return the regressions"""
+    for key in ('engine', 'opencv', 'numpy', 'tesseract', 'python', 'machine'):
+        before, after = baseline['environment'].get(key), report['environment'].get(key)
+        if before != after:
+            print(f"{key}: {before} -> {after}")
+    if baseline.get('ocr') != report['ocr'] or baseline.get('options') != report['options']:
+        print("warning: the baseline was recorded with other options, timings are not comparable")
+
+    regressions = []
+    for name, result in report['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None:
+            continue
+        changes = []
+        for stage in list(result['stages']) + ['total']:
+            if stage == 'total':
+                before, after = reference['total'], result['total']
+            elif stage in reference['stages'] and stage in result['stages']:
+                before, after = reference['stages'][stage]['median'], result['stages'][stage]['median']
+            else:
+                continue
+            ratio = after / before if before else 1.0
+            changes.append(f"{stage} {ratio:.2f}x")
+            if ratio > 1 + threshold and after - before > MIN_DELTA:
+                regressions.append(f"{name}: {stage} {before * 1000:.1f}ms -> {after * 1000:.1f}ms")
+        before, after = reference['peak_delta_mb'], result['peak_delta_mb']
+        if after > before * (1 + threshold) and after - before > MIN_RSS_DELTA:
+            regressions.append(f"{name}: peak memory +{before:.0f}MB -> +{after:.0f}MB")
+        for key, value in result['scores'].items():
+            previous = reference['scores'].get(key)
+            if previous is not None and value < previous:
+                regressions.append(f"{name}: {key} {previous} -> {value}")
+        print(f"{name:<28} {' '.join(changes)}")
+
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return regressions
+
+
+def baseline_path(name):
+    return name if name.endswith('.json') else os.path.join(BASELINE_DIR, name + '.json')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the OCR pipeline on synthetic documents.")
+    parser.add_argument('-s', '--scenario', action='append', choices=[scenario.name for scenario in SCENARIOS],
+                        help="Scenario to run, can be repeated (default: all)")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="Timed runs per scenario (default: 3)")
+    parser.add_argument('--warmup', type=int, default=1, help="Untimed runs per scenario (default: 1)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic documents (default: 0)")
+    parser.add_argument('--no-ocr', action='store_true', help="Skip the tesseract stages")
+    parser.add_argument('--engine', choices=('auto', 'tesserocr', 'pytesseract'),
+                        help="Override the ocr_engine option")
+    parser.add_argument('--grid-page-text', choices=('cells', 'ocr'), help="Override the grid_page_text option")
+    parser.add_argument('--grid-ocr-mode', choices=('page', 'cell'), help="Override the grid_ocr_mode option")
+    parser.add_argument('--save', metavar='NAME', help="Save the report as the baseline NAME")
+    parser.add_argument('--compare', metavar='NAME', help="Compare the report with the baseline NAME")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Slowdown ratio reported as a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    scenarios = [scenario for scenario in SCENARIOS if not args.scenario or scenario.name in args.scenario]
+    options = {}
+    if args.engine:
+        options['ocr_engine'] = args.engine
+    if args.grid_ocr_mode:
+        options['grid_ocr_mode'] = args.grid_ocr_mode
+    if args.grid_page_text:
+        options['grid_page_text'] = args.grid_page_text
+    report = run(scenarios, repeat=args.repeat, warmup=args.warmup, ocr=not args.no_ocr,
+                 seed=args.seed, options=options)
+
+    regressions = []
+    if args.compare:
+        with open(baseline_path(args.compare)) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.threshold)
+    if args.save:
+        path = baseline_path(args.save)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as baseline_file:
+            json.dump(report, baseline_file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {path}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
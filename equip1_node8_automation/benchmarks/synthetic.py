@@ -0,0 +1,132 @@
+"""Synthetic documents for the OCR benchmarks.
+
+Every document is drawn with OpenCV primitives from a seeded random
+generator, so a scenario always produces the same pixels and the same
+expected text, whatever the machine.
+"""
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# A4 at the usual scanning resolutions, in pixels (width, height)
+A4 = {
+    150: (1240, 1754),
+    300: (2480, 3508),
+    600: (4960, 7016),
+}
+
+WORDS = (
+    'invoice', 'total', 'amount', 'customer', 'product', 'quantity', 'price',
+    'delivery', 'order', 'tax', 'discount', 'payment', 'date', 'reference',
+    'warehouse', 'supplier', 'unit', 'balance', 'account', 'note',
+)
+
+Scenario = namedtuple('Scenario', 'name kind dpi rows cols lines noise blank_ratio')
+Document = namedtuple('Document', 'name kind source expected has_grid width height')
+
+SCENARIOS = (
+    Scenario('grid_5x4_150dpi', 'grid', 150, rows=5, cols=4, lines=0, noise=0.0, blank_ratio=0.0),
+    Scenario('grid_20x6_300dpi', 'grid', 300, rows=20, cols=6, lines=0, noise=0.0, blank_ratio=0.0),
+    Scenario('grid_20x6_300dpi_noisy', 'grid', 300, rows=20, cols=6, lines=0, noise=0.01, blank_ratio=0.0),
+    Scenario('grid_40x10_300dpi_sparse', 'grid', 300, rows=40, cols=10, lines=0, noise=0.0, blank_ratio=0.6),
+    Scenario('grid_60x12_600dpi', 'grid', 600, rows=60, cols=12, lines=0, noise=0.005, blank_ratio=0.2),
+    Scenario('text_20_lines_150dpi', 'text', 150, rows=0, cols=0, lines=20, noise=0.0, blank_ratio=0.0),
+    Scenario('text_40_lines_300dpi', 'text', 300, rows=0, cols=0, lines=40, noise=0.0, blank_ratio=0.0),
+    Scenario('text_40_lines_300dpi_noisy', 'text', 300, rows=0, cols=0, lines=40, noise=0.02, blank_ratio=0.0),
+)
+
+
+def make_document(scenario, seed=0, image_format='.png'):
+    """Draw the document of a scenario and encode it like an uploaded file"""
+    rng = np.random.default_rng(seed)
+    width, height = A4[scenario.dpi]
+    scale = scenario.dpi / 150.0
+    image = np.full((height, width, 3), 255, np.uint8)
+
+    if scenario.kind == 'grid':
+        expected = _draw_grid(image, rng, scenario, scale)
+    else:
+        expected = _draw_text(image, rng, scenario, scale)
+    if scenario.noise:
+        _add_noise(image, rng, scenario.noise)
+
+    ok, encoded = cv2.imencode(image_format, image)
+    if not ok:
+        raise ValueError(f"Unable to encode the document as {image_format}")
+    return Document(scenario.name, scenario.kind, encoded.tobytes(), expected,
+                    scenario.kind == 'grid', width, height)
+
+
+def _random_text(rng, max_words):
+    words = [WORDS[i] for i in rng.integers(0, len(WORDS), rng.integers(1, max_words + 1))]
+    if rng.random() < 0.3:
+        words.append(str(rng.integers(1, 100000)))
+    return ' '.join(words)
+
+
+def _draw_grid(image, rng, scenario, scale):
+    """Draw a rows x cols bordered table, return the expected cell texts by row"""
+    height, width = image.shape[:2]
+    margin = int(60 * scale)
+    thickness = max(1, int(round(2 * scale)))
+    font_scale = 0.5 * scale
+    col_width = (width - 2 * margin) // scenario.cols
+    # Leave the bottom of the page empty on short tables
+    row_height = min((height - 2 * margin) // scenario.rows, int(60 * scale))
+
+    top, left = margin, margin
+    bottom = top + row_height * scenario.rows
+    right = left + col_width * scenario.cols
+    for row in range(scenario.rows + 1):
+        y = top + row * row_height
+        cv2.line(image, (left, y), (right, y), (0, 0, 0), thickness)
+    for col in range(scenario.cols + 1):
+        x = left + col * col_width
+        cv2.line(image, (x, top), (x, bottom), (0, 0, 0), thickness)
+
+    expected = []
+    for row in range(scenario.rows):
+        texts = []
+        for col in range(scenario.cols):
+            text = '' if rng.random() < scenario.blank_ratio else _fit_text(
+                _random_text(rng, 2), col_width - int(16 * scale), font_scale)
+            if text:
+                origin = (left + col * col_width + int(8 * scale), top + row * row_height + int(row_height * 0.65))
+                cv2.putText(image, text, origin, cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0),
+                            max(1, int(round(scale))), cv2.LINE_AA)
+            texts.append(text)
+        expected.append(texts)
+    return expected
+
+
+def _draw_text(image, rng, scenario, scale):
+    """Draw lines of running text, return the expected text"""
+    height, width = image.shape[:2]
+    margin = int(60 * scale)
+    font_scale = 0.7 * scale
+    line_height = min((height - 2 * margin) // scenario.lines, int(40 * scale))
+    lines = []
+    for line in range(scenario.lines):
+        text = _fit_text(_random_text(rng, 8), width - 2 * margin, font_scale)
+        cv2.putText(image, text, (margin, margin + (line + 1) * line_height), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, (0, 0, 0), max(1, int(round(scale))), cv2.LINE_AA)
+        lines.append(text)
+    return '\n'.join(lines)
+
+
+def _fit_text(text, max_width, font_scale):
+    """Drop trailing words until the text fits in ``max_width`` pixels"""
+    words = text.split()
+    while len(words) > 1 and cv2.getTextSize(' '.join(words), cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1)[0][0] > max_width:
+        words.pop()
+    return ' '.join(words)
+
+
+def _add_noise(image, rng, density):
+    """Salt and pepper noise over ``density`` of the pixels"""
+    height, width = image.shape[:2]
+    count = int(height * width * density)
+    ys = rng.integers(0, height, count)
+    xs = rng.integers(0, width, count)
+    image[ys, xs] = np.where(rng.random(count) < 0.5, 0, 255)[:, None].astype(np.uint8)
@@ -1,21 +1,268 @@
-# from odoo import http
+import base64
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
 
+from psycopg2 import IntegrityError
 
-# class Equip1Node8Automation(http.Controller):
-#     @http.route('/equip1_node8_automation/equip1_node8_automation', auth='public')
-#     def index(self, **kw):
-#         return "Hello, world"
+from odoo import api, fields, http
+from odoo.http import request
 
-#     @http.route('/equip1_node8_automation/equip1_node8_automation/objects', auth='public')
-#     def list(self, **kw):
-#         return http.request.render('equip1_node8_automation.listing', {
-#             'root': '/equip1_node8_automation/equip1_node8_automation',
-#             'objects': http.request.env['equip1_node8_automation.equip1_node8_automation'].search([]),
-#         })
+from ..wizard.ocr_batch_import import IMPORT_EXTENSIONS
 
-#     @http.route('/equip1_node8_automation/equip1_node8_automation/objects/<model("equip1_node8_automation.equip1_node8_automation"):obj>', auth='public')
-#     def object(self, obj, **kw):
-#         return http.request.render('equip1_node8_automation.object', {
-#             'object': obj
-#         })
+API_PREFIX = '/ocr/api/v1'
+# Seconds between two looks at the documents while streaming results, each
+# with a cursor of its own
+POLL_INTERVAL = 2.0
+# A stream holds an HTTP worker for this long at most, see stream_results
+MAX_STREAM_TIMEOUT = 30
+# Bytes of the output file base64 encoded at a time for inline_output,
+# a multiple of 3 so that the encoded chunks can be concatenated
+OUTPUT_CHUNK_SIZE = 3 * 64 * 1024
+NOT_QUEUED_ERROR = "The document was not queued for processing: its file could not be stored."
 
+
+class OcrApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class OcrApiController(http.Controller):
+    """Batch OCR for automation pipelines (n8n), authenticated by API key.
+
+    Documents are uploaded in one call and processed by the job queue; their
+    results are then streamed back as they complete. Every route takes the
+    key of a user as ``Authorization: Bearer <key>``.
+    """
+
+    @http.route(f'{API_PREFIX}/documents', type='http', auth='bearer', methods=['POST'], csrf=False)
+    def upload_documents(self, **kwargs):
+        """Queue the uploaded images and return their job ids.
+
+        The images are sent as the ``files`` fields of a multipart form or,
+        for a single image, as the raw request body (possibly chunked) with
+        its name in the ``filename`` parameter. A retry carrying the same
+        ``Idempotency-Key`` header returns the jobs of the first call
+        instead of processing the images again.
+        """
+        key = request.httprequest.headers.get('Idempotency-Key')
+        Batch = request.env['ocr.batch']
+        if key:
+            batch = Batch.search([('idempotency_key', '=', key), ('create_uid', '=', request.env.uid)], limit=1)
+            if batch:
+                status = 422 if self._has_unqueued(batch.document_ids) else 200
+                return self._batch_response(batch, replayed=True, status=status)
+
+        tmp_dir = tempfile.mkdtemp(prefix='ocr_upload_')
+        try:
+            priority = self._number_param(kwargs.get('priority'), 'priority', 20, int)
+            files = self._receive_files(tmp_dir, kwargs)
+            try:
+                with request.env.cr.savepoint():
+                    batch = Batch.create({
+                        'name': kwargs.get('batch_name') or f"API {fields.Datetime.to_string(fields.Datetime.now())}",
+                        'idempotency_key': key or False,
+                    })
+            except IntegrityError:
+                # A concurrent retry with the same key won the race; its batch
+                # is not visible in this transaction yet
+                raise OcrApiError("A request with this Idempotency-Key is already being processed.", status=409)
+            documents = request.env['ocr.document']._create_from_files(files, batch)
+        except OcrApiError as e:
+            return request.make_json_response({'error': str(e)}, status=e.status)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        documents.with_context(ocr_job_priority=priority).action_process_document()
+        if self._has_unqueued(documents):
+            # Neither queued nor filled in from the cache: nothing would ever
+            # be processed, the caller has to know now rather than by polling
+            return self._batch_response(batch, status=422)
+        return self._batch_response(batch, status=202)
+
+    @http.route(f'{API_PREFIX}/results', type='http', auth='bearer', methods=['GET'])
+    def stream_results(self, jobs=None, batch=None, timeout=None, inline_output=None, **kwargs):
+        """Stream the results of the ``jobs`` (comma separated ids) or of a ``batch``.
+
+        One JSON line (NDJSON) is sent per document as soon as it is
+        processed. The last line tells whether all of them were, or which
+        ones are still pending when ``timeout`` seconds elapsed, to be asked
+        for again. With ``inline_output`` the output file is included
+        base64 encoded instead of being linked.
+
+        The stream keeps its HTTP worker busy until it ends, so ``timeout``
+        is capped at MAX_STREAM_TIMEOUT seconds: in the prefork server
+        every waiting client holds one of the ``--workers``. Pipelines
+        waiting on large batches ask again with the pending ids, or are
+        routed to a threaded or gevent server which does not hold a process
+        per stream.
+        """
+        try:
+            documents = self._find_documents(jobs, batch)
+            timeout = self._number_param(timeout, 'timeout', MAX_STREAM_TIMEOUT, float)
+        except OcrApiError as e:
+            return request.make_json_response({'error': str(e)}, status=e.status)
+        timeout = min(max(timeout, 0.0), MAX_STREAM_TIMEOUT)
+        stream = self._results_stream(
+            request.env.registry, request.env.uid, dict(request.env.context),
+            documents.ids, timeout, bool(inline_output))
+        return request.make_response(stream, headers=[
+            ('Content-Type', 'application/x-ndjson'),
+            ('Cache-Control', 'no-cache'),
+            # Do not let a proxy hold the lines back
+            ('X-Accel-Buffering', 'no'),
+        ])
+
+    @http.route(f'{API_PREFIX}/documents/<int:document_id>/output', type='http', auth='bearer', methods=['GET'])
+    def download_output(self, document_id, **kwargs):
+        """The xlsx (or csv) file generated for a document"""
+        document = request.env['ocr.document'].browse(document_id).exists()
+        if not document or not document.excel_filename:
+            return request.make_json_response({'error': "No output file for this document."}, status=404)
+        stream = request.env['ir.binary']._get_stream_from(document, 'excel_file', filename=document.excel_filename)
+        return stream.get_response(as_attachment=True)
+
+    def _receive_files(self, tmp_dir, params):
+        """Save the uploaded files in ``tmp_dir`` and return them as ``(filename, path)``"""
+        ICP = request.env['ir.config_parameter'].sudo()
+        max_files = int(ICP.get_param('ocr.batch_max_files', 1000))
+        max_file_size = int(ICP.get_param('ocr.batch_max_file_mb', 50)) * 1024 * 1024
+
+        httprequest = request.httprequest
+        if httprequest.mimetype == 'multipart/form-data':
+            # Werkzeug spools the parts of the form to temporary files
+            uploads = [(upload.filename, upload.stream) for upload in httprequest.files.getlist('files')]
+        else:
+            uploads = [(params.get('filename') or httprequest.headers.get('X-Filename'), httprequest.stream)]
+        uploads = [(os.path.basename(filename or ''), stream) for filename, stream in uploads]
+        if not uploads or not uploads[0][0]:
+            raise OcrApiError("No file uploaded: send 'files' form fields, or a body with a 'filename' parameter.")
+        if len(uploads) > max_files:
+            raise OcrApiError(f"More than {max_files} files in one request.", status=413)
+
+        files = []
+        for index, (filename, stream) in enumerate(uploads):
+            if not filename.lower().endswith(IMPORT_EXTENSIONS):
+                raise OcrApiError(f"{filename}: not an image or PDF.")
+            path = os.path.join(tmp_dir, f"{index}_{filename}")
+            size = 0
+            with open(path, 'wb') as target:
+                for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+                    size += len(chunk)
+                    if size > max_file_size:
+                        raise OcrApiError(f"{filename}: larger than {max_file_size // (1024 * 1024)} MB.", status=413)
+                    target.write(chunk)
+            if not size:
+                raise OcrApiError(f"{filename}: empty file.")
+            files.append((filename, path))
+        return files
+
+    @staticmethod
+    def _number_param(value, name, default, convert):
+        """Parameter ``name`` converted by ``convert`` (int or float), 400 if it is not a number"""
+        if value in (None, ''):
+            return default
+        try:
+            number = convert(value)
+        except (TypeError, ValueError):
+            number = None
+        if number is None or not math.isfinite(number):
+            raise OcrApiError(f"'{name}' must be a number.")
+        return number
+
+    def _find_documents(self, jobs, batch):
+        try:
+            if jobs:
+                job_ids = [int(job_id) for job_id in jobs.split(',') if job_id.strip()]
+                documents = request.env['ocr.job'].browse(job_ids).exists().document_id
+            elif batch:
+                documents = request.env['ocr.batch'].browse(int(batch)).exists().document_ids
+            else:
+                raise OcrApiError("Give the 'jobs' or the 'batch' to return the results of.")
+        except ValueError:
+            raise OcrApiError("'jobs' must be comma separated ids and 'batch' an id.")
+        if not documents:
+            raise OcrApiError("No document found.", status=404)
+        documents.check_access('read')
+        return documents
+
+    @staticmethod
+    def _has_unqueued(documents):
+        return any(document.ocr_state == 'draft' for document in documents)
+
+    def _batch_response(self, batch, replayed=False, status=200):
+        return request.make_json_response({
+            'batch_id': batch.id,
+            'replayed': replayed,
+            'documents': [{
+                'document_id': document.id,
+                'name': document.name,
+                'job_id': document.job_ids[:1].id or None,
+                'state': document.ocr_state,
+                'error': NOT_QUEUED_ERROR if document.ocr_state == 'draft' else None,
+            } for document in batch.document_ids.sorted('id')],
+        }, status=status)
+
+    @staticmethod
+    def _results_stream(registry, uid, context, document_ids, timeout, inline_output):
+        """Generator of the NDJSON lines, run after the request cursor is closed"""
+        deadline = time.monotonic() + timeout
+        pending = list(document_ids)
+        while True:
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                documents = env['ocr.document'].browse(pending).exists()
+                # Draft documents were never queued, they would not complete either
+                for document in documents.filtered(lambda d: d.ocr_state in ('done', 'failed', 'draft')):
+                    pending.remove(document.id)
+                    yield from OcrApiController._result_line(document, inline_output)
+                pending = [document_id for document_id in pending if document_id in documents.ids]
+            if not pending or time.monotonic() >= deadline:
+                break
+            time.sleep(POLL_INTERVAL)
+        yield json.dumps({'complete': not pending, 'pending_document_ids': pending}) + '\n'
+
+    @staticmethod
+    def _document_result(document):
+        job = document.job_ids[:1]
+        result = {
+            'document_id': document.id,
+            'job_id': job.id or None,
+            'name': document.name,
+            'state': document.ocr_state,
+            'error': job.error or (NOT_QUEUED_ERROR if document.ocr_state == 'draft' else None),
+            'raw_text': document.raw_text or '',
+            'has_grid_lines': document.has_grid_lines,
+            'page_count': document.page_count,
+            'template': document.template_id.name or None,
+            'fields': {field.name: field.value for field in document.field_ids},
+            'output_filename': document.excel_filename or None,
+            'output_url': f'{API_PREFIX}/documents/{document.id}/output' if document.excel_filename else None,
+        }
+        return result
+
+    @staticmethod
+    def _result_line(document, inline_output):
+        """The NDJSON line of a document, in parts.
+
+        The inline output is read from the filestore and base64 encoded
+        chunk by chunk into the line, never held in memory as a whole.
+        """
+        result = OcrApiController._document_result(document)
+        attachment = inline_output and document.excel_filename and document._get_output_attachment()
+        if not attachment:
+            yield json.dumps(result) + '\n'
+            return
+        # The base64 alphabet needs no escaping in a JSON string
+        yield json.dumps(result)[:-1] + ', "output": "'
+        if attachment.store_fname:
+            with open(attachment._full_path(attachment.store_fname), 'rb') as output:
+                for chunk in iter(lambda: output.read(OUTPUT_CHUNK_SIZE), b''):
+                    yield base64.b64encode(chunk).decode()
+        else:
+            yield base64.b64encode(attachment.raw).decode()
+        yield '"}\n'
@@ -0,0 +1,150 @@
+import fcntl
+import json
+import mimetypes
+import os
+import re
+import uuid
+
+from odoo import http, _
+from odoo.exceptions import UserError
+from odoo.http import request
+
+# Long side of an A4 page, the captures are scaled to it at the target DPI
+PAGE_LONG_SIDE_INCHES = 11.7
+UPLOAD_ID = re.compile(r'[0-9a-f]{32}')
+
+
+class OcrChunkedUploadController(http.Controller):
+    """Resumable upload of camera captures, in chunks of raw bytes.
+
+    The chunks are appended to a file of the upload directory, which is
+    moved as it is into the attachment store once complete: the image is
+    never held in memory nor base64 encoded on the server.
+    """
+
+    @http.route('/ocr/upload/config', type='json', auth='user')
+    def upload_config(self):
+        ICP = request.env['ir.config_parameter'].sudo()
+        dpi = int(ICP.get_param('ocr.capture_target_dpi', 200))
+        return {
+            'max_side': round(PAGE_LONG_SIDE_INCHES * dpi),
+            'chunk_size': int(ICP.get_param('ocr.upload_chunk_kb', 512)) * 1024,
+        }
+
+    @http.route('/ocr/upload/start', type='json', auth='user')
+    def upload_start(self, res_id, filename, size):
+        document = request.env['ocr.document'].browse(int(res_id)).exists()
+        if not document:
+            raise UserError(_("The document does not exist anymore."))
+        document.check_access('write')
+        max_size = int(request.env['ir.config_parameter'].sudo().get_param('ocr.batch_max_file_mb', 50)) * 1024 * 1024
+        if not 0 < int(size) <= max_size:
+            raise UserError(_("Images must be smaller than %s MB.", max_size // (1024 * 1024)))
+
+        upload_id = uuid.uuid4().hex
+        path = self._upload_path(upload_id)
+        with open(path + '.json', 'w') as meta:
+            json.dump({
+                'uid': request.env.uid,
+                'res_id': document.id,
+                'filename': os.path.basename(filename),
+                'size': int(size),
+            }, meta)
+        open(path + '.part', 'wb').close()
+        return {'upload_id': upload_id}
+
+    @http.route('/ocr/upload/<string:upload_id>/chunk', type='http', auth='user', methods=['POST'])
+    def upload_chunk(self, upload_id, offset, **kwargs):
+        """Append the request body at ``offset``; answers the size received so far.
+
+        A chunk at another offset than the end of the file (a retry of a
+        chunk which arrived after all, or a concurrent one) is refused with
+        409 and the actual size, from which the client resumes.
+        """
+        meta = self._load_upload(upload_id)
+        if meta is None or meta.get('stored'):
+            return request.make_json_response({'error': "Unknown upload."}, status=404)
+        part = self._upload_path(upload_id) + '.part'
+        with open(part, 'ab') as target:
+            try:
+                fcntl.flock(target, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return request.make_json_response({'received': os.path.getsize(part)}, status=409)
+            received = target.tell()
+            if int(offset) != received:
+                return request.make_json_response({'received': received}, status=409)
+            stream = request.httprequest.stream
+            for chunk in iter(lambda: stream.read(64 * 1024), b''):
+                received += len(chunk)
+                if received > meta['size']:
+                    target.truncate(int(offset))
+                    return request.make_json_response({'error': "More data than announced."}, status=413)
+                target.write(chunk)
+        return request.make_json_response({'received': received})
+
+    @http.route('/ocr/upload/status', type='json', auth='user')
+    def upload_status(self, upload_id):
+        meta = self._load_upload(upload_id)
+        if meta is None:
+            raise UserError(_("Unknown upload."))
+        if meta.get('stored'):
+            return {'received': meta['size']}
+        return {'received': os.path.getsize(self._upload_path(upload_id) + '.part')}
+
+    @http.route('/ocr/upload/finish', type='json', auth='user')
+    def upload_finish(self, upload_id):
+        """Attach the complete upload as the image of its document.
+
+        The document forgets the OCR results of its previous image. Calls
+        are serialized by a lock on the upload metadata, which remembers
+        the file once it is in the store: a repeated call (a retry, or a
+        concurrent one) answers like the first one did, and attaches the
+        file again if the transaction of the first one was rolled back.
+        """
+        path = self._upload_path(upload_id)
+        if self._load_upload(upload_id) is None:
+            raise UserError(_("Unknown upload."))
+        with open(path + '.json', 'r+') as meta_file:
+            fcntl.flock(meta_file, fcntl.LOCK_EX)
+            meta = json.load(meta_file)
+            document = request.env['ocr.document'].browse(meta['res_id']).exists()
+            if not document:
+                raise UserError(_("The document does not exist anymore."))
+            document.check_access('write')
+
+            Attachment = request.env['ir.attachment']
+            stored = meta.get('stored')
+            if stored is None:
+                if not os.path.exists(path + '.part') or os.path.getsize(path + '.part') != meta['size']:
+                    raise UserError(_("The upload is not complete."))
+                stored = Attachment._ocr_store_file(path + '.part')
+                if 'raw' not in stored:
+                    # Kept until the uploads are garbage collected, for the retries
+                    meta['stored'] = stored
+                    meta_file.seek(0)
+                    meta_file.truncate()
+                    json.dump(meta, meta_file)
+                    meta_file.flush()
+            elif document._get_image_attachment().checksum == stored['checksum']:
+                return {'document_id': document.id}
+
+            document._reset_ocr()
+            filename = meta['filename']
+            mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            Attachment._ocr_set_field_file(document, 'image_file', stored, filename, mimetype)
+            document.image_filename = filename
+        return {'document_id': document.id}
+
+    def _upload_path(self, upload_id):
+        return os.path.join(request.env['ocr.document']._get_upload_dir(), upload_id)
+
+    def _load_upload(self, upload_id):
+        """Metadata of an upload of the current user, None if there is none"""
+        if not UPLOAD_ID.fullmatch(upload_id):
+            return None
+        try:
+            with open(self._upload_path(upload_id) + '.json') as meta_file:
+                meta = json.load(meta_file)
+        except FileNotFoundError:
+            return None
+        return meta if meta['uid'] == request.env.uid else None
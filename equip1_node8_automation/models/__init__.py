@@ -1 +1,10 @@
+from . import ir_attachment
 from . import models
+from . import ocr_batch
+from . import ocr_document_cell
+from . import ocr_document_field
+from . import ocr_job
+from . import ocr_result_cache
+from . import ocr_run_log
+from . import ocr_run_stats
+from . import ocr_template
@@ -0,0 +1,90 @@
+import hashlib
+import os
+import shutil
+
+from odoo import models, api
+
+# Location of a file in the store, see _ocr_store_file
+FILESTORE_FIELDS = ('store_fname', 'checksum', 'file_size')
+
+
+class IrAttachment(models.Model):
+    _inherit = 'ir.attachment'
+
+    @api.model
+    def _ocr_store_file(self, path):
+        """Move a finished file into the attachment store.
+
+        Returns the attachment values pointing to it, so the file content is
+        never loaded (or base64 encoded) in the Odoo worker. When attachments
+        are stored in the database the file is read once as ``raw``.
+        """
+        if self._storage() != 'file':
+            with open(path, 'rb') as output:
+                raw = output.read()
+            os.unlink(path)
+            return {'raw': raw}
+
+        sha = hashlib.sha1()
+        with open(path, 'rb') as output:
+            for chunk in iter(lambda: output.read(1024 * 1024), b''):
+                sha.update(chunk)
+        checksum = sha.hexdigest()
+        file_size = os.path.getsize(path)
+
+        fname, full_path = self._get_path(b'', checksum)
+        if os.path.exists(full_path):
+            os.unlink(path)
+        else:
+            shutil.move(path, full_path)
+            # Collected again if the transaction does not commit
+            self._mark_for_gc(fname)
+        return {
+            'store_fname': fname,
+            'checksum': checksum,
+            'file_size': file_size,
+        }
+
+    @api.model
+    def _ocr_set_field_file(self, record, field_name, values, filename, mimetype):
+        """Replace the attachment behind a binary ``attachment=True`` field.
+
+        ``values`` are either ``raw`` content or the location of a file
+        already in the store, as returned by ``_ocr_store_file``.
+        """
+        self.sudo().search([
+            ('res_model', '=', record._name),
+            ('res_field', '=', field_name),
+            ('res_id', '=', record.id),
+        ]).unlink()
+        values = dict(values)
+        stored = {key: values.pop(key) for key in FILESTORE_FIELDS if key in values}
+        attachment = self.sudo().create(dict(
+            values,
+            name=filename,
+            mimetype=mimetype,
+            res_model=record._name,
+            res_field=field_name,
+            res_id=record.id,
+        ))
+        if stored:
+            # create() drops these keys, they are only ever computed from the
+            # content it writes itself
+            self.env.cr.execute(
+                "UPDATE ir_attachment SET store_fname = %s, checksum = %s, file_size = %s WHERE id = %s",
+                (stored['store_fname'], stored['checksum'], stored['file_size'], attachment.id),
+            )
+            attachment.invalidate_recordset(list(FILESTORE_FIELDS) + ['raw', 'datas', 'db_datas'])
+        record.invalidate_recordset([field_name])
+        return attachment
+
+    def _ocr_file_values(self):
+        """Values pointing a new attachment to the same stored content"""
+        self.ensure_one()
+        if self.store_fname:
+            return {
+                'store_fname': self.store_fname,
+                'checksum': self.checksum,
+                'file_size': self.file_size,
+            }
+        return {'raw': self.raw}
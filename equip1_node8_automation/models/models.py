@@ -1,12 +1,10 @@
-import base64
-import io
-import pytesseract
-import numpy as np
-import cv2
-from PIL import Image
-from openpyxl import Workbook
-from openpyxl.styles import Border, Side
-from odoo import models, fields, api
+import mimetypes
+import os
+import time
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import config, split_every
 
 
 class OcrDocument(models.Model):
@@ -15,199 +13,219 @@ class OcrDocument(models.Model):
     _inherit = ['mail.thread']
 
     name = fields.Char(string='Document Name', required=True)
-    image_file = fields.Binary(string='Upload Image', required=True, attachment=True)
+    # Required in the form only: uploads through the API attach the stored
+    # file right after creating the document, see _create_from_files
+    image_file = fields.Binary(string='Upload Image', attachment=True,
+                               help="An image, a multi-page TIFF or a PDF; every page is processed.")
     image_filename = fields.Char(string='Image Filename')
-    raw_text = fields.Text(string='Extracted Text', readonly=True)
+    raw_text = fields.Text(string='Extracted Text', readonly=True,
+                           help="For tables, the text of the cells: a line per row, cells separated by tabs.")
     excel_file = fields.Binary(string='Generated Excel', readonly=True, attachment=True)
     excel_filename = fields.Char(string='Excel Filename')
     has_grid_lines = fields.Boolean(string='Has Grid Lines', default=False)
+    page_count = fields.Integer(string='Pages', readonly=True, copy=False)
+    image_is_paged = fields.Boolean(string='Multi-page File', compute='_compute_image_is_paged')
+    ocr_state = fields.Selection([
+        ('draft', 'Draft'),
+        ('queued', 'Queued'),
+        ('running', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='OCR Status', default='draft', required=True, readonly=True, copy=False, tracking=True)
+    job_ids = fields.One2many('ocr.job', 'document_id', string='OCR Jobs', readonly=True)
+    ocr_progress = fields.Float(string='Progress', compute='_compute_ocr_progress')
+    batch_id = fields.Many2one('ocr.batch', string='Batch', readonly=True, index=True, ondelete='set null', copy=False)
+    template_id = fields.Many2one('ocr.template', string='Template', readonly=True, index=True, ondelete='set null',
+                                  copy=False, help="Known form the document was recognised as; only its zones were read.")
+    field_ids = fields.One2many('ocr.document.field', 'document_id', string='Extracted Fields', readonly=True)
+    cell_ids = fields.One2many('ocr.document.cell', 'document_id', string='Extracted Cells', readonly=True)
 
-    @api.depends('image_file')
-    def _compute_raw_text(self):
-        for rec in self:
-            if rec.image_file:
-                try:
-                    image_data = base64.b64decode(rec.image_file)
-                    image = Image.open(io.BytesIO(image_data))
-                    text = pytesseract.image_to_string(image)
-                    rec.raw_text = text
-                except Exception as e:
-                    rec.raw_text = f"Error during OCR: {str(e)}"
-            else:
-                rec.raw_text = False
+    @api.depends('image_filename')
+    def _compute_image_is_paged(self):
+        for document in self:
+            filename = (document.image_filename or '').lower()
+            document.image_is_paged = filename.endswith(('.pdf', '.tif', '.tiff'))
+
+    @api.depends('job_ids.progress')
+    def _compute_ocr_progress(self):
+        for document in self:
+            document.ocr_progress = document.job_ids[:1].progress
+
+    def write(self, vals):
+        res = super().write(vals)
+        if vals.get('ocr_state') in ('done', 'failed'):
+            self.batch_id._check_done()
+        return res
 
     def action_process_document(self):
-        self.ensure_one()
-        self._compute_raw_text()
-        
-        if not self.image_file:
+        """Queue the documents for OCR; the heavy work runs in the job runner."""
+        # bin_size: only check the images are set, do not load them
+        documents = self.with_context(bin_size=True).filtered('image_file').with_context(bin_size=False)
+        if not documents:
             return self._show_notification('error', 'No image file to process.')
-            
-        try:
-            # Decode image from base64
-            image_data = base64.b64decode(self.image_file)
-            image_np = np.frombuffer(image_data, np.uint8)
-            image = cv2.imdecode(image_np, cv2.IMREAD_COLOR)
-            
-            # Check if image has grid lines
-            has_grid = self._detect_grid_lines(image)
-            self.has_grid_lines = has_grid
-            
-            if has_grid:
-                # Process as grid/table
-                excel_data = self._process_grid_image(image)
-            else:
-                # Process as regular text
-                excel_data = self._process_text_image()
-                
-            # Update record with Excel file
-            self.write({
-                'excel_file': excel_data,
-                'excel_filename': f"{self.name}_output.xlsx"
-            })
-            
-            return self._show_notification('success', 'Document processed and Excel file generated.')
-        except Exception as e:
-            return self._show_notification('error', f'Error processing document: {str(e)}')
-
-    def _detect_grid_lines(self, image):
-        """Detect if the image has grid lines like an Excel sheet"""
-        try:
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Apply threshold to get binary image
-            _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY_INV)
-            
-            # Detect horizontal lines
-            horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (25, 1))
-            horizontal_lines = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, horizontal_kernel, iterations=2)
-            
-            # Detect vertical lines
-            vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 25))
-            vertical_lines = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, vertical_kernel, iterations=2)
-            
-            # Count lines
-            h_lines = cv2.HoughLinesP(horizontal_lines, 1, np.pi/180, threshold=100, minLineLength=100, maxLineGap=10)
-            v_lines = cv2.HoughLinesP(vertical_lines, 1, np.pi/180, threshold=100, minLineLength=100, maxLineGap=10)
-            
-            # Check if we have enough lines to consider it a grid
-            h_count = 0 if h_lines is None else len(h_lines)
-            v_count = 0 if v_lines is None else len(v_lines)
-            
-            return h_count >= 3 and v_count >= 3
-        except Exception:
-            return False
-
-    def _process_grid_image(self, image):
-        """Process image with grid lines to extract table structure"""
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Apply threshold
-        _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY_INV)
-        
-        # Detect horizontal and vertical lines
-        horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (25, 1))
-        horizontal_lines = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, horizontal_kernel, iterations=2)
-        
-        vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 25))
-        vertical_lines = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, vertical_kernel, iterations=2)
-        
-        # Combine horizontal and vertical lines to get grid
-        grid = cv2.add(horizontal_lines, vertical_lines)
-        
-        # Find contours in the grid
-        contours, _ = cv2.findContours(grid, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # Filter contours to get cells (rectangles)
-        cells = []
-        for contour in contours:
-            x, y, w, h = cv2.boundingRect(contour)
-            if w > 20 and h > 20 and w < image.shape[1] * 0.9 and h < image.shape[0] * 0.9:
-                cells.append((x, y, w, h))
-        
-        # Sort cells by position (top to bottom, left to right)
-        cells.sort(key=lambda c: (c[1], c[0]))
-        
-        # Group cells into rows based on y-coordinate
-        rows = []
-        current_row = []
-        current_y = -1
-        
-        for cell in cells:
-            x, y, w, h = cell
-            if current_y == -1 or abs(y - current_y) < 10:
-                current_row.append(cell)
-                current_y = y
+
+        # Do not queue a document twice while it is still waiting or running.
+        pending = documents.filtered(lambda d: d.ocr_state in ('queued', 'running'))
+        to_process = (documents - pending)._process_from_cache()
+        if to_process:
+            self.env['ocr.job']._enqueue(to_process, priority=self.env.context.get('ocr_job_priority', 10))
+            return self._show_notification('success', 'Document queued for processing.')
+        if pending:
+            return self._show_notification('info', 'Document is already being processed.')
+        return self._show_notification('success', 'Document processed from cache.')
+
+    def _process_from_cache(self):
+        """Fill in the documents already processed with the same image and options.
+
+        Only hashes the image, no OpenCV or tesseract work is done here.
+        Returns the documents which still have to be processed.
+        """
+        Cache = self.env['ocr.result.cache']
+        if not Cache._is_enabled():
+            return self
+        options = self.env['ocr.job']._get_ocr_options()
+        missed = self.browse()
+        for document in self:
+            entry = Cache._lookup(Cache._compute_key(document._get_image_source(), options))
+            if entry:
+                entry._apply_to(document)
             else:
-                if current_row:
-                    # Sort cells in row by x-coordinate
-                    current_row.sort(key=lambda c: c[0])
-                    rows.append(current_row)
-                current_row = [cell]
-                current_y = y
-        
-        if current_row:
-            current_row.sort(key=lambda c: c[0])
-            rows.append(current_row)
-        
-        # Create Excel workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Extracted Table"
-        
-        # Define border style for cells
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Extract text from each cell and add to Excel
-        for row_idx, row in enumerate(rows, start=1):
-            for col_idx, cell in enumerate(row, start=1):
-                x, y, w, h = cell
-                # Extract cell image
-                cell_img = gray[y:y+h, x:x+w]
-                
-                # OCR the cell content
-                cell_text = pytesseract.image_to_string(
-                    Image.fromarray(cell_img), 
-                    config='--psm 6'  # Assume a single uniform block of text
-                ).strip()
-                
-                # Add to Excel with border
-                ws.cell(row=row_idx, column=col_idx, value=cell_text).border = thin_border
-        
-        # Save Excel to memory
-        excel_buffer = io.BytesIO()
-        wb.save(excel_buffer)
-        excel_data = base64.b64encode(excel_buffer.getvalue())
-        
-        return excel_data
-
-    def _process_text_image(self):
-        """Process image as regular text (no grid lines)"""
-        # Create Excel workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Extracted Text"
-        
-        # Split text into lines and add to Excel
-        if self.raw_text:
-            lines = self.raw_text.split('\n')
-            for i, line in enumerate(lines, start=1):
-                if line.strip():  # Skip empty lines
-                    ws['A{}'.format(i)] = line
-        
-        # Save Excel to memory
-        excel_buffer = io.BytesIO()
-        wb.save(excel_buffer)
-        excel_data = base64.b64encode(excel_buffer.getvalue())
-        
-        return excel_data
+                missed |= document
+        return missed
+
+    def _reset_ocr(self):
+        """Forget what was extracted from the previous image, before a new one is attached.
+
+        The documents go back to draft with their queued jobs dropped; a
+        document being processed cannot have its image replaced.
+        """
+        running = self.filtered(lambda d: d.ocr_state == 'running')
+        if running:
+            raise UserError(_("%s is being processed, try again once it is done.", running[0].display_name))
+        self.job_ids.filtered(lambda j: j.state == 'queued').unlink()
+        self.field_ids.unlink()
+        self.write({
+            'ocr_state': 'draft',
+            'raw_text': False,
+            'has_grid_lines': False,
+            'page_count': 0,
+            'template_id': False,
+            'excel_file': False,
+            'excel_filename': False,
+        })
+        for document in self:
+            document._set_cells([])
+
+    @api.model
+    def _create_from_files(self, files, batch=False):
+        """Create a document per ``(filename, path)`` uploaded file.
+
+        The files are moved into the attachment store as they are, without
+        being loaded and base64 encoded like a form upload.
+        """
+        Attachment = self.env['ir.attachment']
+        documents = self.create([{
+            'name': os.path.splitext(filename)[0],
+            'image_filename': filename,
+            'batch_id': batch and batch.id,
+        } for filename, _path in files])
+        for document, (filename, path) in zip(documents, files):
+            mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            Attachment._ocr_set_field_file(document, 'image_file', Attachment._ocr_store_file(path), filename, mimetype)
+        return documents
+
+    @api.model
+    def _get_upload_dir(self):
+        """Directory of the chunked uploads in progress, shared by the workers like the filestore"""
+        path = os.path.join(config['data_dir'], 'ocr_uploads', self.env.cr.dbname)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @api.autovacuum
+    def _gc_chunked_uploads(self):
+        """Remove the uploads abandoned for more than a day"""
+        upload_dir = self._get_upload_dir()
+        limit = time.time() - 24 * 3600
+        for entry in os.scandir(upload_dir):
+            if entry.stat().st_mtime < limit:
+                os.unlink(entry.path)
+
+    def _get_image_attachment(self):
+        self.ensure_one()
+        return self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'image_file'),
+            ('res_id', '=', self.id),
+        ], limit=1)
+
+    def _get_image_source(self):
+        """Path of the image in the filestore, or its raw bytes when stored in the database.
+
+        Avoids the base64 encoded copy reading ``image_file`` would create.
+        """
+        attachment = self._get_image_attachment()
+        if attachment.store_fname:
+            return attachment._full_path(attachment.store_fname)
+        return attachment.raw
+
+    def _set_template_fields(self, template_id, values):
+        """Replace the extracted fields with ``values``, dicts of the ocr.document.field values"""
+        self.ensure_one()
+        self.field_ids.unlink()
+        # The template or its zones may have been deleted while the document was processed
+        self.template_id = self.env['ocr.template'].browse(template_id).exists()
+        zones = self.env['ocr.template.zone'].browse([value['zone_id'] for value in values]).exists()
+        self.env['ocr.document.field'].create([
+            dict(value, document_id=self.id, zone_id=value['zone_id'] if value['zone_id'] in zones.ids else False)
+            for value in values
+        ])
+
+    def _set_cells(self, cells):
+        """Replace the extracted cells by ``cells``, ``(page, row, col, text, confidence)`` rows.
+
+        Documents have hundreds of cells: they are inserted by plain
+        multi-row INSERTs rather than created one ORM record at a time.
+        """
+        self.ensure_one()
+        Cell = self.env['ocr.document.cell']
+        Cell.flush_model()
+        self.env.cr.execute("DELETE FROM ocr_document_cell WHERE document_id = %s", (self.id,))
+        for chunk in split_every(1000, cells):
+            self.env.cr.execute(
+                'INSERT INTO ocr_document_cell (document_id, page, "row", col, text, confidence) VALUES '
+                + ', '.join(['%s'] * len(chunk)),
+                [(self.id, page, row, col, text, confidence) for page, row, col, text, confidence in chunk],
+            )
+        Cell.invalidate_model()
+        self.invalidate_recordset(['cell_ids'])
+
+    def _get_cells(self):
+        """The extracted cells as ``(page, row, col, text, confidence)`` rows"""
+        self.ensure_one()
+        self.env['ocr.document.cell'].flush_model()
+        self.env.cr.execute("""
+            SELECT page, "row", col, text, confidence
+              FROM ocr_document_cell
+             WHERE document_id = %s
+          ORDER BY page, "row", col
+        """, (self.id,))
+        return self.env.cr.fetchall()
+
+    def _get_output_attachment(self):
+        self.ensure_one()
+        return self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'excel_file'),
+            ('res_id', '=', self.id),
+        ], limit=1)
+
+    def _set_output_file(self, path, output_format, mimetype):
+        """Attach the file produced by the pipeline as ``excel_file``, without loading it"""
+        self.ensure_one()
+        Attachment = self.env['ir.attachment']
+        filename = f"{self.name}_output.{output_format}"
+        Attachment._ocr_set_field_file(self, 'excel_file', Attachment._ocr_store_file(path), filename, mimetype)
+        self.excel_filename = filename
 
     def _show_notification(self, type_msg, message):
         """Helper to show notification"""
@@ -0,0 +1,83 @@
+from odoo import models, fields, api
+
+
+class OcrBatch(models.Model):
+    _name = 'ocr.batch'
+    _description = 'OCR Batch Import'
+    _inherit = ['mail.thread']
+    _order = 'id desc'
+
+    name = fields.Char(string='Batch Name', required=True)
+    state = fields.Selection([
+        ('running', 'Running'),
+        ('done', 'Done'),
+    ], string='Status', default='running', required=True, readonly=True, tracking=True)
+    document_ids = fields.One2many('ocr.document', 'batch_id', string='Documents', readonly=True)
+    date_start = fields.Datetime(string='Started On', default=fields.Datetime.now, readonly=True)
+    date_done = fields.Datetime(string='Finished On', readonly=True)
+    idempotency_key = fields.Char(string='Idempotency Key', readonly=True, copy=False,
+                                  help="Key of the API request which created the batch; a retry "
+                                       "with the same key returns this batch instead of a new one.")
+    skipped_files = fields.Text(string='Skipped Files', readonly=True,
+                                help="Archive members which were not imported, with the reason.")
+    document_count = fields.Integer(string='Documents', compute='_compute_stats')
+    done_count = fields.Integer(string='Processed', compute='_compute_stats')
+    failed_count = fields.Integer(string='Failed', compute='_compute_stats')
+    pending_count = fields.Integer(string='Pending', compute='_compute_stats')
+    duration = fields.Float(string='Duration (min)', compute='_compute_stats')
+    throughput = fields.Float(string='Throughput (docs/min)', compute='_compute_stats')
+
+    _sql_constraints = [
+        ('idempotency_key_unique', 'unique(idempotency_key, create_uid)',
+         'A batch was already created with this idempotency key.'),
+    ]
+
+    @api.depends('document_ids.ocr_state', 'date_start', 'date_done')
+    def _compute_stats(self):
+        counts = {
+            (batch.id, state): count
+            for batch, state, count in self.env['ocr.document']._read_group(
+                [('batch_id', 'in', self.ids)], ['batch_id', 'ocr_state'], ['__count'])
+        }
+        now = fields.Datetime.now()
+        for batch in self:
+            batch.done_count = counts.get((batch.id, 'done'), 0)
+            batch.failed_count = counts.get((batch.id, 'failed'), 0)
+            batch.document_count = sum(count for (batch_id, _state), count in counts.items() if batch_id == batch.id)
+            batch.pending_count = batch.document_count - batch.done_count - batch.failed_count
+            minutes = ((batch.date_done or now) - batch.date_start).total_seconds() / 60.0 if batch.date_start else 0.0
+            batch.duration = minutes
+            batch.throughput = batch.done_count / minutes if minutes else 0.0
+
+    def _check_done(self):
+        """Close the batches whose documents are all processed and post their summary."""
+        for batch in self.filtered(lambda b: b.state == 'running'):
+            pending = self.env['ocr.document'].search_count([
+                ('batch_id', '=', batch.id),
+                ('ocr_state', 'not in', ('done', 'failed')),
+            ])
+            if pending:
+                continue
+            batch.write({'state': 'done', 'date_done': fields.Datetime.now()})
+            batch.invalidate_recordset(['document_count', 'done_count', 'failed_count', 'duration', 'throughput'])
+            batch.message_post(body=batch._get_summary())
+
+    def _get_summary(self):
+        self.ensure_one()
+        summary = (
+            f"{self.document_count} documents in {self.duration:.1f} min "
+            f"({self.throughput:.1f} docs/min): {self.done_count} processed, {self.failed_count} failed."
+        )
+        if self.skipped_files:
+            summary += f" {len(self.skipped_files.splitlines())} archive files skipped."
+        return summary
+
+    def action_view_documents(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': self.name,
+            'res_model': 'ocr.document',
+            'view_mode': 'list,form',
+            'domain': [('batch_id', '=', self.id)],
+        }
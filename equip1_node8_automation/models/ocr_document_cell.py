@@ -0,0 +1,21 @@
+from odoo import models, fields
+
+
+class OcrDocumentCell(models.Model):
+    _name = 'ocr.document.cell'
+    _description = 'OCR Extracted Cell'
+    _order = 'document_id, page, row, col'
+    _rec_name = 'text'
+    # Derived from the documents and written in bulk, see ocr.document._set_cells
+    _log_access = False
+
+    document_id = fields.Many2one('ocr.document', string='Document', required=True, ondelete='cascade', index=True)
+    page = fields.Integer(string='Page', help="Index of the page, starting at 0.")
+    row = fields.Integer(string='Row')
+    col = fields.Integer(string='Column', help="Always 0 for the lines of a text page.")
+    # Trigram index: substring searches (ilike) do not scan the whole table
+    text = fields.Text(string='Text', required=True, index='trigram')
+    confidence = fields.Float(string='Confidence', digits=(16, 1), aggregator='avg',
+                              help="Mean tesseract confidence (0-100) of the words of the cell. "
+                                   "Only reported by the page OCR of tables; empty otherwise (shown as 0), "
+                                   "such cells do not count in the average.")
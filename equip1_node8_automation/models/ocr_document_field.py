@@ -0,0 +1,14 @@
+from odoo import models, fields
+
+
+class OcrDocumentField(models.Model):
+    _name = 'ocr.document.field'
+    _description = 'OCR Extracted Field'
+    _order = 'document_id, page, id'
+
+    document_id = fields.Many2one('ocr.document', string='Document', required=True, ondelete='cascade', index=True)
+    zone_id = fields.Many2one('ocr.template.zone', string='Zone', ondelete='set null')
+    page = fields.Integer(string='Page', help="Index of the page, starting at 0.")
+    name = fields.Char(string='Field Name', required=True)
+    label = fields.Char(string='Label')
+    value = fields.Text(string='Value')
@@ -0,0 +1,364 @@
+import logging
+import random
+import time
+from concurrent.futures import wait, FIRST_COMPLETED, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.tools import sql
+
+# Only the task names are needed here: OpenCV, numpy, tesseract and
+# openpyxl are imported by the pool processes or the sidecar, never by
+# the Odoo workers.
+from ..ocr.client import SidecarUnavailable
+from ..ocr.pool import get_executor, reset_executor
+
+_logger = logging.getLogger(__name__)
+
+# The pool itself is gone: every job still on it fails the same way, and
+# it has to be recreated before the next run can use it.
+# A TimeoutError raised by a task (e.g. the cell OCR) only fails its job.
+POOL_ERRORS = (BrokenProcessPool, SidecarUnavailable)
+
+# Seconds between two checks of the job deadlines while pages run
+POLL_INTERVAL = 1.0
+
+
+class OcrJob(models.Model):
+    _name = 'ocr.job'
+    _description = 'OCR Processing Job'
+    _order = 'id desc'
+
+    document_id = fields.Many2one('ocr.document', string='Document', required=True, ondelete='cascade', index=True)
+    name = fields.Char(related='document_id.name', string='Document Name')
+    state = fields.Selection([
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='Status', default='queued', required=True, readonly=True)
+    priority = fields.Integer(string='Priority', default=10, help="Jobs with a lower priority are claimed first.")
+    attempts = fields.Integer(string='Attempts', default=0, readonly=True)
+    next_attempt = fields.Datetime(string='Next Attempt', readonly=True, copy=False,
+                                   help="A failed job is not retried before this time; empty to run it right away.")
+    date_started = fields.Datetime(string='Started On', readonly=True)
+    date_done = fields.Datetime(string='Finished On', readonly=True)
+    error = fields.Text(string='Error', readonly=True)
+    page_count = fields.Integer(string='Pages', readonly=True)
+    pages_done = fields.Integer(string='Pages Done', readonly=True)
+    progress = fields.Float(string='Progress', compute='_compute_progress')
+
+    @api.depends('state', 'page_count', 'pages_done')
+    def _compute_progress(self):
+        for job in self:
+            if job.state == 'done':
+                job.progress = 100.0
+            else:
+                job.progress = 100.0 * job.pages_done / job.page_count if job.page_count else 0.0
+
+    def init(self):
+        # Workers only ever look for queued jobs, keep that lookup small.
+        sql.create_index(
+            self._cr, 'ocr_job_queued_idx', self._table, ['priority', 'id'],
+            where="state = 'queued'",
+        )
+
+    @api.model
+    def _get_ocr_options(self):
+        """Options passed as-is to the OCR pipeline in the worker processes."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        return {
+            # 'auto' runs tesseract in process through tesserocr when it is installed
+            'ocr_engine': ICP.get_param('ocr.engine', 'auto'),
+            'lang': ICP.get_param('ocr.tesseract_lang', 'eng'),
+            'text_config': ICP.get_param('ocr.text_config', ''),
+            'cell_config': ICP.get_param('ocr.cell_config', '--psm 6'),
+            'threshold': int(ICP.get_param('ocr.binary_threshold', 150)),
+            'memory_budget_mb': int(ICP.get_param('ocr.preprocess_memory_budget_mb', 512)),
+            'cell_workers': int(ICP.get_param('ocr.cell_workers', 1)),
+            'cell_timeout': int(ICP.get_param('ocr.cell_timeout', 300)),
+            'cell_max_documents': self._get_queue_settings()['cell_max_documents'],
+            # 'page' runs tesseract once per page, 'cell' once per grid cell
+            'grid_ocr_mode': ICP.get_param('ocr.grid_ocr_mode', 'page'),
+            'grid_page_config': ICP.get_param('ocr.grid_page_config', '--psm 11'),
+            # raw text of grid pages: 'cells' joins the cell texts, 'ocr' runs
+            # an additional whole-page OCR to keep the page layout
+            'grid_page_text': ICP.get_param('ocr.grid_page_text', 'cells'),
+            # per-cell mode: skip blank cells, recognise identical cells once
+            'cell_blank_ratio': float(ICP.get_param('ocr.cell_blank_ratio', 0.0005)),
+            'cell_dedup': ICP.get_param('ocr.cell_dedup', 'True').lower() not in ('0', 'false', 'no'),
+            # cell texts kept by each worker for the next documents, 0 to disable
+            'cell_cache_size': int(ICP.get_param('ocr.cell_cache_size', 0)),
+            'grid_fast_path': ICP.get_param('ocr.grid_fast_path', 'True').lower() not in ('0', 'false', 'no'),
+            'grid_fast_max_side': int(ICP.get_param('ocr.grid_fast_max_side', 1000)),
+            'max_pixels': int(ICP.get_param('ocr.max_image_pixels', 50000000)),
+            'max_rss_mb': int(ICP.get_param('ocr.max_worker_rss_mb', 2048)),
+            # images of at least tile_min_pixels are processed in strips
+            'tile_min_pixels': int(ICP.get_param('ocr.tile_min_pixels', 16000000)),
+            'tile_height': int(ICP.get_param('ocr.tile_height', 2048)),
+            'tile_overlap': int(ICP.get_param('ocr.tile_overlap', 128)),
+            'output_format': ICP.get_param('ocr.output_format', 'xlsx'),
+            'pdf_dpi': int(ICP.get_param('ocr.pdf_dpi', 300)),
+            # known forms, only their zones are read when a page matches one
+            'templates': self.env['ocr.template']._get_match_data(),
+        }
+
+    @api.model
+    def _get_queue_settings(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        workers = max(1, int(ICP.get_param('ocr.job_workers', 2)))
+        return {
+            'workers': workers,
+            'batch_size': max(1, int(ICP.get_param('ocr.job_batch_size', workers * 2))),
+            'timeout': int(ICP.get_param('ocr.job_timeout', 600)),
+            'max_attempts': max(1, int(ICP.get_param('ocr.job_max_attempts', 3))),
+            # Seconds before the first retry of a failed job, doubled at each attempt
+            'retry_base': float(ICP.get_param('ocr.job_retry_base', 60)),
+            'retry_max': float(ICP.get_param('ocr.job_retry_max', 3600)),
+            'cell_max_documents': max(1, int(ICP.get_param('ocr.cell_max_documents', 1))),
+            # Unix socket of the OCR sidecar (ocr/sidecar.py), empty to fork a pool in the cron worker
+            'worker_socket': ICP.get_param('ocr.worker_socket', ''),
+        }
+
+    @api.model
+    def _enqueue(self, documents, priority=10):
+        """Create one queued job per document and wake up the job runner."""
+        jobs = self.create([{
+            'document_id': document.id,
+            'priority': priority,
+        } for document in documents])
+        documents.write({'ocr_state': 'queued'})
+        self.env.ref('equip1_node8_automation.ir_cron_process_ocr_jobs')._trigger()
+        return jobs
+
+    @api.model
+    def _claim_jobs(self, limit):
+        """Atomically move up to ``limit`` queued jobs to running.
+
+        ``SKIP LOCKED`` lets several runners claim jobs at the same time
+        without waiting on, or double-processing, each other's rows. Failed
+        jobs wait for their ``next_attempt``.
+        """
+        self.flush_model()
+        self.env.cr.execute("""
+            UPDATE ocr_job
+               SET state = 'running',
+                   attempts = attempts + 1,
+                   date_started = (now() at time zone 'UTC'),
+                   write_date = (now() at time zone 'UTC'),
+                   write_uid = %s
+             WHERE id IN (
+                SELECT id FROM ocr_job
+                 WHERE state = 'queued'
+                   AND (next_attempt IS NULL OR next_attempt <= (now() at time zone 'UTC'))
+              ORDER BY priority, id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+             )
+         RETURNING id
+        """, (self.env.uid, limit))
+        job_ids = [row[0] for row in self.env.cr.fetchall()]
+        self.invalidate_model(['state', 'attempts', 'date_started'])
+        jobs = self.browse(job_ids)
+        jobs.document_id.write({'ocr_state': 'running'})
+        return jobs
+
+    @api.model
+    def _requeue_stale_jobs(self, timeout):
+        """Put back jobs whose runner died while they were running."""
+        limit = fields.Datetime.now() - timedelta(seconds=timeout * 2)
+        stale = self.search([('state', '=', 'running'), ('date_started', '<', limit)])
+        settings = self._get_queue_settings()
+        for job in stale:
+            job._mark_failed("Job runner did not finish in time.", settings=settings)
+        return stale
+
+    @api.model
+    def _cron_process_jobs(self):
+        settings = self._get_queue_settings()
+        self._requeue_stale_jobs(settings['timeout'])
+        self.env.cr.commit()
+
+        while True:
+            jobs = self._claim_jobs(settings['batch_size'])
+            # Make the claim visible to other runners before doing the work.
+            self.env.cr.commit()
+            if not jobs:
+                break
+            jobs._run_in_pool(settings)
+
+    def _run_in_pool(self, settings):
+        """Process the jobs on the pool, one task per page of each document."""
+        Cache = self.env['ocr.result.cache']
+        RunLog = self.env['ocr.run.log']
+        use_cache = Cache._is_enabled()
+        options = self._get_ocr_options()
+        futures = {}
+        keys = {}
+        pages = {}
+        started = {}
+        deadlines = {}
+        try:
+            pool = get_executor(settings['workers'], settings['cell_max_documents'],
+                                settings['worker_socket'], settings['timeout'])
+            for job in self:
+                try:
+                    # A filestore path when possible, the workers read the file themselves
+                    image_source = job.document_id._get_image_source()
+                    if use_cache:
+                        # The same image may have been processed since it was queued.
+                        keys[job] = Cache._compute_key(image_source, options)
+                        entry = Cache._lookup(keys[job])
+                        if entry:
+                            entry._apply_to(job.document_id)
+                            job._mark_done()
+                            continue
+                    page_count = pool.call('count_pages', image_source)
+                except POOL_ERRORS:
+                    raise
+                except Exception as e:
+                    _logger.exception("OCR job %s failed", job.id)
+                    job._mark_failed(str(e), settings=settings)
+                    continue
+                if not page_count:
+                    # Empty or unreadable file: no page task would ever
+                    # complete the job, and another attempt would not either
+                    job._mark_failed("The file has no page to process.", max_attempts=0, settings=settings)
+                    continue
+                job.write({'page_count': page_count, 'pages_done': 0})
+                pages[job] = [None] * page_count
+                started[job] = time.monotonic()
+                for index in range(page_count):
+                    futures[pool.submit('run_page', image_source, index, options)] = (job, index)
+            self.env.cr.commit()
+
+            while futures:
+                done, _not_done = wait(futures, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, index = futures.pop(future)
+                    if job not in pages:
+                        # Another page of this document already failed
+                        continue
+                    try:
+                        pages[job][index] = future.result()
+                        job.pages_done += 1
+                        if job.pages_done == job.page_count:
+                            job_pages = pages[job]
+                            write_start = time.perf_counter()
+                            result = pool.call('write_result', job_pages, options)
+                            write_time = time.perf_counter() - write_start
+                            job._apply_result(result)
+                            del pages[job]
+                            RunLog._log_run(job, job_pages, 'done', time.monotonic() - started[job], write_time)
+                            if use_cache:
+                                Cache._store(keys[job], job.document_id)
+                    except POOL_ERRORS:
+                        raise
+                    except Exception as e:
+                        _logger.exception("OCR job %s failed on page %s", job.id, index + 1)
+                        job_pages = pages.pop(job, None) or []
+                        for other, (other_job, _index) in futures.items():
+                            if other_job == job:
+                                other.cancel()
+                        error = f"Page {index + 1}: {e}"
+                        job._mark_failed(error, settings=settings)
+                        RunLog._log_run(job, [page for page in job_pages if page], 'failed',
+                                        time.monotonic() - started[job], error=error)
+                    self.env.cr.commit()
+
+                # ocr.job_timeout bounds each job from when its first page
+                # starts, not the batch: a job may wait behind the others
+                now = time.monotonic()
+                for future, (job, _index) in futures.items():
+                    if job not in deadlines and future.running():
+                        deadlines[job] = now + settings['timeout']
+                expired = {job for job, deadline in deadlines.items() if deadline <= now}
+                if not expired:
+                    continue
+                hung = False
+                for future, (job, _index) in list(futures.items()):
+                    if job in expired:
+                        del futures[future]
+                        hung |= not future.cancel() and not future.done()
+                for job in expired:
+                    del deadlines[job]
+                    if job in pages:
+                        error = f"The job did not finish within {settings['timeout']} seconds."
+                        job._mark_failed(error, settings=settings)
+                        RunLog._log_run(job, [page for page in pages.pop(job) if page], 'failed',
+                                        now - started[job], error=error)
+                self.env.cr.commit()
+                if hung:
+                    # Its pages are still running: only killing the pool
+                    # processes frees them, the other jobs are retried
+                    raise FuturesTimeoutError(f"OCR pages still running after {settings['timeout']} seconds")
+        except (FuturesTimeoutError, *POOL_ERRORS) as e:
+            # Whatever is left is lost with the pool; let the next run retry it.
+            _logger.error("OCR job pool aborted: %r", e)
+            reset_executor()
+            for future in futures:
+                future.cancel()
+            error = f"OCR worker aborted: {e!r}"
+            # Including the jobs whose pages were not submitted yet
+            for job in self.filtered(lambda j: j.state == 'running'):
+                job._mark_failed(error, settings=settings)
+                if job in pages:
+                    RunLog._log_run(job, [page for page in pages[job] if page], 'failed',
+                                    time.monotonic() - started[job], error=error)
+            self.env.cr.commit()
+
+    def _apply_result(self, result):
+        self.ensure_one()
+        document = self.document_id
+        document.write({
+            'raw_text': result['raw_text'],
+            'has_grid_lines': result['has_grid_lines'],
+            'page_count': result['page_count'],
+            'ocr_state': 'done',
+        })
+        document._set_output_file(result['output_path'], result['output_format'], result['output_mimetype'])
+        document._set_template_fields(result['template_id'], result['fields'])
+        document._set_cells(result['cells'])
+        self._mark_done()
+
+    def _mark_done(self):
+        self.write({
+            'state': 'done',
+            'date_done': fields.Datetime.now(),
+            'error': False,
+        })
+
+    def _mark_failed(self, error, max_attempts=None, settings=None):
+        """Queue the job again after a delay growing with its attempts, or fail it for good"""
+        self.ensure_one()
+        settings = settings or self._get_queue_settings()
+        if max_attempts is None:
+            max_attempts = settings['max_attempts']
+        retry = self.attempts < max_attempts
+        next_attempt = False
+        if retry:
+            delay = min(settings['retry_base'] * 2 ** max(0, self.attempts - 1), settings['retry_max'])
+            # Jitter, so that the jobs failed together are not retried together
+            next_attempt = fields.Datetime.now() + timedelta(seconds=delay * (1 + random.uniform(0, 0.25)))
+        self.write({
+            'state': 'queued' if retry else 'failed',
+            'date_done': False if retry else fields.Datetime.now(),
+            'next_attempt': next_attempt,
+            'error': error,
+        })
+        self.document_id.write({'ocr_state': 'queued' if retry else 'failed'})
+        if retry:
+            self.env.ref('equip1_node8_automation.ir_cron_process_ocr_jobs')._trigger(next_attempt)
+
+    def action_requeue(self):
+        failed = self.filtered(lambda j: j.state == 'failed')
+        failed.write({
+            'state': 'queued',
+            'attempts': 0,
+            'next_attempt': False,
+            'date_done': False,
+            'error': False,
+        })
+        failed.document_id.write({'ocr_state': 'queued'})
+        self.env.ref('equip1_node8_automation.ir_cron_process_ocr_jobs')._trigger()
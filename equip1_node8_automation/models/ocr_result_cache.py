@@ -0,0 +1,228 @@
+import hashlib
+import json
+
+from psycopg2 import IntegrityError
+
+from odoo import models, fields, api
+
+# Options that only affect how the pipeline runs, not what it produces.
+RUNTIME_OPTIONS = (
+    'memory_budget_mb', 'cell_workers', 'cell_timeout', 'cell_max_documents', 'cell_cache_size', 'max_rss_mb',
+)
+
+
+class OcrResultCache(models.Model):
+    _name = 'ocr.result.cache'
+    _description = 'OCR Result Cache'
+    _order = 'last_used desc, id desc'
+    _rec_name = 'key'
+
+    key = fields.Char(string='Key', required=True, readonly=True, index=True,
+                      help="SHA-256 of the decoded image bytes and the OCR options.")
+    raw_text = fields.Text(string='Extracted Text', readonly=True)
+    has_grid_lines = fields.Boolean(string='Has Grid Lines', readonly=True)
+    template_id = fields.Many2one('ocr.template', string='Template', readonly=True, ondelete='cascade')
+    field_values = fields.Json(string='Extracted Fields', readonly=True)
+    cell_values = fields.Json(string='Extracted Cells', readonly=True)
+    excel_file = fields.Binary(string='Generated Excel', readonly=True, attachment=True)
+    excel_filename = fields.Char(string='Excel Filename', readonly=True)
+    size = fields.Integer(string='Size (bytes)', readonly=True)
+    hit_count = fields.Integer(string='Hits', default=0, readonly=True)
+    last_used = fields.Datetime(string='Last Used', default=fields.Datetime.now, readonly=True, index=True)
+
+    _sql_constraints = [
+        ('key_unique', 'unique(key)', 'An OCR result is already cached for this image and configuration.'),
+    ]
+
+    @api.model
+    def _compute_key(self, image_source, options):
+        """Content address of an OCR result: the image plus everything that changes the output.
+
+        ``image_source`` is the raw image or the path of its filestore file,
+        which is hashed in chunks instead of being loaded at once.
+        """
+        if isinstance(image_source, str):
+            digest = hashlib.sha256()
+            with open(image_source, 'rb') as image_file:
+                for chunk in iter(lambda: image_file.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        else:
+            digest = hashlib.sha256(image_source)
+        options = {k: v for k, v in options.items() if k not in RUNTIME_OPTIONS}
+        # A template is identified by its reference checksum, not by where it is stored
+        options['templates'] = [
+            {k: v for k, v in template.items() if k != 'source'} for template in options.get('templates', [])
+        ]
+        digest.update(json.dumps(options, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    @api.model
+    def _is_enabled(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        return ICP.get_param('ocr.cache_enabled', 'True').lower() not in ('0', 'false', 'no')
+
+    @api.model
+    def _lookup(self, key):
+        """Return the cached entry for ``key``, or an empty recordset, and count the hit or miss."""
+        entry = self.sudo().search([('key', '=', key)], limit=1)
+        if entry:
+            self.env.cr.execute("""
+                UPDATE ocr_result_cache
+                   SET hit_count = hit_count + 1,
+                       last_used = (now() at time zone 'UTC')
+                 WHERE id = %s
+            """, (entry.id,))
+            entry.invalidate_recordset(['hit_count', 'last_used'])
+        self.env['ocr.result.cache.stats']._increment('hits' if entry else 'misses')
+        return entry
+
+    @api.model
+    def _store(self, key, document):
+        """Cache the result of a processed document and evict the least recently used entries over budget.
+
+        The cached output shares the document's stored file, nothing is copied.
+        """
+        entry = self.sudo().search([('key', '=', key)], limit=1)
+        if entry:
+            return entry
+        raw_text = document.raw_text or ''
+        cells = document._get_cells()
+        output = document._get_output_attachment()
+        try:
+            with self.env.cr.savepoint():
+                entry = self.sudo().create({
+                    'key': key,
+                    'raw_text': raw_text,
+                    'has_grid_lines': document.has_grid_lines,
+                    'template_id': document.template_id.id,
+                    'field_values': [{
+                        'zone_id': field.zone_id.id,
+                        'page': field.page,
+                        'name': field.name,
+                        'label': field.label,
+                        'value': field.value,
+                    } for field in document.field_ids],
+                    'cell_values': cells,
+                    'excel_filename': document.excel_filename,
+                    'size': output.file_size + len(raw_text.encode()) + sum(len(cell[3].encode()) for cell in cells),
+                })
+                if output:
+                    self.env['ir.attachment']._ocr_set_field_file(
+                        entry, 'excel_file', output._ocr_file_values(), output.name, output.mimetype)
+        except IntegrityError:
+            # Another runner cached the same image in the meantime.
+            return self.sudo().search([('key', '=', key)], limit=1)
+        self._evict()
+        return entry
+
+    @api.model
+    def _evict(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        max_entries = int(ICP.get_param('ocr.cache_max_entries', 1000))
+        max_size = int(ICP.get_param('ocr.cache_max_size_mb', 200)) * 1024 * 1024
+        self.env.cr.execute("""
+            SELECT id FROM (
+                SELECT id,
+                       row_number() OVER w AS position,
+                       sum(size) OVER w AS total_size
+                  FROM ocr_result_cache
+                WINDOW w AS (ORDER BY last_used DESC, id DESC)
+            ) ranked
+             WHERE position > %s OR total_size > %s
+        """, (max_entries, max_size))
+        evicted = self.sudo().browse([row[0] for row in self.env.cr.fetchall()])
+        evicted.unlink()
+        return len(evicted)
+
+    @api.model
+    def _get_stats(self):
+        """Size of the cache and the hit/miss counters of its lookups"""
+        self.env.cr.execute("""
+            SELECT count(*), coalesce(sum(size), 0)
+              FROM ocr_result_cache
+        """)
+        entries, size = self.env.cr.fetchone()
+        hits, misses = self.env['ocr.result.cache.stats']._get_counters()
+        lookups = hits + misses
+        return {
+            'entries': entries,
+            'size': size,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+        }
+
+    def _apply_to(self, document):
+        """Copy the cached result on the document, as if it had been processed."""
+        self.ensure_one()
+        Attachment = self.env['ir.attachment']
+        document.write({
+            'raw_text': self.raw_text,
+            'has_grid_lines': self.has_grid_lines,
+            'ocr_state': 'done',
+        })
+        document._set_template_fields(self.template_id.id, self.field_values or [])
+        document._set_cells(self.cell_values or [])
+        output = Attachment.sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'excel_file'),
+            ('res_id', '=', self.id),
+        ], limit=1)
+        if output:
+            extension = (self.excel_filename or '').rpartition('.')[2] or 'xlsx'
+            filename = f"{document.name}_output.{extension}"
+            Attachment._ocr_set_field_file(document, 'excel_file', output._ocr_file_values(), filename, output.mimetype)
+            document.excel_filename = filename
+
+    def action_clear_cache(self):
+        self.sudo().search([]).unlink()
+        self.env['ocr.result.cache.stats']._reset()
+
+    def action_show_stats(self):
+        stats = self._get_stats()
+        return self.env['ocr.document']._show_notification('info', (
+            f"{stats['entries']} entries ({stats['size'] / 1024 / 1024:.1f} MB), "
+            f"{stats['hits']} hits, {stats['misses']} misses, "
+            f"hit ratio {stats['hit_ratio']:.0%}"
+        ))
+
+
+class OcrResultCacheStats(models.Model):
+    """Hit and miss counters of the cache lookups, in a single row.
+
+    Kept apart from the entries: evicting an entry does not lose the
+    lookups it served, and misses which never stored a result are counted.
+    """
+    _name = 'ocr.result.cache.stats'
+    _description = 'OCR Result Cache Statistics'
+    _log_access = False
+
+    hits = fields.Integer(string='Hits', readonly=True)
+    misses = fields.Integer(string='Misses', readonly=True)
+
+    def init(self):
+        self.env.cr.execute("""
+            INSERT INTO ocr_result_cache_stats (hits, misses)
+            SELECT 0, 0
+             WHERE NOT EXISTS (SELECT 1 FROM ocr_result_cache_stats)
+        """)
+
+    @api.model
+    def _increment(self, counter):
+        assert counter in ('hits', 'misses')
+        # In a cursor of its own: the single row is only locked for this
+        # statement, not for the rest of the (possibly long) OCR transaction
+        with self.env.registry.cursor() as cr:
+            cr.execute(f"UPDATE ocr_result_cache_stats SET {counter} = {counter} + 1")
+        self.invalidate_model([counter])
+
+    @api.model
+    def _get_counters(self):
+        self.env.cr.execute("SELECT coalesce(sum(hits), 0), coalesce(sum(misses), 0) FROM ocr_result_cache_stats")
+        return self.env.cr.fetchone()
+
+    @api.model
+    def _reset(self):
+        with self.env.registry.cursor() as cr:
+            cr.execute("UPDATE ocr_result_cache_stats SET hits = 0, misses = 0")
+        self.invalidate_model(['hits', 'misses'])
@@ -0,0 +1,158 @@
+import os
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+# Pipeline stage -> field holding its wall time, summed over the pages
+STAGE_FIELDS = {
+    'decode': 'time_decode',
+    'threshold': 'time_threshold',
+    'morphology': 'time_morphology',
+    'grid_fast': 'time_grid_fast',
+    'hough': 'time_hough',
+    'contours': 'time_contours',
+    'template_match': 'time_template_match',
+    'zone_ocr': 'time_zone_ocr',
+    'page_ocr': 'time_page_ocr',
+    'cell_ocr': 'time_cell_ocr',
+    'write': 'time_write',
+}
+
+DOCUMENT_KINDS = [
+    ('grid', 'Table'),
+    ('text', 'Text'),
+    ('form', 'Template Form'),
+]
+
+SIZE_CLASS_SELECTION = [
+    ('small', 'Small (< 2 MP)'),
+    ('medium', 'Medium (2-8 MP)'),
+    ('large', 'Large (8-32 MP)'),
+    ('huge', 'Huge (> 32 MP)'),
+]
+
+# Upper bound in megapixels of each size class
+SIZE_CLASSES = [
+    (2, 'small'),
+    (8, 'medium'),
+    (32, 'large'),
+]
+
+FILE_TYPES = {
+    'jpeg': 'jpg',
+    'tif': 'tiff',
+}
+
+
+class OcrRunLog(models.Model):
+    _name = 'ocr.run.log'
+    _description = 'OCR Run Log'
+    _order = 'id desc'
+
+    document_id = fields.Many2one('ocr.document', string='Document', readonly=True, index=True, ondelete='set null')
+    job_id = fields.Many2one('ocr.job', string='Job', readonly=True, ondelete='set null')
+    state = fields.Selection([
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='Status', required=True, readonly=True)
+    document_kind = fields.Selection(DOCUMENT_KINDS, string='Kind', readonly=True)
+    file_type = fields.Char(string='File Type', readonly=True)
+    size_class = fields.Selection(SIZE_CLASS_SELECTION, string='Size', readonly=True, help="Size of the largest page.")
+    page_count = fields.Integer(string='Pages', readonly=True, aggregator='avg')
+    image_width = fields.Integer(string='Width (px)', readonly=True, aggregator='max')
+    image_height = fields.Integer(string='Height (px)', readonly=True, aggregator='max')
+    megapixels = fields.Float(string='Megapixels', readonly=True, digits=(16, 1), aggregator='avg')
+    cell_count = fields.Integer(string='Cells', readonly=True, aggregator='avg')
+    ocr_calls = fields.Integer(string='OCR Calls', readonly=True, aggregator='avg')
+    peak_rss_mb = fields.Float(string='Peak Memory (MB)', readonly=True, digits=(16, 0), aggregator='max',
+                               help="Highest resident memory of the workers while processing the pages.")
+
+    # Stage times in seconds, summed over the pages
+    time_decode = fields.Float(string='Decode (s)', readonly=True, digits=(16, 3), aggregator='avg')
+    time_threshold = fields.Float(string='Threshold (s)', readonly=True, digits=(16, 3), aggregator='avg')
+    time_morphology = fields.Float(string='Morphology (s)', readonly=True, digits=(16, 3), aggregator='avg')
+    time_grid_fast = fields.Float(string='Grid Fast Path (s)', readonly=True, digits=(16, 3), aggregator='avg')
+    time_hough = fields.Float(string='Hough (s)', readonly=True, digits=(16, 3), aggregator='avg')
+    time_contours = fields.Float(string='Contours (s)', readonly=True, digits=(16, 3), aggregator='avg')
+    time_template_match = fields.Float(string='Template Match (s)', readonly=True, digits=(16, 3), aggregator='avg')
+    time_zone_ocr = fields.Float(string='Zone OCR (s)', readonly=True, digits=(16, 3), aggregator='avg')
+    time_page_ocr = fields.Float(string='Page OCR (s)', readonly=True, digits=(16, 3), aggregator='avg')
+    time_cell_ocr = fields.Float(string='Cell OCR (s)', readonly=True, digits=(16, 3), aggregator='avg')
+    time_write = fields.Float(string='Workbook Save (s)', readonly=True, digits=(16, 3), aggregator='avg')
+    time_total = fields.Float(string='Processing (s)', readonly=True, digits=(16, 3), aggregator='avg',
+                              help="Sum of the stage times; pages processed in parallel add up.")
+    wall_time = fields.Float(string='Wall Time (s)', readonly=True, digits=(16, 3), aggregator='avg',
+                             help="From the submission of the first page to the saved result.")
+    queue_time = fields.Float(string='Queued (s)', readonly=True, digits=(16, 3), aggregator='avg',
+                              help="Time the job waited in the queue before being claimed.")
+    error = fields.Text(string='Error', readonly=True)
+
+    @api.model
+    def _log_run(self, job, pages, state, wall_time, write_time=0.0, error=False):
+        """Record a run of ``job`` from the metrics of its processed ``pages``"""
+        stages = dict.fromkeys(STAGE_FIELDS, 0.0)
+        stages['write'] = write_time
+        cell_count = ocr_calls = width = height = 0
+        peak_rss = 0.0
+        for page in pages:
+            page_metrics = page['metrics']
+            for stage, seconds in page_metrics['stages'].items():
+                if stage in stages:
+                    stages[stage] += seconds
+            cell_count += page_metrics['counts'].get('cells', 0)
+            ocr_calls += page_metrics['counts'].get('ocr_calls', 0)
+            peak_rss = max(peak_rss, page_metrics['peak_rss_mb'])
+            if page_metrics['width'] * page_metrics['height'] > width * height:
+                width, height = page_metrics['width'], page_metrics['height']
+
+        document = job.document_id
+        megapixels = width * height / 1e6
+        values = {
+            'document_id': document.id,
+            'job_id': job.id,
+            'state': state,
+            'document_kind': self._get_document_kind(pages),
+            'file_type': self._get_file_type(document.image_filename),
+            'size_class': self._get_size_class(megapixels) if pages else False,
+            'page_count': job.page_count,
+            'image_width': width,
+            'image_height': height,
+            'megapixels': megapixels,
+            'cell_count': cell_count,
+            'ocr_calls': ocr_calls,
+            'peak_rss_mb': peak_rss,
+            'time_total': sum(stages.values()),
+            'wall_time': wall_time,
+            'queue_time': (job.date_started - job.create_date).total_seconds() if job.date_started else 0.0,
+            'error': error,
+        }
+        values.update({STAGE_FIELDS[stage]: seconds for stage, seconds in stages.items()})
+        return self.sudo().create(values)
+
+    @api.model
+    def _get_document_kind(self, pages):
+        if not pages:
+            return False
+        if any(page['has_grid_lines'] for page in pages):
+            return 'grid'
+        if any(page['template_id'] for page in pages):
+            return 'form'
+        return 'text'
+
+    @api.model
+    def _get_file_type(self, filename):
+        extension = os.path.splitext(filename or '')[1].lstrip('.').lower()
+        return FILE_TYPES.get(extension, extension) or False
+
+    @api.model
+    def _get_size_class(self, megapixels):
+        for limit, size_class in SIZE_CLASSES:
+            if megapixels < limit:
+                return size_class
+        return 'huge'
+
+    @api.autovacuum
+    def _gc_run_logs(self):
+        days = int(self.env['ir.config_parameter'].sudo().get_param('ocr.run_log_days', 90))
+        if days > 0:
+            self.sudo().search([('create_date', '<', fields.Datetime.now() - timedelta(days=days))]).unlink()
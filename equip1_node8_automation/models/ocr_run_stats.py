@@ -0,0 +1,46 @@
+from odoo import models, fields, tools
+
+from .ocr_run_log import DOCUMENT_KINDS, SIZE_CLASS_SELECTION
+
+
+class OcrRunStats(models.Model):
+    _name = 'ocr.run.stats'
+    _description = 'OCR Run Statistics'
+    _auto = False
+    _order = 'time_sum desc'
+
+    document_kind = fields.Selection(DOCUMENT_KINDS, string='Kind', readonly=True)
+    file_type = fields.Char(string='File Type', readonly=True)
+    size_class = fields.Selection(SIZE_CLASS_SELECTION, string='Size', readonly=True)
+    run_count = fields.Integer(string='Runs', readonly=True)
+    time_sum = fields.Float(string='Total Processing (s)', readonly=True, digits=(16, 1),
+                            help="Processing time of all the runs, the share of the OCR cost of this kind of document.")
+    # Percentiles cannot be combined across groups
+    time_p50 = fields.Float(string='Processing p50 (s)', readonly=True, digits=(16, 3), aggregator=False)
+    time_p95 = fields.Float(string='Processing p95 (s)', readonly=True, digits=(16, 3), aggregator=False)
+    wall_p50 = fields.Float(string='Wall Time p50 (s)', readonly=True, digits=(16, 3), aggregator=False)
+    wall_p95 = fields.Float(string='Wall Time p95 (s)', readonly=True, digits=(16, 3), aggregator=False)
+    ocr_share = fields.Float(string='Tesseract Share (%)', readonly=True, digits=(16, 1), aggregator=False)
+    peak_rss_p95 = fields.Float(string='Peak Memory p95 (MB)', readonly=True, digits=(16, 0), aggregator=False)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute("""
+            CREATE OR REPLACE VIEW %s AS (
+                SELECT row_number() OVER (ORDER BY document_kind, file_type, size_class) AS id,
+                       document_kind,
+                       file_type,
+                       size_class,
+                       count(*) AS run_count,
+                       sum(time_total) AS time_sum,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY time_total) AS time_p50,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY time_total) AS time_p95,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY wall_time) AS wall_p50,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY wall_time) AS wall_p95,
+                       100.0 * sum(time_page_ocr + time_cell_ocr + time_zone_ocr) / nullif(sum(time_total), 0) AS ocr_share,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY peak_rss_mb) AS peak_rss_p95
+                  FROM ocr_run_log
+                 WHERE state = 'done'
+              GROUP BY document_kind, file_type, size_class
+            )
+        """ % self._table)
@@ -0,0 +1,105 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import ValidationError
+
+
+class OcrTemplate(models.Model):
+    _name = 'ocr.template'
+    _description = 'OCR Template'
+    _order = 'sequence, id'
+
+    name = fields.Char(string='Name', required=True)
+    active = fields.Boolean(string='Active', default=True)
+    sequence = fields.Integer(string='Sequence', default=10)
+    reference_image = fields.Binary(string='Reference Image', required=True, attachment=True,
+                                    help="A clean scan of the form, the zones are placed on it.")
+    reference_filename = fields.Char(string='Reference Filename')
+    min_score = fields.Float(string='Minimum Match Score', default=0.3, digits=(16, 2),
+                             help="Share of the feature matches which must agree on the alignment of an upload "
+                                  "with the reference for the upload to be read with this template.")
+    zone_ids = fields.One2many('ocr.template.zone', 'template_id', string='Zones', copy=True)
+    document_count = fields.Integer(string='Documents', compute='_compute_document_count')
+
+    def _compute_document_count(self):
+        counts = dict(self.env['ocr.document']._read_group(
+            [('template_id', 'in', self.ids)], ['template_id'], ['__count']))
+        for template in self:
+            template.document_count = counts.get(template, 0)
+
+    @api.constrains('min_score')
+    def _check_min_score(self):
+        for template in self:
+            if not 0.0 < template.min_score <= 1.0:
+                raise ValidationError(_("The minimum match score must be between 0 and 1."))
+
+    @api.model
+    def _get_match_data(self):
+        """Active templates with zones, as passed to the OCR workers.
+
+        The reference is given as its filestore path when possible, like the
+        documents; its checksum identifies the version the workers registered.
+        """
+        data = []
+        for template in self.search([]):
+            attachment = self.env['ir.attachment'].sudo().search([
+                ('res_model', '=', self._name),
+                ('res_field', '=', 'reference_image'),
+                ('res_id', '=', template.id),
+            ], limit=1)
+            if not attachment or not template.zone_ids:
+                continue
+            data.append({
+                'id': template.id,
+                'checksum': attachment.checksum,
+                'source': attachment._full_path(attachment.store_fname) if attachment.store_fname else attachment.raw,
+                'min_score': template.min_score,
+                'zones': [{
+                    'id': zone.id,
+                    'name': zone.name,
+                    'label': zone.label or zone.name,
+                    'x': zone.x,
+                    'y': zone.y,
+                    'width': zone.width,
+                    'height': zone.height,
+                    'multiline': zone.multiline,
+                    'config': zone.config or '',
+                } for zone in template.zone_ids],
+            })
+        return data
+
+    def action_view_documents(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': self.name,
+            'res_model': 'ocr.document',
+            'view_mode': 'list,form',
+            'domain': [('template_id', '=', self.id)],
+        }
+
+
+class OcrTemplateZone(models.Model):
+    _name = 'ocr.template.zone'
+    _description = 'OCR Template Zone'
+    _order = 'sequence, id'
+
+    template_id = fields.Many2one('ocr.template', string='Template', required=True, ondelete='cascade', index=True)
+    sequence = fields.Integer(string='Sequence', default=10)
+    name = fields.Char(string='Field Name', required=True, help="Technical name of the extracted value.")
+    label = fields.Char(string='Label')
+    # Fractions of the reference image width and height
+    x = fields.Float(string='Left', digits=(16, 4), required=True)
+    y = fields.Float(string='Top', digits=(16, 4), required=True)
+    width = fields.Float(string='Width', digits=(16, 4), required=True)
+    height = fields.Float(string='Height', digits=(16, 4), required=True)
+    multiline = fields.Boolean(string='Multi-line', help="Keep the line breaks of the zone text.")
+    config = fields.Char(string='Tesseract Config',
+                         help="Defaults to --psm 7 (a single line), or --psm 6 for multi-line zones.")
+
+    @api.constrains('x', 'y', 'width', 'height')
+    def _check_bounds(self):
+        for zone in self:
+            if zone.width <= 0 or zone.height <= 0 or zone.x < 0 or zone.y < 0 \
+                    or zone.x + zone.width > 1 or zone.y + zone.height > 1:
+                raise ValidationError(_(
+                    "Zone %s must lie within the reference image: its position and size are "
+                    "fractions (0 to 1) of the image width and height.", zone.name))
@@ -0,0 +1,2 @@
+# Pure OCR processing code. Nothing in this package touches the ORM so that
+# it can be executed in worker processes outside of the Odoo request.
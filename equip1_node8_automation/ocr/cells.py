@@ -0,0 +1,176 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Size the ink of a cell is compared at, the blur applied first (in
+# heights of its ink box) and the span sampled around the centre of the
+# ink (in standard deviations of the ink either way). Placing the ink by
+# its moments rather than by its bounding box keeps a pixel of noise on
+# its edge from stretching the whole signature.
+SIGNATURE_SIZE = (32, 8)
+SIGNATURE_BLUR = 0.1
+SIGNATURE_SPAN = 2.5
+# Ink components under this many pixels are scan noise, they would
+# stretch the ink box of the cell
+MIN_SPECK_AREA = 4
+# Cells whose signatures differ by at most this share of their ink are
+# recognised once. Noisy copies of a text differ by up to 0.04, different
+# texts ("price" and "prize") by 0.08 and more.
+SIGNATURE_TOLERANCE = 0.05
+
+_NEIGHBOURS = np.ones((3, 3), np.uint8)
+
+
+def cell_keys(gray, cells, options=None, known=()):
+    """Key of every cell for the per-cell OCR: None for a blank cell.
+
+    A cell is blank when the ink inside its borders covers less than
+    ``cell_blank_ratio`` of it, isolated specks of scan noise not counting
+    as ink. With ``cell_dedup`` cells which look the same (repeated
+    headers, "0", "-") share a key and are recognised once: the first of
+    them, or the ``known`` key (of a previous document) they look like,
+    gives its key to the others. Without it every cell has its own key.
+    """
+    options = options or {}
+    threshold = options.get('threshold', 150)
+    blank_ratio = options.get('cell_blank_ratio', 0.0005)
+    dedup = options.get('cell_dedup', True)
+    matcher = SignatureMatcher(known) if dedup else None
+
+    keys = []
+    for index, (x, y, w, h) in enumerate(cells):
+        # Leave the grid lines out
+        inset = max(3, min(w, h) // 12)
+        crop = gray[y + inset:y + h - inset, x + inset:x + w - inset]
+        if not crop.size:
+            keys.append(('cell', index))
+            continue
+        min_ink = max(1, blank_ratio * crop.size)
+        ink = (crop < threshold).view(np.uint8)
+        if np.count_nonzero(ink) >= min_ink:
+            ink = connected_ink(ink)
+        if np.count_nonzero(ink) < min_ink:
+            keys.append(None)
+        elif dedup:
+            keys.append(matcher.key(ink_signature(ink)))
+        else:
+            keys.append(('cell', index))
+    return keys
+
+
+def connected_ink(ink):
+    """Drop the ink pixels which have no ink pixel around them (salt noise).
+
+    Unlike an opening, strokes one pixel thin are kept.
+    """
+    neighbours = cv2.filter2D(ink, -1, _NEIGHBOURS, borderType=cv2.BORDER_CONSTANT)
+    return ink & (neighbours > 1)
+
+
+def ink_signature(ink):
+    """Signature of the ink of a cell, independent of its position and scale.
+
+    The ink, without the specks of noise around the text, is blurred and
+    sampled SIGNATURE_SPAN standard deviations around its centroid at
+    SIGNATURE_SIZE; the aspect ratio of its bounding box is kept apart so
+    that e.g. "-" and "—" are never compared.
+    """
+    count, labels, stats, _centroids = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    specks = stats[:, cv2.CC_STAT_AREA] < MIN_SPECK_AREA
+    specks[0] = True  # background
+    if not specks.all():
+        ink = (~specks)[labels].view(np.uint8)
+    x, y, w, h = cv2.boundingRect(ink)
+    moments = cv2.moments(ink, binaryImage=True)
+    cx = moments['m10'] / moments['m00']
+    cy = moments['m01'] / moments['m00']
+    sx = max(0.5, np.sqrt(moments['mu20'] / moments['m00']))
+    sy = max(0.5, np.sqrt(moments['mu02'] / moments['m00']))
+    width, height = SIGNATURE_SIZE
+    ax = 2 * SIGNATURE_SPAN * sx / width
+    ay = 2 * SIGNATURE_SPAN * sy / height
+    # Signature pixel (u, v) samples the ink at (cx + ax (u - width / 2), ...)
+    transform = np.float32([
+        [ax, 0, cx - ax * (width / 2 - 0.5)],
+        [0, ay, cy - ay * (height / 2 - 0.5)],
+    ])
+    blurred = cv2.GaussianBlur(ink.astype(np.float32), (0, 0), max(0.5, SIGNATURE_BLUR * h))
+    box = cv2.warpAffine(blurred, transform, SIGNATURE_SIZE,
+                         flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP, borderValue=0)
+    return round(4.0 * w / h), np.round(box * 255).astype(np.uint8)
+
+
+class SignatureMatcher:
+    """Key of an ink signature: the key of the first signature close enough to it.
+
+    Keys are ``(aspect, signature bytes)``, so the keys of a previous
+    document (e.g. those of the cell text cache) can be matched again.
+    """
+
+    def __init__(self, known=()):
+        # aspect -> keys, and their signatures and ink amounts
+        self._keys = {}
+        self._boxes = {}
+        self._inks = {}
+        for key in known:
+            aspect, data = key
+            self._add(key, aspect, np.frombuffer(data, np.uint8).reshape(SIGNATURE_SIZE[::-1]))
+
+    def key(self, signature):
+        aspect, box = signature
+        box = box.astype(np.float32)
+        ink = box.sum()
+        best_key, best_distance = None, SIGNATURE_TOLERANCE
+        # A pixel of noise can tip the aspect ratio into the next bucket
+        for near in (aspect, aspect - 1, aspect + 1):
+            boxes = self._boxes.get(near)
+            if not boxes:
+                continue
+            inks = np.asarray(self._inks[near])
+            distances = np.abs(np.stack(boxes) - box).sum(axis=(1, 2)) / np.maximum(1.0, (inks + ink) / 2)
+            index = int(np.argmin(distances))
+            if distances[index] <= best_distance:
+                best_key, best_distance = self._keys[near][index], distances[index]
+        if best_key is not None:
+            return best_key
+        key = (aspect, signature[1].tobytes())
+        self._add(key, aspect, box)
+        return key
+
+    def _add(self, key, aspect, box):
+        box = box.astype(np.float32)
+        self._keys.setdefault(aspect, []).append(key)
+        self._boxes.setdefault(aspect, []).append(box)
+        self._inks.setdefault(aspect, []).append(box.sum())
+
+
+class CellTextCache:
+    """Recognised text by cell hash, shared by the documents of a worker process"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+            return text
+
+    def put(self, key, text, max_size):
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def keys(self, prefix):
+        """Cell keys of the texts cached under ``prefix``, the key minus its last item"""
+        with self._lock:
+            return [key[-1] for key in self._entries if key[:-1] == prefix]
+
+
+cell_text_cache = CellTextCache()
@@ -0,0 +1,109 @@
+import pickle
+import socket
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Messages are pickles prefixed by their length. The socket is only
+# reachable by the user running Odoo, both ends are trusted.
+_HEADER = struct.Struct('!Q')
+
+
+class SidecarUnavailable(ConnectionError):
+    """The sidecar does not listen on its socket"""
+
+
+class RemoteError(Exception):
+    """A task failed in the sidecar, with the type and message of its exception"""
+
+
+def send_message(sock, message):
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def recv_message(sock):
+    size, = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return pickle.loads(_recv_exactly(sock, size))
+
+
+def _recv_exactly(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            raise EOFError("Connection closed by the peer")
+        received += count
+    return bytes(buffer)
+
+
+class SidecarClient:
+    """Runs the tasks of ``tasks.TASKS`` in the sidecar process.
+
+    Same interface as ``pool.LocalPool``: ``submit`` returns a future, and
+    up to ``max_workers`` tasks are in flight, each on its own connection.
+    Connections are kept open for the next tasks.
+    """
+
+    def __init__(self, path, max_workers, timeout=None):
+        self.path = path
+        self.timeout = timeout
+        self._threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ocr-sidecar')
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def submit(self, name, *args):
+        return self._threads.submit(self.call, name, *args)
+
+    def call(self, name, *args):
+        sock, reused = self._connect()
+        try:
+            send_message(sock, (name, args))
+            status, result = recv_message(sock)
+        except (BrokenPipeError, ConnectionResetError, EOFError):
+            sock.close()
+            if not reused:
+                raise
+            # The sidecar was restarted since the connection was opened
+            sock, _reused = self._connect(reuse=False)
+            try:
+                send_message(sock, (name, args))
+                status, result = recv_message(sock)
+            except BaseException:
+                sock.close()
+                raise
+        except BaseException:
+            # The answer of an interrupted call would be read by the next one
+            sock.close()
+            raise
+        with self._lock:
+            self._connections.append(sock)
+        if status == 'error':
+            raise RemoteError(result)
+        return result
+
+    def ping(self):
+        """Pid of the sidecar; raises SidecarUnavailable when it is not running"""
+        return self.call('ping')
+
+    def _connect(self, reuse=True):
+        with self._lock:
+            if reuse and self._connections:
+                return self._connections.pop(), True
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            sock.close()
+            raise SidecarUnavailable(f"No OCR sidecar listening on {self.path}") from e
+        return sock, False
+
+    def shutdown(self):
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            for sock in self._connections:
+                sock.close()
+            self._connections = []
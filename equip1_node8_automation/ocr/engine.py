@@ -0,0 +1,206 @@
+import itertools
+import logging
+import os
+import shlex
+import threading
+
+import numpy as np
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+_logger = logging.getLogger(__name__)
+
+# Keys of the image_to_data dictionaries, as returned by pytesseract
+DATA_KEYS = ('text', 'conf', 'left', 'top', 'width', 'height', 'block_num', 'par_num', 'line_num', 'word_num')
+
+# Tesseract's own defaults: fully automatic page segmentation, and the
+# LSTM engine when the trained data has it
+DEFAULT_PSM = 3
+DEFAULT_OEM = 3
+
+_page_tokens = itertools.count()
+
+
+class PageImage:
+    """A gray page handed to the OCR engines.
+
+    Cells and strips are passed as rectangles of the page rather than as
+    crops, so an engine which keeps the page loaded only receives it once.
+    """
+
+    def __init__(self, gray):
+        self.gray = gray
+        self.height, self.width = gray.shape[:2]
+        # Never reused, unlike id(): engines compare it to the page they hold
+        self.token = next(_page_tokens)
+        self._buffer = None
+        self._lock = threading.Lock()
+
+    @property
+    def buffer(self):
+        """Raw 8 bit rows of the page, built once and shared by every thread"""
+        with self._lock:
+            if self._buffer is None:
+                self._buffer = np.ascontiguousarray(self.gray).tobytes()
+            return self._buffer
+
+    def crop(self, rect):
+        if rect is None:
+            return self.gray
+        x, y, w, h = rect
+        return self.gray[y:y + h, x:x + w]
+
+
+class PytesseractEngine:
+    """Runs the tesseract binary for every call: an image file is written
+    and a process is spawned each time. Always available, and the only
+    engine which can stop a call on ``timeout``.
+    """
+
+    name = 'pytesseract'
+
+    def image_to_string(self, page, lang='eng', config='', rect=None, timeout=0):
+        return pytesseract.image_to_string(
+            Image.fromarray(page.crop(rect)), lang=lang, config=config, timeout=timeout or 0)
+
+    def image_to_data(self, page, lang='eng', config='', rect=None):
+        return pytesseract.image_to_data(
+            Image.fromarray(page.crop(rect)), lang=lang, config=config, output_type=pytesseract.Output.DICT)
+
+
+class TesserocrEngine:
+    """Calls libtesseract in process through tesserocr.
+
+    Each thread keeps its own initialised API handles (one per language,
+    engine mode and variables), the trained data is loaded once per thread
+    instead of once per call. A handle keeps the last page it was given
+    and only moves its rectangle for the next cell of that page. Calls
+    cannot be interrupted, ``timeout`` is ignored.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def image_to_string(self, page, lang='eng', config='', rect=None, timeout=0):
+        return self._prepare(page, lang, config, rect).GetUTF8Text()
+
+    def image_to_data(self, page, lang='eng', config='', rect=None):
+        api = self._prepare(page, lang, config, rect)
+        api.Recognize()
+        data = {key: [] for key in DATA_KEYS}
+        iterator = api.GetIterator()
+        if iterator is None:
+            return data
+
+        level = tesserocr.RIL.WORD
+        left, top = rect[:2] if rect else (0, 0)
+        block_num = par_num = line_num = word_num = 0
+        for word in tesserocr.iterate_level(iterator, level):
+            if word.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+                block_num, par_num = block_num + 1, 0
+            if word.IsAtBeginningOf(tesserocr.RIL.PARA):
+                par_num, line_num = par_num + 1, 0
+            if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                line_num, word_num = line_num + 1, 0
+            word_num += 1
+            box = word.BoundingBox(level)
+            if box is None:
+                continue
+            x1, y1, x2, y2 = box
+            # Same coordinates as pytesseract on the cropped rectangle
+            values = (word.GetUTF8Text(level) or '', word.Confidence(level), x1 - left, y1 - top,
+                      x2 - x1, y2 - y1, block_num, par_num, line_num, word_num)
+            for key, value in zip(DATA_KEYS, values):
+                data[key].append(value)
+        return data
+
+    def _prepare(self, page, lang, config, rect):
+        config = parse_config(config)
+        local = self._local
+        # Handles of the parent process are useless in a forked worker
+        if getattr(local, 'pid', None) != os.getpid():
+            local.pid = os.getpid()
+            local.handles = {}
+            local.pages = {}
+
+        key = (lang, config['oem'], config['path'], config['variables'])
+        api = local.handles.get(key)
+        if api is None:
+            kwargs = {'path': config['path']} if config['path'] else {}
+            api = local.handles[key] = tesserocr.PyTessBaseAPI(
+                lang=lang, oem=config['oem'], variables=dict(config['variables']), **kwargs)
+        if local.pages.get(key) != page.token:
+            api.SetImageBytes(page.buffer, page.width, page.height, 1, page.width)
+            local.pages[key] = page.token
+        api.SetPageSegMode(config['psm'])
+        x, y, w, h = rect or (0, 0, page.width, page.height)
+        api.SetRectangle(x, y, w, h)
+        return api
+
+
+class NullEngine:
+    """Recognises nothing, instantly. Selected with the 'none' engine to
+    time the image stages of the pipeline alone (benchmarks/run.py --no-ocr).
+    """
+
+    name = 'none'
+
+    def image_to_string(self, page, lang='eng', config='', rect=None, timeout=0):
+        return ''
+
+    def image_to_data(self, page, lang='eng', config='', rect=None):
+        return {key: [] for key in DATA_KEYS}
+
+
+def parse_config(config):
+    """Translate a tesseract command line config for the API handles"""
+    parsed = {'psm': DEFAULT_PSM, 'oem': DEFAULT_OEM, 'path': None}
+    variables = {}
+    args = iter(shlex.split(config or ''))
+    for arg in args:
+        if arg == '--psm':
+            parsed['psm'] = int(next(args))
+        elif arg == '--oem':
+            parsed['oem'] = int(next(args))
+        elif arg == '--tessdata-dir':
+            parsed['path'] = next(args)
+        elif arg == '--dpi':
+            variables['user_defined_dpi'] = next(args)
+        elif arg == '-c':
+            name, _sep, value = next(args).partition('=')
+            variables[name] = value
+        else:
+            _logger.debug("Ignoring tesseract argument %r", arg)
+    parsed['variables'] = tuple(sorted(variables.items()))
+    return parsed
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(options=None):
+    """The engine selected by the ``ocr_engine`` option.
+
+    'auto' (the default) uses tesserocr when it is installed; asking for
+    tesserocr without it installed falls back to pytesseract.
+    """
+    name = (options or {}).get('ocr_engine', 'auto')
+    with _engines_lock:
+        if name not in _engines:
+            if name == 'none':
+                _engines[name] = NullEngine()
+            elif name in ('auto', 'tesserocr') and tesserocr is not None:
+                _engines[name] = TesserocrEngine()
+            else:
+                if name == 'tesserocr':
+                    _logger.warning("tesserocr is not installed, falling back to pytesseract")
+                _engines[name] = PytesseractEngine()
+        return _engines[name]
@@ -0,0 +1,88 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+# Tesseract runs outside of the GIL (in a subprocess or in C code), so a
+# thread pool is enough to use every core for cell OCR.
+_threads = None
+_threads_size = 0
+_threads_lock = threading.Lock()
+
+# Limits how many documents fan out over the cell threads at the same time.
+# The job runner replaces it by a semaphore shared by all its pool processes.
+_document_slots = None
+
+
+def set_document_slots(semaphore):
+    global _document_slots
+    _document_slots = semaphore
+
+
+def _get_document_slots(max_documents):
+    global _document_slots
+    with _threads_lock:
+        if _document_slots is None:
+            _document_slots = threading.BoundedSemaphore(max_documents)
+        return _document_slots
+
+
+def _get_threads(workers):
+    global _threads, _threads_size
+    with _threads_lock:
+        if _threads is None or _threads_size != workers:
+            if _threads is not None:
+                _threads.shutdown(wait=False, cancel_futures=True)
+            _threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ocr-cell')
+            _threads_size = workers
+        return _threads
+
+
+class CellOcrExecutor:
+    """Run a function over cell crops in parallel, keeping the input order.
+
+    ``timeout`` bounds the whole document: cells which did not start in time
+    are cancelled and ``TimeoutError`` is raised. The remaining time is
+    handed to each call so that it can stop its own tesseract process.
+    """
+
+    def __init__(self, workers=1, timeout=0, max_documents=1):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_documents = max(1, max_documents)
+
+    def map(self, func, items):
+        items = list(items)
+        if self.workers == 1 or len(items) < 2:
+            deadline = self._deadline()
+            return [self._call(func, item, deadline) for item in items]
+
+        slots = _get_document_slots(self.max_documents)
+        if not slots.acquire(timeout=self.timeout or None):
+            raise TimeoutError("No slot available for parallel cell OCR")
+        try:
+            deadline = self._deadline()
+            threads = _get_threads(self.workers)
+            futures = [threads.submit(self._call, func, item, deadline) for item in items]
+            done, not_done = wait(futures, timeout=self._remaining(deadline), return_when=FIRST_EXCEPTION)
+            if not_done:
+                for future in not_done:
+                    future.cancel()
+                # Propagate the first failure, or report the timeout.
+                for future in done:
+                    future.result()
+                raise TimeoutError(f"Cell OCR did not finish within {self.timeout}s")
+            return [future.result() for future in futures]
+        finally:
+            slots.release()
+
+    def _call(self, func, item, deadline):
+        remaining = self._remaining(deadline)
+        if remaining is not None and remaining <= 0:
+            raise TimeoutError(f"Cell OCR did not finish within {self.timeout}s")
+        return func(item, remaining)
+
+    def _deadline(self):
+        return time.monotonic() + self.timeout if self.timeout else None
+
+    def _remaining(self, deadline):
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
@@ -0,0 +1,108 @@
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+# Collector of the page being processed. A worker process runs one page at a
+# time, so a module global is enough; stages are only timed from the thread
+# which started the collection, counts may come from the cell threads.
+_active = None
+_counts_lock = threading.Lock()
+
+
+def current_rss_mb():
+    """Resident memory of this process, in MB (0 when it cannot be read)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def reset_peak_rss():
+    """Restart the peak memory measure of this process, False when the kernel cannot (Linux < 4.0)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process since ``reset_peak_rss``, in MB.
+
+    The kernel tracks it on every allocation, so the short spikes inside
+    a stage are included. Without /proc, the peak of the whole process
+    life is returned instead.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class PageMetrics:
+    """Wall time per stage, counters and peak memory of one page.
+
+    Stage times are exclusive: a stage nested in another one (e.g. the line
+    morphology computed lazily by the grid detection) is not counted twice.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counts = {}
+        self.peak_rss_mb = 0.0
+        self._thread = threading.get_ident()
+        self._nested = []
+
+    def as_dict(self):
+        return {
+            'stages': dict(self.stages),
+            'counts': dict(self.counts),
+            'peak_rss_mb': self.peak_rss_mb,
+        }
+
+
+@contextmanager
+def collect():
+    """Collect the metrics of the stages run inside the block"""
+    global _active
+    previous, _active = _active, PageMetrics()
+    reset_peak_rss()
+    try:
+        yield _active
+    finally:
+        _active.peak_rss_mb = peak_rss_mb()
+        _active = previous
+
+
+@contextmanager
+def stage(name):
+    metrics = _active
+    if metrics is None or metrics._thread != threading.get_ident():
+        yield
+        return
+    start = time.perf_counter()
+    metrics._nested.append(0.0)
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = metrics._nested.pop()
+        metrics.stages[name] = metrics.stages.get(name, 0.0) + elapsed - nested
+        if metrics._nested:
+            metrics._nested[-1] += elapsed
+
+
+def count(name, value=1):
+    metrics = _active
+    if metrics is not None:
+        with _counts_lock:
+            metrics.counts[name] = metrics.counts.get(name, 0) + value
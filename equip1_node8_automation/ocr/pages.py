@@ -0,0 +1,76 @@
+import io
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .tiling import load_image
+
+try:
+    import pdf2image
+except ImportError:
+    pdf2image = None
+
+
+def is_pdf(source):
+    if isinstance(source, str):
+        with open(source, 'rb') as source_file:
+            head = source_file.read(5)
+    else:
+        head = source[:5]
+    return head.startswith(b'%PDF')
+
+
+def _open(source):
+    return Image.open(source if isinstance(source, str) else io.BytesIO(source))
+
+
+def _check_pdf_support():
+    if pdf2image is None:
+        raise ValueError("pdf2image (and poppler) must be installed to process PDF files")
+
+
+def count_pages(source):
+    """Number of pages of a PDF, frames of a TIFF (1 for any other image)"""
+    if is_pdf(source):
+        _check_pdf_support()
+        if isinstance(source, str):
+            info = pdf2image.pdfinfo_from_path(source)
+        else:
+            info = pdf2image.pdfinfo_from_bytes(source)
+        return int(info['Pages'])
+    with _open(source) as image:
+        return getattr(image, 'n_frames', 1)
+
+
+def load_page(source, index, options=None):
+    """Decode a single page (0-based) as a BGR array, without decoding the other ones"""
+    options = options or {}
+    if is_pdf(source):
+        _check_pdf_support()
+        kwargs = {'dpi': options.get('pdf_dpi', 300), 'first_page': index + 1, 'last_page': index + 1}
+        if isinstance(source, str):
+            page = pdf2image.convert_from_path(source, **kwargs)[0]
+        else:
+            page = pdf2image.convert_from_bytes(source, **kwargs)[0]
+        return _to_bgr(page, options)
+
+    with _open(source) as image:
+        if getattr(image, 'n_frames', 1) == 1:
+            # Plain images can use the reduced decoding of OpenCV
+            return load_image(source, options)
+        image.seek(index)
+        return _to_bgr(image, options)
+
+
+def _to_bgr(image, options):
+    # Bilevel (fax) TIFF frames cannot be reduced as is
+    image = image.convert('RGB')
+    max_pixels = options.get('max_pixels', 0)
+    width, height = image.size
+    if max_pixels and width * height > max_pixels:
+        factor = 2
+        while (width // factor) * (height // factor) > max_pixels:
+            factor *= 2
+        image = image.reduce(factor)
+    return cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
@@ -0,0 +1,500 @@
+import cv2
+import numpy as np
+
+from . import metrics, templates
+from .cells import cell_keys, cell_text_cache
+from .engine import PageImage, get_engine
+from .executor import CellOcrExecutor
+from .pages import count_pages, load_page
+from .preprocess import MemoryBudgetExceeded, PreprocessedImage, preprocess
+from .tiling import check_memory, data_to_text, image_to_data, use_tiles
+from .writer import MIMETYPES, TableWriter
+
+
+def run_ocr(image_source, options=None):
+    """Run the full OCR pipeline on an image file path or raw (not base64) bytes.
+
+    Every page of the image is processed one after the other; the job
+    runner processes the pages of a document in parallel with ``run_page``
+    and ``write_pages`` instead.
+    """
+    pages = [run_page(image_source, index, options) for index in range(count_pages(image_source))]
+    return pages_result(pages, write_pages(pages, options), options)
+
+
+def run_page(image_source, page_index, options=None):
+    """OCR one page of an image file path or raw (not base64) bytes.
+
+    This is the entry point executed by the job workers, so it only takes
+    and returns plain picklable values. The page is decoded once and every
+    stage works on that single copy. The text or the table of the page is
+    returned with the time spent in each stage (``metrics``),
+    ``write_pages`` turns the pages into the output file.
+    """
+    with metrics.collect() as page_metrics:
+        page, (height, width) = _run_page(image_source, page_index, options)
+    page['metrics'] = dict(page_metrics.as_dict(), width=width, height=height)
+    return page
+
+
+def _run_page(image_source, page_index, options=None):
+    options = options or {}
+
+    with metrics.stage('decode'):
+        image = load_page(image_source, page_index, options)
+    shape = image.shape[:2]
+    check_memory(options, "decoding")
+
+    prep = preprocess(image, options)
+    del image
+    # Grid detection reads the binary image (and the line masks when its fast
+    # path is not conclusive), then either the table extraction reads the
+    # gray image and the line masks or the page OCR reads the gray image;
+    # each stage releases what it used when it is done.
+    prep.retain('binary')
+    prep.retain('gray', 'horizontal', 'vertical')
+    table = confidences = None
+    try:
+        if options.get('templates'):
+            # A known form: only its zones are read, the rest of the page is skipped
+            with metrics.stage('template_match'):
+                match = templates.match_template(prep.get('gray'), options)
+            if match:
+                with metrics.stage('zone_ocr'):
+                    values = templates.read_zones(prep.get('gray'), match, options)
+                return template_page(page_index, match, values), shape
+
+        has_grid = detect_grid_lines(prep, options)
+        check_memory(options, "grid detection")
+        if has_grid:
+            # The text of a table comes from its cells, unless the layout
+            # of the whole page is explicitly wanted as well
+            page_ocr = options.get('grid_page_text', 'cells') == 'ocr'
+            if page_ocr:
+                prep.retain('gray')
+            grid, rows = locate_grid_cells(prep)
+            table, confidences = ocr_grid_cells(prep, grid, rows, options)
+            if page_ocr:
+                with prep.use('gray') as gray, metrics.stage('page_ocr'):
+                    raw_text = ocr_page_text(gray, options)
+            else:
+                raw_text = table_to_text(table)
+        else:
+            prep.release('horizontal', 'vertical')
+            with prep.use('gray') as gray, metrics.stage('page_ocr'):
+                raw_text = ocr_page_text(gray, options)
+        check_memory(options, "OCR")
+    finally:
+        prep.close()
+
+    return {
+        'page': page_index,
+        'raw_text': raw_text,
+        'has_grid_lines': has_grid,
+        # Cell texts by row for grid pages, None for text pages
+        'table': table,
+        # Mean word confidence of each cell of the table, None when unknown
+        'confidences': confidences,
+        'template_id': False,
+        'fields': [],
+    }, shape
+
+
+def template_page(page_index, match, values):
+    """Page result of a page read through the zones of a template"""
+    return {
+        'page': page_index,
+        'raw_text': '\n'.join(f"{zone['label']}: {text}" for zone, text in values),
+        'has_grid_lines': False,
+        # A row per zone, written as a two column table
+        'table': [[zone['label'], text] for zone, text in values],
+        'confidences': None,
+        'template_id': match.template['id'],
+        'fields': [{'zone_id': zone['id'], 'name': zone['name'], 'label': zone['label'], 'value': text}
+                   for zone, text in values],
+    }
+
+
+def pages_result(pages, output_path, options=None):
+    """Document level result of its processed pages"""
+    options = options or {}
+    output_format = options.get('output_format', 'xlsx')
+    return {
+        'raw_text': '\f'.join(page['raw_text'] for page in pages),
+        'has_grid_lines': any(page['has_grid_lines'] for page in pages),
+        'page_count': len(pages),
+        # Template the first form page matched, and the zone values of every page
+        'template_id': next((page['template_id'] for page in pages if page['template_id']), False),
+        'fields': [dict(field, page=page['page']) for page in pages for field in page['fields']],
+        'cells': [cell for page in pages for cell in page_cells(page)],
+        # Path of the xlsx/csv file, to be moved into the filestore by the caller
+        'output_path': output_path,
+        'output_format': output_format,
+        'output_mimetype': MIMETYPES[output_format],
+    }
+
+
+def page_cells(page):
+    """Searchable ``(page, row, col, text, confidence)`` rows of a page.
+
+    The non-empty cells of its table, or the non-empty lines of a text page
+    (in column 0). The confidence is None when the OCR did not report it.
+    """
+    if page['table'] is not None:
+        confidences = page.get('confidences') or [[None] * len(row) for row in page['table']]
+        return [
+            (page['page'], row_index, col_index, text, confidence)
+            for row_index, (row, row_confidences) in enumerate(zip(page['table'], confidences))
+            for col_index, (text, confidence) in enumerate(zip(row, row_confidences))
+            if text.strip()
+        ]
+    return [
+        (page['page'], row_index, 0, line.strip(), None)
+        for row_index, line in enumerate(page['raw_text'].split('\n'))
+        if line.strip()
+    ]
+
+
+def write_pages(pages, options=None):
+    """Stream the pages into one output file, a sheet per page, and return its path"""
+    with _open_writer(options) as writer:
+        for page in pages:
+            if len(pages) > 1:
+                writer.add_sheet(f"Page {page['page'] + 1}")
+            elif page['table'] is not None:
+                writer.add_sheet("Extracted Table")
+            else:
+                writer.add_sheet("Extracted Text")
+            _write_page(writer, page)
+    return writer.path
+
+
+def _write_page(writer, page):
+    if page['table'] is not None:
+        # Add each cell text with border
+        for row in page['table']:
+            writer.write_row(row, bordered=True)
+    elif page['raw_text']:
+        # One line per row, empty lines are kept as empty rows
+        for line in page['raw_text'].split('\n'):
+            writer.write_row([line] if line.strip() else [])
+
+
+def ocr_page_text(gray, options=None):
+    """Plain text of the whole page"""
+    options = options or {}
+    if use_tiles(gray, options):
+        return data_to_text(image_to_data(gray, options, options.get('text_config', '')))
+    metrics.count('ocr_calls')
+    return get_engine(options).image_to_string(
+        PageImage(gray), lang=options.get('lang', 'eng'), config=options.get('text_config', ''))
+
+
+def table_to_text(table):
+    """Plain text of an extracted table: a line per row, cells separated by tabs"""
+    return '\n'.join('\t'.join(' '.join(text.split()) for text in row).rstrip('\t') for row in table)
+
+
+def detect_grid_lines(image, options=None):
+    """Detect if the image has grid lines like an Excel sheet"""
+    options = options or {}
+    prep = _standalone(image, options, 'binary')
+    try:
+        if options.get('grid_fast_path', True):
+            with prep.use('binary') as binary, metrics.stage('grid_fast'):
+                has_grid = classify_grid_fast(binary, options)
+            if has_grid is not None:
+                return has_grid
+        else:
+            prep.release('binary')
+
+        # Ambiguous (or fast path disabled): count the lines at full resolution
+        prep.retain('horizontal', 'vertical')
+        with prep.use('horizontal', 'vertical') as (horizontal_lines, vertical_lines), metrics.stage('hough'):
+            # Count lines
+            h_lines = cv2.HoughLinesP(horizontal_lines, 1, np.pi/180, threshold=100, minLineLength=100, maxLineGap=10)
+            v_lines = cv2.HoughLinesP(vertical_lines, 1, np.pi/180, threshold=100, minLineLength=100, maxLineGap=10)
+
+        # Check if we have enough lines to consider it a grid
+        h_count = 0 if h_lines is None else len(h_lines)
+        v_count = 0 if v_lines is None else len(v_lines)
+
+        return h_count >= 3 and v_count >= 3
+    except MemoryBudgetExceeded:
+        raise
+    except Exception:
+        return False
+
+
+def classify_grid_fast(binary, options=None, min_line_length=100, line_kernel=25):
+    """Guess the grid decision from projection profiles of a downscaled mask.
+
+    The binary image is max-pooled (so one pixel wide lines survive) down to
+    most ``grid_fast_max_side`` pixels, opened with the scaled line kernels,
+    and the rows/columns holding enough line pixels are counted. Returns
+    True or False when the counts are clearly above or below the three lines
+    needed in each direction, and None when only the Hough transform at full
+    resolution can tell.
+    """
+    options = options or {}
+    factor = max(1, -(-max(binary.shape) // options.get('grid_fast_max_side', 1000)))
+    small = binary
+    if factor > 1:
+        # Area averaging then "any ink" is a max-pool, without a Python loop
+        small = cv2.resize(binary, (binary.shape[1] // factor, binary.shape[0] // factor),
+                           interpolation=cv2.INTER_AREA)
+        _, small = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY)
+
+    kernel_length = max(3, line_kernel // factor)
+    horizontal = cv2.morphologyEx(
+        small, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_length, 1)), iterations=2)
+    vertical = cv2.morphologyEx(
+        small, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, kernel_length)), iterations=2)
+
+    # Length of line pixels on each row / column, in downscaled pixels
+    row_profile = np.count_nonzero(horizontal, axis=1)
+    col_profile = np.count_nonzero(vertical, axis=0)
+    min_length = min_line_length / factor
+
+    def count_lines(profile, length):
+        # Adjacent rows over the threshold are the same (thick) line
+        on = np.concatenate(([0], (profile >= length).astype(np.int8)))
+        return int(np.count_nonzero(np.diff(on) == 1))
+
+    if count_lines(row_profile, 2 * min_length) >= 3 and count_lines(col_profile, 2 * min_length) >= 3:
+        return True
+    if count_lines(row_profile, min_length / 2) < 3 or count_lines(col_profile, min_length / 2) < 3:
+        return False
+    return None
+
+
+def process_grid_image(image, options=None):
+    """Process image with grid lines to extract table structure"""
+    return write_grid_workbook(extract_grid_table(image, options), options)
+
+
+def extract_grid_table(image, options=None):
+    """Cell texts of a grid image, by row"""
+    options = options or {}
+    prep = _standalone(image, options, 'gray', 'horizontal', 'vertical')
+    grid, rows = locate_grid_cells(prep)
+    return ocr_grid_cells(prep, grid, rows, options)[0]
+
+
+def locate_grid_cells(prep):
+    """Grid mask and cell rows of a preprocessed image, releases the line masks"""
+    # Combine horizontal and vertical lines to get grid, the masks are not
+    # needed anymore afterwards
+    with prep.use('horizontal', 'vertical') as (horizontal_lines, vertical_lines):
+        grid = cv2.add(horizontal_lines, vertical_lines)
+    with metrics.stage('contours'):
+        rows = find_grid_cells(grid, prep.shape)
+    metrics.count('cells', sum(len(row) for row in rows))
+    return grid, rows
+
+
+def ocr_grid_cells(prep, grid, rows, options=None):
+    """Cell texts and confidences by row, releases the gray image"""
+    options = options or {}
+    with prep.use('gray') as gray, metrics.stage('cell_ocr'):
+        if options.get('grid_ocr_mode', 'page') == 'cell':
+            return ocr_cells_per_cell(gray, rows, options)
+        return ocr_cells_single_pass(gray, grid, rows, options)
+
+
+def _standalone(image, options, *names):
+    """Accept a bare decoded image for stages called outside of run_ocr"""
+    if isinstance(image, PreprocessedImage):
+        return image
+    prep = preprocess(image, options)
+    prep.retain(*names)
+    return prep
+
+
+def find_grid_cells(grid, shape):
+    """Return the cell rectangles of a grid mask grouped into sorted rows"""
+    # Find contours in the grid
+    contours, _ = cv2.findContours(grid, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+
+    # Filter contours to get cells (rectangles)
+    cells = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w > 20 and h > 20 and w < shape[1] * 0.9 and h < shape[0] * 0.9:
+            cells.append((x, y, w, h))
+
+    # Sort cells by position (top to bottom, left to right)
+    cells.sort(key=lambda c: (c[1], c[0]))
+
+    # Group cells into rows based on y-coordinate
+    rows = []
+    current_row = []
+    current_y = -1
+
+    for cell in cells:
+        x, y, w, h = cell
+        if current_y == -1 or abs(y - current_y) < 10:
+            current_row.append(cell)
+            current_y = y
+        else:
+            if current_row:
+                # Sort cells in row by x-coordinate
+                current_row.sort(key=lambda c: c[0])
+                rows.append(current_row)
+            current_row = [cell]
+            current_y = y
+
+    if current_row:
+        current_row.sort(key=lambda c: c[0])
+        rows.append(current_row)
+
+    return rows
+
+
+def ocr_cells_per_cell(gray, rows, options=None):
+    """OCR every cell crop separately (one tesseract call per cell)
+
+    Blank cells are not sent to tesseract, and cells which look the same
+    are recognised once (see ``cells.cell_keys``); with ``cell_cache_size``
+    the texts are also kept for the next documents of the worker. The
+    cells are spread over ``cell_workers`` threads; the table keeps the
+    order of ``rows`` whatever the order the cells complete in.
+    """
+    options = options or {}
+    lang = options.get('lang', 'eng')
+    config = options.get('cell_config', '--psm 6')  # Assume a single uniform block of text
+    engine = get_engine(options)
+    page = PageImage(gray)
+    # Only hashed cells can be reused by other documents
+    cache_size = options.get('cell_cache_size', 0) if options.get('cell_dedup', True) else 0
+
+    def ocr_cell(cell, timeout):
+        metrics.count('ocr_calls')
+        return engine.image_to_string(page, lang=lang, config=config, rect=cell, timeout=timeout).strip()
+
+    all_cells = [cell for row in rows for cell in row]
+    cache_prefix = (engine.name, lang, config)
+    # Cells looking like one recognised for a previous document reuse its key
+    keys = cell_keys(gray, all_cells, options, known=cell_text_cache.keys(cache_prefix) if cache_size else ())
+    metrics.count('blank_cells', keys.count(None))
+
+    # One cell to recognise per key, the texts already known are reused
+    texts_by_key = {None: ''}
+    pending = {}
+    for cell, key in zip(all_cells, keys):
+        if key in texts_by_key or key in pending:
+            continue
+        cached = cell_text_cache.get(cache_prefix + (key,)) if cache_size else None
+        if cached is not None:
+            texts_by_key[key] = cached
+        else:
+            pending[key] = cell
+    metrics.count('duplicate_cells', len(all_cells) - keys.count(None) - len(pending))
+
+    cell_executor = CellOcrExecutor(
+        workers=options.get('cell_workers', 1),
+        timeout=options.get('cell_timeout', 0),
+        max_documents=options.get('cell_max_documents', 1),
+    )
+    for key, text in zip(pending, cell_executor.map(ocr_cell, list(pending.values()))):
+        texts_by_key[key] = text
+        if cache_size:
+            cell_text_cache.put(cache_prefix + (key,), text, cache_size)
+
+    texts = iter(texts_by_key[key] for key in keys)
+    # Plain text output, tesseract does not report a confidence
+    return [[next(texts) for _cell in row] for row in rows], [[None] * len(row) for row in rows]
+
+
+def ocr_cells_single_pass(gray, grid, rows, options=None):
+    """OCR the whole page once and distribute the words over the cells.
+
+    The grid lines are blanked out first so tesseract's layout analysis
+    does not read them as characters.
+    """
+    options = options or {}
+    page = gray.copy()
+    page[grid > 0] = 255
+
+    data = image_to_data(page, options, options.get('grid_page_config', '--psm 11'))
+
+    index = CellIndex([cell for row in rows for cell in row])
+    words = [[] for _i in range(len(index.cells))]
+    confs = [[] for _i in range(len(index.cells))]
+    for i, text in enumerate(data['text']):
+        text = text.strip()
+        if not text or float(data['conf'][i]) < 0:
+            continue
+        left, top = data['left'][i], data['top'][i]
+        width, height = data['width'][i], data['height'][i]
+        cell_idx = index.lookup(left + width / 2.0, top + height / 2.0)
+        if cell_idx is not None:
+            words[cell_idx].append((top, left, height, text))
+            confs[cell_idx].append(float(data['conf'][i]))
+
+    table = []
+    confidences = []
+    cell_idx = 0
+    for row in rows:
+        texts = []
+        row_confidences = []
+        for _cell in row:
+            texts.append(_join_words(words[cell_idx]))
+            cell_confs = confs[cell_idx]
+            row_confidences.append(sum(cell_confs) / len(cell_confs) if cell_confs else None)
+            cell_idx += 1
+        table.append(texts)
+        confidences.append(row_confidences)
+    return table, confidences
+
+
+class CellIndex:
+    """Uniform bucket grid over cell rectangles for point-in-cell lookups"""
+
+    def __init__(self, cells):
+        self.cells = cells
+        self.buckets = {}
+        if not cells:
+            self.size = 1
+            return
+        heights = sorted(h for _x, _y, _w, h in cells)
+        self.size = max(1, heights[len(heights) // 2])
+        for idx, (x, y, w, h) in enumerate(cells):
+            for bx in range(x // self.size, (x + w) // self.size + 1):
+                for by in range(y // self.size, (y + h) // self.size + 1):
+                    self.buckets.setdefault((bx, by), []).append(idx)
+
+    def lookup(self, px, py):
+        """Return the index of the smallest cell containing the point"""
+        best, best_area = None, None
+        for idx in self.buckets.get((int(px) // self.size, int(py) // self.size), ()):
+            x, y, w, h = self.cells[idx]
+            if x <= px < x + w and y <= py < y + h and (best is None or w * h < best_area):
+                best, best_area = idx, w * h
+        return best
+
+
+def _join_words(words):
+    """Rebuild the text of a cell from its word boxes, line by line"""
+    lines = []
+    for top, left, height, text in sorted(words):
+        if lines and abs(top - lines[-1][0]) < max(height, lines[-1][1]) / 2.0:
+            lines[-1][2].append((left, text))
+        else:
+            lines.append([top, height, [(left, text)]])
+    return '\n'.join(' '.join(text for _left, text in sorted(line[2])) for line in lines)
+
+
+def write_grid_workbook(table, options=None):
+    """Stream the extracted table into the output file and return its path"""
+    return write_pages([{'page': 0, 'raw_text': '', 'has_grid_lines': True, 'table': table}], options)
+
+
+def process_text_image(raw_text, options=None):
+    """Process image as regular text (no grid lines)"""
+    return write_pages([{'page': 0, 'raw_text': raw_text, 'has_grid_lines': False, 'table': None}], options)
+
+
+def _open_writer(options):
+    options = options or {}
+    return TableWriter(options.get('output_format', 'xlsx'), options.get('output_dir'))
@@ -0,0 +1,134 @@
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from . import executor, tasks
+from .client import SidecarClient, SidecarUnavailable
+
+_logger = logging.getLogger(__name__)
+
+# One bounded pool per Odoo worker process. It is created lazily so that
+# HTTP workers which never run OCR jobs do not fork any children.
+_pool = None
+_pool_size = None
+_pool_lock = threading.Lock()
+
+# The executor of the job runner: the pool above, or the sidecar client
+_executor = None
+_executor_key = None
+_executor_lock = threading.Lock()
+
+
+def get_process_pool(max_workers, max_cell_documents=1):
+    """Return the shared process pool, (re)creating it when its sizing changes.
+
+    ``max_cell_documents`` is the number of documents allowed to run their
+    cell OCR in parallel at the same time, across all the pool processes.
+    """
+    global _pool, _pool_size
+    size = (max_workers, max_cell_documents)
+    with _pool_lock:
+        if _pool is None or _pool_size != size:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            context = multiprocessing.get_context()
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(context.BoundedSemaphore(max_cell_documents),),
+            )
+            _pool_size = size
+        return _pool
+
+
+def _init_worker(document_slots):
+    # A process group of its own, so that killing it also stops the
+    # tesseract processes it started
+    os.setpgrp()
+    executor.set_document_slots(document_slots)
+
+
+def reset_process_pool():
+    """Drop the shared pool, e.g. after a child crashed and broke it.
+
+    Its processes are killed: after a timeout they may still be stuck on
+    a page, and a new pool would otherwise run next to them.
+    """
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is not None:
+            processes = list((_pool._processes or {}).values())
+            _pool.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                _kill(process)
+        _pool = None
+        _pool_size = None
+
+
+def _kill(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        # Exited, or killed before it had its own process group
+        process.kill()
+
+
+class LocalPool:
+    """Runs the tasks of ``tasks.TASKS`` in the process pool of this Odoo worker.
+
+    The OCR stack is only imported in the pool processes.
+    """
+
+    def __init__(self, max_workers, max_cell_documents=1):
+        self.size = (max_workers, max_cell_documents)
+
+    def submit(self, name, *args):
+        return get_process_pool(*self.size).submit(tasks.run, name, *args)
+
+    def call(self, name, *args):
+        return self.submit(name, *args).result()
+
+    def shutdown(self):
+        reset_process_pool()
+
+
+def get_executor(max_workers, max_cell_documents=1, socket_path=None, timeout=None):
+    """The sidecar listening on ``socket_path``, or the local process pool.
+
+    Falls back to the local pool when no sidecar is running, so that
+    documents keep being processed while it is restarted.
+    """
+    global _executor, _executor_key
+    key = (max_workers, max_cell_documents, socket_path, timeout)
+    with _executor_lock:
+        if _executor is not None and _executor_key != key:
+            _executor.shutdown()
+            _executor = None
+        if _executor is None:
+            _executor = SidecarClient(socket_path, max_workers, timeout) if socket_path \
+                else LocalPool(max_workers, max_cell_documents)
+            _executor_key = key
+        current = _executor
+    if isinstance(current, SidecarClient):
+        try:
+            current.ping()
+        except SidecarUnavailable as e:
+            _logger.warning("%s, processing in the local pool", e)
+            return LocalPool(max_workers, max_cell_documents)
+    return current
+
+
+def reset_executor():
+    """Drop the executor after a failure; a new one is created by the next run."""
+    global _executor, _executor_key
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = None
+        _executor_key = None
+    # The local pool may be in use as a fallback of the sidecar
+    reset_process_pool()
@@ -0,0 +1,149 @@
+from contextlib import contextmanager
+
+import cv2
+
+from . import metrics
+from .tiling import apply_tiled, use_tiles
+
+
+class MemoryBudgetExceeded(MemoryError):
+    pass
+
+
+class PreprocessedImage:
+    """Intermediate images shared by the pipeline stages.
+
+    Every intermediate (gray, binary and the two line masks) is computed at
+    most once, on first use. Stages declare upfront how many times they will
+    read an intermediate with ``retain`` and give it back with ``release`` or
+    ``use``. An intermediate is dropped as soon as nobody holds it anymore
+    and nothing still to be computed depends on it, so e.g. the binary image
+    goes away once both line masks exist.
+    """
+
+    # intermediate -> intermediates it is computed from
+    DEPENDS = {
+        'gray': (),
+        'binary': ('gray',),
+        'horizontal': ('binary',),
+        'vertical': ('binary',),
+    }
+    # intermediate -> stage its computation is timed as
+    STAGES = {
+        'gray': 'threshold',
+        'binary': 'threshold',
+        'horizontal': 'morphology',
+        'vertical': 'morphology',
+    }
+
+    def __init__(self, image, threshold=150, line_length=25, memory_budget=0, tile_height=0):
+        self.image = image
+        self.shape = image.shape
+        self.threshold = threshold
+        self.line_length = line_length
+        self.memory_budget = memory_budget
+        # Run the morphology strip by strip on large images
+        self.tile_height = tile_height
+        self._arrays = {}
+        self._refs = dict.fromkeys(self.DEPENDS, 0)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self._arrays.values())
+
+    def retain(self, *names):
+        for name in names:
+            self._refs[name] += 1
+
+    def release(self, *names):
+        for name in names:
+            self._refs[name] = max(0, self._refs[name] - 1)
+        self._collect()
+
+    @contextmanager
+    def use(self, *names):
+        """Yield the requested intermediates and release them afterwards"""
+        try:
+            arrays = [self.get(name) for name in names]
+            yield arrays[0] if len(arrays) == 1 else arrays
+        finally:
+            self.release(*names)
+
+    def get(self, name):
+        array = self._arrays.get(name)
+        if array is None:
+            self._refs[name] += 1
+            try:
+                with metrics.stage(self.STAGES[name]):
+                    array = getattr(self, '_compute_' + name)()
+                if self.memory_budget and self.nbytes + array.nbytes > self.memory_budget:
+                    raise MemoryBudgetExceeded(
+                        f"Preprocessing needs more than {self.memory_budget // (1024 * 1024)} MB "
+                        f"for a {self.shape[1]}x{self.shape[0]} image")
+                self._arrays[name] = array
+            finally:
+                self._refs[name] -= 1
+            self._collect()
+        return array
+
+    def close(self):
+        self._arrays.clear()
+        self._refs = dict.fromkeys(self.DEPENDS, 0)
+
+    def _collect(self):
+        needed = set()
+        pending = [name for name, refs in self._refs.items() if refs > 0]
+        while pending:
+            name = pending.pop()
+            if name in needed:
+                continue
+            needed.add(name)
+            if name not in self._arrays:
+                # Still to be computed, keep what it is computed from.
+                pending.extend(self.DEPENDS[name])
+        for name in list(self._arrays):
+            if name not in needed:
+                del self._arrays[name]
+
+    def _compute_gray(self):
+        if self.image.ndim == 2:
+            return self.image
+        gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        # Everything else derives from the gray image, drop the color one
+        self.image = gray
+        return gray
+
+    def _compute_binary(self):
+        _, thresh = cv2.threshold(self.get('gray'), self.threshold, 255, cv2.THRESH_BINARY_INV)
+        return thresh
+
+    def _compute_horizontal(self):
+        return self._open_lines((self.line_length, 1))
+
+    def _compute_vertical(self):
+        return self._open_lines((1, self.line_length))
+
+    def _open_lines(self, size):
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, size)
+
+        def open_lines(binary):
+            return cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel, iterations=2)
+
+        binary = self.get('binary')
+        if not self.tile_height:
+            return open_lines(binary)
+        # Two erosions then two dilations reach 2 kernel heights away
+        return apply_tiled(open_lines, binary, self.tile_height, 2 * size[1])
+
+
+def preprocess(image, options=None):
+    """Wrap a decoded image, or return it as is if it already is wrapped"""
+    if isinstance(image, PreprocessedImage):
+        return image
+    options = options or {}
+    return PreprocessedImage(
+        image,
+        threshold=options.get('threshold', 150),
+        memory_budget=options.get('memory_budget_mb', 0) * 1024 * 1024,
+        tile_height=options.get('tile_height', 2048) if use_tiles(image, options) else 0,
+    )
@@ -0,0 +1,98 @@
+"""Standalone OCR worker serving the Odoo job runners over a Unix socket.
+
+Run it next to Odoo, as the same user (the output files it writes in the
+temporary directory are moved into the filestore by Odoo), from the module
+directory:
+
+    python -m ocr.sidecar --socket /run/odoo/ocr.sock --workers 4
+
+and set the ``ocr.worker_socket`` system parameter to the socket path.
+The OCR stack is imported once here, before the pool processes are forked,
+instead of in every Odoo worker. Without the sidecar, or while it is down,
+the job runner forks its own pool.
+"""
+import argparse
+import logging
+import os
+import signal
+import socketserver
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+from . import tasks
+from .client import recv_message, send_message
+from .pool import get_process_pool, reset_process_pool
+
+_logger = logging.getLogger(__name__)
+
+
+class SidecarServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, workers, cell_max_documents):
+        self.workers = workers
+        self.cell_max_documents = cell_max_documents
+        if os.path.exists(path):
+            # Left over by a previous run
+            os.unlink(path)
+        super().__init__(path, SidecarHandler)
+        os.chmod(path, 0o600)
+
+    def run_task(self, name, args):
+        if name == 'ping':
+            return os.getpid()
+        pool = get_process_pool(self.workers, self.cell_max_documents)
+        try:
+            return pool.submit(tasks.run, name, *args).result()
+        except BrokenProcessPool:
+            reset_process_pool()
+            raise
+
+    def server_close(self):
+        super().server_close()
+        os.unlink(self.server_address)
+        reset_process_pool()
+
+
+class SidecarHandler(socketserver.BaseRequestHandler):
+    """Answers the tasks of one client connection, one at a time"""
+
+    def handle(self):
+        while True:
+            try:
+                name, args = recv_message(self.request)
+            except (EOFError, ConnectionResetError):
+                return
+            try:
+                reply = ('ok', self.server.run_task(name, args))
+            except Exception as e:
+                # The traceback stays in the sidecar log
+                _logger.exception("OCR task %s failed", name)
+                reply = ('error', f"{type(e).__name__}: {e}")
+            send_message(self.request, reply)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--socket', required=True, help="Path of the Unix socket to listen on")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="OCR processes")
+    parser.add_argument('--cell-documents', type=int, default=1,
+                        help="Documents running their cell OCR in parallel at the same time")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    tasks.preload()
+    server = SidecarServer(args.socket, max(1, args.workers), max(1, args.cell_documents))
+    # shutdown() waits for serve_forever, it has to be called from another thread
+    signal.signal(signal.SIGTERM, lambda *_args: threading.Thread(target=server.shutdown).start())
+    _logger.info("OCR sidecar listening on %s with %s workers", args.socket, server.workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
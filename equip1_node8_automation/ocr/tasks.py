@@ -0,0 +1,27 @@
+import importlib
+
+# Entry points the job runner calls by name, in a pool process or in the
+# sidecar. This module stays free of OpenCV, numpy, tesseract and openpyxl:
+# they are only imported by the process which runs the task.
+TASKS = {
+    'count_pages': ('.pages', 'count_pages'),
+    'run_page': ('.pipeline', 'run_page'),
+    'write_result': ('.tasks', 'write_result'),
+}
+
+
+def run(name, *args):
+    module, function = TASKS[name]
+    return getattr(importlib.import_module(module, __package__), function)(*args)
+
+
+def preload():
+    """Import the OCR stack once, before forking the processes which use it"""
+    for module, _function in TASKS.values():
+        importlib.import_module(module, __package__)
+
+
+def write_result(pages, options=None):
+    """Write the output file of the processed pages and return the document result"""
+    from . import pipeline
+    return pipeline.pages_result(pages, pipeline.write_pages(pages, options), options)
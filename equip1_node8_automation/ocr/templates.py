@@ -0,0 +1,136 @@
+import logging
+import threading
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from . import metrics
+from .cells import cell_keys
+from .engine import PageImage, get_engine
+from .tiling import load_image
+
+_logger = logging.getLogger(__name__)
+
+# Pages and references are registered at this size, enough for the layout
+MATCH_SIDE = 1000
+MAX_FEATURES = 1500
+# Lowe's ratio test, and RANSAC tolerance in downscaled pixels
+RATIO = 0.75
+RANSAC_THRESHOLD = 4.0
+MIN_INLIERS = 25
+
+Features = namedtuple('Features', 'points descriptors width height')
+Match = namedtuple('Match', 'template homography inliers score')
+
+# Features of the template references, by (template id, checksum)
+_references = {}
+_references_lock = threading.Lock()
+
+
+def compute_features(gray):
+    """ORB keypoints (in full resolution coordinates) of a gray page"""
+    height, width = gray.shape[:2]
+    scale = min(1.0, float(MATCH_SIDE) / max(height, width))
+    small = gray
+    if scale < 1.0:
+        small = cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    keypoints, descriptors = cv2.ORB_create(nfeatures=MAX_FEATURES).detectAndCompute(small, None)
+    points = np.float32([keypoint.pt for keypoint in keypoints]).reshape(-1, 2) / scale
+    return Features(points, descriptors, width, height)
+
+
+def reference_features(template, options=None):
+    key = (template['id'], template['checksum'])
+    with _references_lock:
+        features = _references.get(key)
+    if features is None:
+        image = load_image(template['source'], options)
+        features = compute_features(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+        with _references_lock:
+            # Older versions of the template are not needed anymore
+            for old_key in [k for k in _references if k[0] == template['id']]:
+                del _references[old_key]
+            _references[key] = features
+    return features
+
+
+def match_template(gray, options=None):
+    """Best template of ``options['templates']`` matching the page, or None.
+
+    The page is registered on each reference with ORB features and a RANSAC
+    homography; a template matches when enough of the feature matches agree
+    on the same transform (at least its ``min_score`` share of them).
+    """
+    options = options or {}
+    page = None
+    best = None
+    for template in options.get('templates', ()):
+        try:
+            reference = reference_features(template, options)
+        except Exception:
+            # A broken template must not fail every document
+            _logger.warning("Unable to load the reference of OCR template %s", template['id'], exc_info=True)
+            continue
+        if reference.descriptors is None or len(reference.points) < MIN_INLIERS:
+            continue
+        if page is None:
+            page = compute_features(gray)
+            if page.descriptors is None or len(page.points) < MIN_INLIERS:
+                return None
+
+        pairs = cv2.BFMatcher(cv2.NORM_HAMMING).knnMatch(reference.descriptors, page.descriptors, k=2)
+        good = [pair[0] for pair in pairs if len(pair) == 2 and pair[0].distance < RATIO * pair[1].distance]
+        if len(good) < MIN_INLIERS:
+            continue
+        source = reference.points[[m.queryIdx for m in good]]
+        target = page.points[[m.trainIdx for m in good]]
+        tolerance = RANSAC_THRESHOLD * max(page.width, page.height) / float(MATCH_SIDE)
+        homography, mask = cv2.findHomography(source, target, cv2.RANSAC, tolerance)
+        if homography is None or not _plausible(homography):
+            continue
+        inliers = int(mask.sum())
+        score = inliers / float(len(good))
+        if inliers >= MIN_INLIERS and score >= template.get('min_score', 0.3):
+            if best is None or inliers > best.inliers:
+                best = Match(template, homography, inliers, score)
+    return best
+
+
+def _plausible(homography):
+    """Reject the degenerate transforms (mirrored, collapsed or exploded)"""
+    linear = homography[:2, :2] / homography[2, 2]
+    determinant = np.linalg.det(linear)
+    return 1.0 / 16 < determinant < 16 and abs(homography[2, 0]) < 1e-3 and abs(homography[2, 1]) < 1e-3
+
+
+def read_zones(gray, match, options=None):
+    """OCR the zones of the matched template, return [(zone, text)]"""
+    options = options or {}
+    engine = get_engine(options)
+    lang = options.get('lang', 'eng')
+    reference = reference_features(match.template, options)
+    # Page pixels per reference pixel, to crop the zones at page resolution
+    scale = np.sqrt(abs(np.linalg.det(match.homography[:2, :2] / match.homography[2, 2])))
+
+    values = []
+    for zone in match.template['zones']:
+        x = zone['x'] * reference.width
+        y = zone['y'] * reference.height
+        width = max(1, int(zone['width'] * reference.width * scale))
+        height = max(1, int(zone['height'] * reference.height * scale))
+        # Zone pixel -> reference pixel -> page pixel, the crop comes out deskewed
+        to_reference = np.array([[1.0 / scale, 0, x], [0, 1.0 / scale, y], [0, 0, 1]])
+        crop = cv2.warpPerspective(
+            gray, match.homography @ to_reference, (width, height),
+            flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+        if cell_keys(crop, [(0, 0, width, height)], options)[0] is None:
+            values.append((zone, ''))
+            continue
+        metrics.count('ocr_calls')
+        # A single line of text unless the zone says otherwise
+        config = zone.get('config') or ('--psm 6' if zone.get('multiline') else '--psm 7')
+        text = engine.image_to_string(PageImage(crop), lang=lang, config=config)
+        values.append((zone, text.strip() if zone.get('multiline') else ' '.join(text.split())))
+    return values
@@ -0,0 +1,88 @@
+"""Shared fixtures of the ``ocr`` package tests.
+
+The package does not import Odoo, so these are plain unit tests run with
+the module's external dependencies installed, from the module directory::
+
+    python -m unittest discover -s ocr/tests
+
+(or ``python -m pytest`` from this directory, pytest would import the
+addon itself otherwise).
+
+Like ``benchmarks/run.py``, the module directory is put on the path so
+that ``ocr`` and the synthetic documents of ``benchmarks/synthetic.py``
+are imported without Odoo.
+"""
+import os
+import sys
+
+MODULE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for path in (MODULE_DIR, os.path.join(MODULE_DIR, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+from ocr import engine  # noqa: E402
+from synthetic import SCENARIOS, make_document  # noqa: E402
+
+SCENARIOS_BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
+
+
+def document(name, seed=0, image_format='.png'):
+    """The synthetic document of a benchmark scenario"""
+    return make_document(SCENARIOS_BY_NAME[name], seed, image_format)
+
+
+def decode(source, flags=cv2.IMREAD_GRAYSCALE):
+    return cv2.imdecode(np.frombuffer(source, np.uint8), flags)
+
+
+def blank_page(width=400, height=300):
+    return np.full((height, width), 255, np.uint8)
+
+
+def encode(image, image_format='.png'):
+    ok, encoded = cv2.imencode(image_format, image)
+    assert ok
+    return encoded.tobytes()
+
+
+class FakeEngine:
+    """Stands in for tesseract.
+
+    ``image_to_data`` answers with ``words``, ``(text, conf, left, top,
+    width, height)`` boxes in page coordinates; ``image_to_string`` with
+    ``text``, or what ``text(crop)`` returns when it is callable.
+    """
+
+    name = 'fake'
+
+    def __init__(self, words=(), text=''):
+        self.words = list(words)
+        self.text = text
+        self.calls = []
+
+    def image_to_string(self, page, lang='eng', config='', rect=None, timeout=0):
+        self.calls.append(('image_to_string', config, rect))
+        return self.text(page.crop(rect)) if callable(self.text) else self.text
+
+    def image_to_data(self, page, lang='eng', config='', rect=None):
+        self.calls.append(('image_to_data', config, rect))
+        x, y, w, h = rect or (0, 0, page.width, page.height)
+        data = {key: [] for key in engine.DATA_KEYS}
+        for number, (text, conf, left, top, width, height) in enumerate(self.words, 1):
+            if not (x <= left and left + width <= x + w and y <= top and top + height <= y + h):
+                continue
+            # Relative to the rectangle, like tesseract on a crop
+            values = (text, conf, left - x, top - y, width, height, 1, 1, number, 1)
+            for key, value in zip(engine.DATA_KEYS, values):
+                data[key].append(value)
+        return data
+
+
+def use_engine(testcase, fake):
+    """Make ``fake`` the engine of the ``'fake'`` ocr_engine option for the test"""
+    engine._engines['fake'] = fake
+    testcase.addCleanup(engine._engines.pop, 'fake', None)
+    return {'ocr_engine': 'fake'}
@@ -0,0 +1,114 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from common import blank_page
+
+from ocr.cells import CellTextCache, cell_keys
+
+CELL_WIDTH, CELL_HEIGHT = 200, 60
+
+
+def draw_cells(texts, scale=0.8, thickness=2):
+    """A row of bordered cells holding ``texts``, and their rectangles"""
+    gray = blank_page(CELL_WIDTH * len(texts) + 20, CELL_HEIGHT + 20)
+    cells = []
+    for index, text in enumerate(texts):
+        x, y = 10 + index * CELL_WIDTH, 10
+        cv2.rectangle(gray, (x, y), (x + CELL_WIDTH, y + CELL_HEIGHT), 0, 2)
+        cv2.putText(gray, text, (x + 12, y + 40), cv2.FONT_HERSHEY_SIMPLEX, scale, 0, thickness, cv2.LINE_AA)
+        cells.append((x, y, CELL_WIDTH, CELL_HEIGHT))
+    return gray, cells
+
+
+def add_noise(gray, density, seed=0):
+    """Salt and pepper noise like the noisy benchmark scenarios"""
+    rng = np.random.default_rng(seed)
+    count = int(gray.size * density)
+    ys, xs = rng.integers(0, gray.shape[0], count), rng.integers(0, gray.shape[1], count)
+    gray[ys, xs] = np.where(rng.random(count) < 0.5, 0, 255).astype(np.uint8)
+    return gray
+
+
+class TestCellKeys(unittest.TestCase):
+
+    def test_blank_cells(self):
+        gray, cells = draw_cells(['total', '', ''])
+        # Isolated specks of scan noise are not ink
+        x, y = cells[2][0] + 20, cells[2][1] + 10
+        gray[y:y + 40:6, x:x + 120:6] = 0
+        keys = cell_keys(gray, cells)
+        self.assertIsNotNone(keys[0])
+        self.assertEqual(keys[1:], [None, None])
+
+    def test_blank_ratio(self):
+        gray, cells = draw_cells(['.'])
+        self.assertIsNotNone(cell_keys(gray, cells)[0])
+        self.assertIsNone(cell_keys(gray, cells, {'cell_blank_ratio': 0.05})[0])
+
+    def test_duplicates_share_a_key(self):
+        gray, cells = draw_cells(['total', 'price', 'total', '0', '0'])
+        keys = cell_keys(gray, cells)
+        self.assertEqual(keys[0], keys[2])
+        self.assertEqual(keys[3], keys[4])
+        self.assertEqual(len(set(keys)), 3)
+
+    def test_noisy_duplicates_share_a_key(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                gray, cells = draw_cells(['total', 'quantity 12', 'total', 'quantity 12'])
+                keys = cell_keys(add_noise(gray, 0.01, seed), cells)
+                self.assertEqual(keys[0], keys[2])
+                self.assertEqual(keys[1], keys[3])
+                self.assertNotEqual(keys[0], keys[1])
+
+    def test_similar_texts_not_merged(self):
+        pairs = [('4098', '4096'), ('1.5', '15'), ('100', '700'), ('price', 'prize'), ('-1', '-7'), ('8', '0')]
+        for first, second in pairs:
+            for noise in (0, 0.01):
+                with self.subTest(first=first, second=second, noise=noise):
+                    gray, cells = draw_cells([first, second])
+                    keys = cell_keys(add_noise(gray, noise), cells)
+                    self.assertNotEqual(keys[0], keys[1])
+
+    def test_known_keys(self):
+        gray, cells = draw_cells(['total', 'price'])
+        known = cell_keys(gray, cells)
+        # Another document, scanned with noise
+        gray, cells = draw_cells(['price', 'amount', 'total'])
+        keys = cell_keys(add_noise(gray, 0.01), cells, known=known)
+        self.assertEqual(keys[0], known[1])
+        self.assertEqual(keys[2], known[0])
+        self.assertNotIn(keys[1], known)
+
+    def test_dedup_disabled(self):
+        gray, cells = draw_cells(['total', 'total', ''])
+        keys = cell_keys(gray, cells, {'cell_dedup': False})
+        self.assertEqual(keys, [('cell', 0), ('cell', 1), None])
+
+    def test_aspect_ratio(self):
+        # Same ink once resampled, told apart by their proportions
+        gray, cells = draw_cells(['-', '--'])
+        keys = cell_keys(gray, cells)
+        self.assertNotEqual(keys[0], keys[1])
+
+
+class TestCellTextCache(unittest.TestCase):
+
+    def test_lru(self):
+        cache = CellTextCache()
+        cache.put('a', 'A', 2)
+        cache.put('b', 'B', 2)
+        self.assertEqual(cache.get('a'), 'A')
+        cache.put('c', 'C', 2)
+        # 'b' was the least recently used
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), ('A', 'C'))
+
+    def test_keys(self):
+        cache = CellTextCache()
+        cache.put(('tesserocr', 'eng', '--psm 6', 'a'), 'A', 10)
+        cache.put(('tesserocr', 'ind', '--psm 6', 'b'), 'B', 10)
+        cache.put(('tesserocr', 'eng', '--psm 6', 'c'), 'C', 10)
+        self.assertEqual(cache.keys(('tesserocr', 'eng', '--psm 6')), ['a', 'c'])
@@ -0,0 +1,58 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import common  # noqa: F401
+
+from ocr import engine
+
+
+class TestParseConfig(unittest.TestCase):
+
+    def test_defaults(self):
+        self.assertEqual(engine.parse_config(''), {
+            'psm': engine.DEFAULT_PSM, 'oem': engine.DEFAULT_OEM, 'path': None, 'variables': (),
+        })
+        self.assertEqual(engine.parse_config(None), engine.parse_config(''))
+
+    def test_arguments(self):
+        config = engine.parse_config(
+            "--psm 6 --oem 1 --tessdata-dir '/opt/tess data' -c tessedit_char_whitelist=0123 --dpi 300 --unknown")
+        self.assertEqual(config, {
+            'psm': 6,
+            'oem': 1,
+            'path': '/opt/tess data',
+            # Sorted, so the same variables share an API handle
+            'variables': (('tessedit_char_whitelist', '0123'), ('user_defined_dpi', '300')),
+        })
+
+
+@mock.patch.dict(engine._engines, clear=True)
+class TestGetEngine(unittest.TestCase):
+
+    def test_named(self):
+        self.assertIsInstance(engine.get_engine({'ocr_engine': 'none'}), engine.NullEngine)
+        self.assertIsInstance(engine.get_engine({'ocr_engine': 'pytesseract'}), engine.PytesseractEngine)
+        # One engine per process, its API handles are reused
+        self.assertIs(engine.get_engine({'ocr_engine': 'none'}), engine.get_engine({'ocr_engine': 'none'}))
+
+    def test_auto(self):
+        expected = engine.TesserocrEngine if engine.tesserocr is not None else engine.PytesseractEngine
+        self.assertIsInstance(engine.get_engine(), expected)
+
+    def test_tesserocr_missing(self):
+        with mock.patch.object(engine, 'tesserocr', None), self.assertLogs(engine._logger, 'WARNING'):
+            self.assertIsInstance(engine.get_engine({'ocr_engine': 'tesserocr'}), engine.PytesseractEngine)
+
+
+class TestPageImage(unittest.TestCase):
+
+    def test_crop_and_buffer(self):
+        gray = np.arange(12, dtype=np.uint8).reshape(3, 4)
+        page = engine.PageImage(gray)
+        self.assertEqual((page.width, page.height), (4, 3))
+        self.assertEqual(page.crop((1, 1, 2, 2)).tolist(), [[5, 6], [9, 10]])
+        self.assertIs(page.crop(None), gray)
+        self.assertEqual(page.buffer, gray.tobytes())
+        self.assertNotEqual(page.token, engine.PageImage(gray).token)
@@ -0,0 +1,67 @@
+import threading
+import time
+import unittest
+
+import common  # noqa: F401
+
+from ocr import executor
+from ocr.executor import CellOcrExecutor
+
+
+class TestCellOcrExecutor(unittest.TestCase):
+
+    def setUp(self):
+        executor.set_document_slots(threading.BoundedSemaphore(1))
+        self.addCleanup(executor.set_document_slots, None)
+
+    def test_keeps_order(self):
+        def slow_first(item, timeout):
+            # The first items complete last
+            time.sleep(0.01 * (8 - item))
+            return item * 10
+
+        self.assertEqual(CellOcrExecutor(workers=4).map(slow_first, range(8)), [item * 10 for item in range(8)])
+        self.assertEqual(CellOcrExecutor(workers=1).map(slow_first, range(3)), [0, 10, 20])
+
+    def test_remaining_time(self):
+        timeouts = []
+        CellOcrExecutor(workers=1).map(lambda item, timeout: timeouts.append(timeout), range(2))
+        self.assertEqual(timeouts, [None, None])
+        CellOcrExecutor(workers=2, timeout=30).map(lambda item, timeout: timeouts.append(timeout), range(2))
+        self.assertTrue(all(0 < timeout <= 30 for timeout in timeouts[2:]))
+
+    def test_deadline(self):
+        started = []
+
+        def slow(item, timeout):
+            started.append(item)
+            time.sleep(0.2)
+            return item
+
+        with self.assertRaises(TimeoutError):
+            CellOcrExecutor(workers=2, timeout=0.3).map(slow, range(20))
+        time.sleep(0.5)
+        # The cells which had not started are cancelled
+        self.assertLess(len(started), 20)
+
+    def test_error(self):
+        def fail_on_3(item, timeout):
+            if item == 3:
+                raise ValueError("unreadable cell")
+            return item
+
+        with self.assertRaisesRegex(ValueError, "unreadable cell"):
+            CellOcrExecutor(workers=2).map(fail_on_3, range(6))
+
+    def test_document_slots(self):
+        slots = executor._get_document_slots(1)
+        slots.acquire()
+        try:
+            # Another document holds the only slot
+            with self.assertRaisesRegex(TimeoutError, "No slot"):
+                CellOcrExecutor(workers=2, timeout=0.2).map(lambda item, timeout: item, range(4))
+            # A single thread does not need a slot
+            self.assertEqual(CellOcrExecutor(workers=1).map(lambda item, timeout: item, range(4)), [0, 1, 2, 3])
+        finally:
+            slots.release()
+        self.assertEqual(CellOcrExecutor(workers=2, timeout=5).map(lambda item, timeout: item, range(4)), [0, 1, 2, 3])
@@ -0,0 +1,42 @@
+import unittest
+
+import cv2
+
+from common import SCENARIOS, blank_page, decode, document
+
+from ocr import pipeline
+from ocr.preprocess import preprocess
+
+
+def binary_of(gray):
+    prep = preprocess(gray, {})
+    return prep.get('binary')
+
+
+class TestGridDetection(unittest.TestCase):
+
+    def test_fast_path_agrees_with_hough(self):
+        for scenario in SCENARIOS:
+            with self.subTest(scenario.name):
+                doc = document(scenario.name)
+                gray = decode(doc.source)
+                fast = pipeline.classify_grid_fast(binary_of(gray))
+                hough = pipeline.detect_grid_lines(gray, {'grid_fast_path': False})
+                self.assertEqual(hough, doc.has_grid)
+                # The synthetic pages are all clear cut, the fast path decides them
+                self.assertEqual(fast, hough)
+                self.assertEqual(pipeline.detect_grid_lines(gray, {}), hough)
+
+    def test_ambiguous_falls_back_to_hough(self):
+        gray = blank_page(800, 600)
+        # Three short lines each way: long enough for Hough, too short for the fast path to decide
+        for offset in (100, 200, 300):
+            cv2.line(gray, (100, offset), (220, offset), 0, 2)
+            cv2.line(gray, (offset + 300, 100), (offset + 300, 220), 0, 2)
+        self.assertIsNone(pipeline.classify_grid_fast(binary_of(gray)))
+        self.assertTrue(pipeline.detect_grid_lines(gray, {}))
+
+    def test_blank_page(self):
+        gray = blank_page()
+        self.assertFalse(pipeline.classify_grid_fast(binary_of(gray)))
+        self.assertFalse(pipeline.detect_grid_lines(gray, {}))
@@ -0,0 +1,80 @@
+import unittest
+
+from common import FakeEngine, decode, document, use_engine
+
+from ocr import pipeline
+from ocr.preprocess import preprocess
+
+
+def cell_words(rows, table):
+    """Word boxes of ``table`` laid out in the cells like tesseract reports them"""
+    words = []
+    for row, texts in zip(rows, table):
+        for (x, y, _w, _h), text in zip(row, texts):
+            for index, word in enumerate(text.split()):
+                words.append((word, 90.0, x + 8 + 60 * index, y + 20, 50, 15))
+    return words
+
+
+class TestSinglePass(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = document('grid_5x4_150dpi')
+        self.prep = preprocess(decode(self.doc.source), {})
+        self.prep.retain('gray', 'horizontal', 'vertical')
+        self.grid, self.rows = pipeline.locate_grid_cells(self.prep)
+
+    def test_words_distributed_over_cells(self):
+        self.assertEqual([len(row) for row in self.rows], [4] * 5)
+        fake = FakeEngine(cell_words(self.rows, self.doc.expected) + [
+            # In the page margin, and rejected by tesseract
+            ('header', 95.0, 5, 5, 40, 15),
+            ('noise', -1, self.rows[0][0][0] + 100, self.rows[0][0][1] + 5, 20, 10),
+        ])
+        options = use_engine(self, fake)
+        table, confidences = pipeline.ocr_grid_cells(self.prep, self.grid, self.rows, options)
+
+        self.assertEqual(table, self.doc.expected)
+        self.assertEqual(confidences[0][0], 90.0)
+        # A single OCR of the page with the grid lines blanked out
+        self.assertEqual(fake.calls, [('image_to_data', '--psm 11', None)])
+
+    def test_empty_cells(self):
+        options = use_engine(self, FakeEngine())
+        table, confidences = pipeline.ocr_cells_single_pass(self.prep.get('gray'), self.grid, self.rows, options)
+        self.assertEqual(table, [[''] * 4] * 5)
+        self.assertEqual(confidences, [[None] * 4] * 5)
+
+
+class TestCellIndex(unittest.TestCase):
+
+    def test_lookup(self):
+        index = pipeline.CellIndex([(0, 0, 100, 40), (100, 0, 100, 40), (0, 40, 200, 40), (120, 45, 30, 20)])
+        self.assertEqual(index.lookup(50, 20), 0)
+        self.assertEqual(index.lookup(100, 20), 1)
+        self.assertEqual(index.lookup(20, 60), 2)
+        # Nested cells: the smallest one containing the point
+        self.assertEqual(index.lookup(130, 50), 3)
+        self.assertIsNone(index.lookup(250, 20))
+        self.assertIsNone(index.lookup(50, 90))
+
+    def test_no_cells(self):
+        self.assertIsNone(pipeline.CellIndex([]).lookup(10, 10))
+
+
+class TestJoinWords(unittest.TestCase):
+
+    def test_lines(self):
+        words = [
+            (52, 80, 14, 'world'),
+            (50, 10, 16, 'hello'),
+            (80, 10, 15, 'second'),
+            (81, 90, 14, 'line'),
+        ]
+        self.assertEqual(pipeline._join_words(words), 'hello world\nsecond line')
+
+    def test_empty(self):
+        self.assertEqual(pipeline._join_words([]), '')
+
+    def test_table_to_text(self):
+        self.assertEqual(pipeline.table_to_text([['a  b', '', 'c'], ['', '', '']]), 'a b\t\tc\n')
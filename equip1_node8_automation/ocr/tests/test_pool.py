@@ -0,0 +1,65 @@
+import os
+import subprocess
+import tempfile
+import time
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+
+from common import blank_page, encode
+
+from ocr import pool
+
+
+def _hang(pid_path):
+    """Start a child process like tesseract would, and never return"""
+    child = subprocess.Popen(['sleep', '60'])
+    with open(pid_path, 'w') as pid_file:
+        pid_file.write(str(child.pid))
+    time.sleep(60)
+
+
+def _alive(pid):
+    try:
+        with open(f'/proc/{pid}/stat') as stat:
+            # A zombie is dead, only not reaped by its parent yet
+            return stat.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+class TestProcessPool(unittest.TestCase):
+
+    def tearDown(self):
+        pool.reset_executor()
+
+    def test_worker_died(self):
+        source = encode(blank_page())
+        self.assertEqual(pool.get_executor(1).call('count_pages', source), 1)
+
+        # A worker process killed while running a task breaks the whole pool
+        with self.assertRaises(BrokenProcessPool):
+            pool.get_process_pool(1).submit(os._exit, 1).result()
+        with self.assertRaises(BrokenProcessPool):
+            pool.get_executor(1).call('count_pages', source)
+
+        pool.reset_executor()
+        self.assertEqual(pool.get_executor(1).call('count_pages', source), 1)
+
+    def test_reset_kills_hung_workers(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pid_path = os.path.join(tmp_dir, 'child.pid')
+            process_pool = pool.get_process_pool(1)
+            process_pool.submit(_hang, pid_path)
+            deadline = time.monotonic() + 10
+            while not os.path.exists(pid_path) or not os.path.getsize(pid_path):
+                self.assertLess(time.monotonic(), deadline, "the task did not start")
+                time.sleep(0.05)
+            with open(pid_path) as pid_file:
+                child_pid = int(pid_file.read())
+            worker_pids = list(process_pool._processes)
+
+        pool.reset_process_pool()
+        deadline = time.monotonic() + 10
+        while any(_alive(pid) for pid in worker_pids + [child_pid]):
+            self.assertLess(time.monotonic(), deadline, "the hung processes were not killed")
+            time.sleep(0.05)
@@ -0,0 +1,61 @@
+import unittest
+
+import cv2
+
+from common import decode, document
+
+from ocr.preprocess import MemoryBudgetExceeded, PreprocessedImage
+
+
+class TestPreprocessedImage(unittest.TestCase):
+
+    def setUp(self):
+        self.image = decode(document('grid_5x4_150dpi').source, cv2.IMREAD_COLOR)
+
+    def test_computed_once(self):
+        prep = PreprocessedImage(self.image)
+        prep.retain('gray', 'gray')
+        gray = prep.get('gray')
+        self.assertIs(prep.get('gray'), gray)
+        # The color image is not kept next to the gray one
+        self.assertIs(prep.image, gray)
+
+    def test_release_frees(self):
+        prep = PreprocessedImage(self.image)
+        prep.retain('horizontal', 'vertical')
+        prep.get('horizontal')
+        # The binary image is still needed for the vertical mask, the gray one is not
+        self.assertEqual(set(prep._arrays), {'binary', 'horizontal'})
+        prep.get('vertical')
+        self.assertEqual(set(prep._arrays), {'horizontal', 'vertical'})
+        prep.release('horizontal')
+        self.assertEqual(set(prep._arrays), {'vertical'})
+        with prep.use('vertical') as vertical:
+            self.assertEqual(vertical.shape, self.image.shape[:2])
+        self.assertEqual(prep.nbytes, 0)
+
+    def test_unretained_not_kept(self):
+        prep = PreprocessedImage(self.image)
+        binary = prep.get('binary')
+        self.assertEqual(binary.shape, self.image.shape[:2])
+        self.assertFalse(prep._arrays)
+
+    def test_use_releases_on_error(self):
+        prep = PreprocessedImage(self.image)
+        prep.retain('gray')
+        with self.assertRaises(ZeroDivisionError), prep.use('gray'):
+            1 / 0
+        self.assertFalse(prep._arrays)
+
+    def test_memory_budget(self):
+        prep = PreprocessedImage(self.image, memory_budget=self.image.shape[0] * self.image.shape[1] * 2)
+        prep.retain('gray', 'binary', 'horizontal')
+        prep.get('binary')
+        with self.assertRaises(MemoryBudgetExceeded):
+            prep.get('horizontal')
+
+    def test_tiled_masks_match(self):
+        prep = PreprocessedImage(self.image)
+        tiled = PreprocessedImage(self.image, tile_height=200)
+        for name in ('horizontal', 'vertical'):
+            self.assertEqual(cv2.countNonZero(cv2.absdiff(prep.get(name), tiled.get(name))), 0)
@@ -0,0 +1,118 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from common import FakeEngine, decode, document, use_engine
+
+from ocr import templates
+
+# Cells of grid_5x4_150dpi (1240x1754): 280 px columns and 60 px rows from
+# (60, 60), as shares of the page
+PAGE_WIDTH, PAGE_HEIGHT = 1240.0, 1754.0
+
+
+def zone(zone_id, x, y, width, height, **values):
+    return dict({
+        'id': zone_id, 'name': f'zone_{zone_id}', 'label': f'Zone {zone_id}',
+        'x': x / PAGE_WIDTH, 'y': y / PAGE_HEIGHT,
+        'width': width / PAGE_WIDTH, 'height': height / PAGE_HEIGHT,
+        'multiline': False, 'config': '',
+    }, **values)
+
+
+def warp(gray, angle=1.5, scale=0.95, shift=(40, 25)):
+    """The page scanned again: rotated, scaled and shifted on a white sheet"""
+    height, width = gray.shape
+    transform = cv2.getRotationMatrix2D((width / 2.0, height / 2.0), angle, scale)
+    transform[:, 2] += shift
+    warped = cv2.warpAffine(gray, transform, (width, height), borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+    return warped, np.vstack([transform, [0, 0, 1]])
+
+
+class TestTemplates(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = document('grid_5x4_150dpi')
+        self.reference = decode(self.doc.source)
+        self.template = {
+            'id': 1,
+            'checksum': 'a',
+            'source': self.doc.source,
+            'min_score': 0.3,
+            'zones': [
+                # Second cell of the first row, inside its borders
+                zone(1, 345, 65, 270, 50),
+                # Under the table, nothing printed there
+                zone(2, 100, 600, 400, 60),
+            ],
+        }
+        templates._references.clear()
+        self.addCleanup(templates._references.clear)
+
+    def test_match_warped_page(self):
+        page, transform = warp(self.reference)
+        match = templates.match_template(page, {'templates': [self.template]})
+
+        self.assertIsNotNone(match)
+        self.assertEqual(match.template['id'], 1)
+        self.assertGreaterEqual(match.inliers, templates.MIN_INLIERS)
+        # The homography found is the warp applied to the page, over the
+        # table (the features are all there)
+        corners = np.float32([[60, 60], [1180, 60], [1180, 360], [60, 360]]).reshape(-1, 1, 2)
+        found = cv2.perspectiveTransform(corners, match.homography)
+        expected = cv2.perspectiveTransform(corners, transform)
+        self.assertLess(np.abs(found - expected).max(), 2)
+
+    def test_other_page_not_matched(self):
+        page = decode(document('text_20_lines_150dpi').source)
+        self.assertIsNone(templates.match_template(page, {'templates': [self.template]}))
+        # Nor a page without any feature
+        self.assertIsNone(templates.match_template(np.full((800, 600), 255, np.uint8), {'templates': [self.template]}))
+
+    def test_min_score(self):
+        page, _transform = warp(self.reference)
+        self.template['min_score'] = 1.0
+        self.assertIsNone(templates.match_template(page, {'templates': [self.template]}))
+
+    def test_broken_template_skipped(self):
+        broken = dict(self.template, id=2, source=b'not an image')
+        page, _transform = warp(self.reference)
+        with self.assertLogs('ocr.templates', 'WARNING'):
+            match = templates.match_template(page, {'templates': [broken, self.template]})
+        self.assertEqual(match.template['id'], 1)
+
+    def test_new_reference_version(self):
+        templates.reference_features(self.template)
+        templates.reference_features(dict(self.template, checksum='b'))
+        self.assertEqual(list(templates._references), [(1, 'b')])
+
+    def test_read_zones(self):
+        page, _transform = warp(self.reference)
+        match = templates.match_template(page, {'templates': [self.template]})
+        crops = []
+
+        def read(crop):
+            crops.append(crop)
+            return ' value\n of the  zone '
+        fake = FakeEngine(text=read)
+        values = templates.read_zones(page, match, use_engine(self, fake))
+
+        self.assertEqual([(z['id'], text) for z, text in values], [(1, 'value of the zone'), (2, '')])
+        # The blank zone is not sent to the engine, the other one as a line
+        self.assertEqual([call[:2] for call in fake.calls], [('image_to_string', '--psm 7')])
+        # The crop comes out deskewed, at page resolution, like the zone of the reference
+        crop, = crops
+        self.assertAlmostEqual(crop.shape[0], 50 * 0.95, delta=1)
+        self.assertAlmostEqual(crop.shape[1], 270 * 0.95, delta=1)
+        expected = cv2.resize(self.reference[65:115, 345:615], crop.shape[::-1], interpolation=cv2.INTER_AREA)
+        self.assertGreater(cv2.matchTemplate(crop, expected, cv2.TM_CCOEFF_NORMED)[0, 0], 0.8)
+
+    def test_read_multiline_zone(self):
+        self.template['zones'][0].update(multiline=True)
+        page, _transform = warp(self.reference)
+        match = templates.match_template(page, {'templates': [self.template]})
+        fake = FakeEngine(text=' first line\nsecond line \n')
+        values = templates.read_zones(page, match, use_engine(self, fake))
+        self.assertEqual(values[0][1], 'first line\nsecond line')
+        self.assertEqual(fake.calls[0][1], '--psm 6')
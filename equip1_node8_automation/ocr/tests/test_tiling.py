@@ -0,0 +1,34 @@
+import os
+import tempfile
+import unittest
+
+from common import decode, document
+
+from ocr.tiling import load_image
+
+
+class TestLoadImage(unittest.TestCase):
+
+    def test_reduced(self):
+        # 1240x1754 pixels, the JPEG decoder rounds the reduced size up
+        for image_format in ('.png', '.jpg'):
+            source = document('grid_5x4_150dpi', image_format=image_format).source
+            for max_pixels, (height, width) in ((0, (1754, 1240)), (1240 * 1754, (1754, 1240)),
+                                                (1000000, (877, 620)), (40000, (219, 155))):
+                with self.subTest(image_format=image_format, max_pixels=max_pixels):
+                    shape = load_image(source, {'max_pixels': max_pixels}).shape
+                    self.assertAlmostEqual(shape[0], height, delta=1)
+                    self.assertAlmostEqual(shape[1], width, delta=1)
+                    self.assertEqual(shape[2], 3)
+
+    def test_too_large(self):
+        source = document('grid_5x4_150dpi').source
+        with self.assertRaisesRegex(ValueError, 'too large'):
+            load_image(source, {'max_pixels': 30000})
+
+    def test_path(self):
+        doc = document('grid_5x4_150dpi')
+        with tempfile.NamedTemporaryFile(suffix='.png') as f:
+            f.write(doc.source)
+            f.flush()
+            self.assertTrue((load_image(f.name)[..., 0] == decode(doc.source)).all())
@@ -0,0 +1,136 @@
+import io
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from . import metrics
+from .engine import DATA_KEYS, PageImage, get_engine
+from .metrics import current_rss_mb
+
+# Reduced decoding flags. Only the JPEG decoder scales down while decoding,
+# from the DCT blocks, so that the full resolution image never exists in
+# memory; OpenCV decodes the other formats (PNG, TIFF...) in full and
+# resizes them afterwards.
+_REDUCED_READS = (
+    (1, cv2.IMREAD_COLOR),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+)
+
+
+def load_image(source, options=None):
+    """Decode an image exactly once, from a file path or from raw bytes.
+
+    The size is read from the header first; images over ``max_pixels`` are
+    decoded at 1/2, 1/4 or 1/8 scale. Only a JPEG image is scaled down
+    while it is decoded: any other format is decoded in full and resized,
+    so ``max_pixels`` bounds the image returned but not the memory taken
+    while decoding it.
+    """
+    options = options or {}
+    max_pixels = options.get('max_pixels', 0)
+    with Image.open(source if isinstance(source, str) else io.BytesIO(source)) as header:
+        width, height = header.size
+
+    for scale, flag in _REDUCED_READS:
+        if not max_pixels or (width // scale) * (height // scale) <= max_pixels:
+            break
+    else:
+        raise ValueError(f"Image of {width}x{height} pixels is too large to be processed")
+
+    if isinstance(source, str):
+        image = cv2.imread(source, flag)
+    else:
+        image = cv2.imdecode(np.frombuffer(source, np.uint8), flag)
+    if image is None:
+        raise ValueError("Unable to decode image data")
+    return image
+
+
+def check_memory(options, stage):
+    """Abort the document when the worker went over ``max_rss_mb``"""
+    max_rss = (options or {}).get('max_rss_mb', 0)
+    if max_rss:
+        rss = current_rss_mb()
+        if rss > max_rss:
+            raise MemoryError(f"OCR worker uses {rss:.0f} MB after {stage}, over the {max_rss} MB limit")
+
+
+def use_tiles(image, options):
+    options = options or {}
+    min_pixels = options.get('tile_min_pixels', 0)
+    return bool(min_pixels) and image.shape[0] * image.shape[1] >= min_pixels
+
+
+def iter_strips(height, tile_height, margin):
+    """Yield (start, stop, core_start, core_stop) of overlapping horizontal strips.
+
+    Each output row belongs to exactly one strip core; ``margin`` extra rows
+    are read above and below the core.
+    """
+    for core_start in range(0, height, tile_height):
+        core_stop = min(height, core_start + tile_height)
+        yield max(0, core_start - margin), min(height, core_stop + margin), core_start, core_stop
+
+
+def apply_tiled(func, src, tile_height, margin):
+    """Apply an image filter strip by strip, bounding its temporary buffers"""
+    if src.shape[0] <= tile_height:
+        return func(src)
+    output = np.empty_like(src)
+    for start, stop, core_start, core_stop in iter_strips(src.shape[0], tile_height, margin):
+        output[core_start:core_stop] = func(src[start:stop])[core_start - start:core_stop - start]
+    return output
+
+
+def image_to_data(gray, options=None, config=''):
+    """Word boxes of the page (``image_to_data``), in strips for large pages.
+
+    Words are kept by the strip whose core contains their centre, so words
+    in the overlap are not duplicated. Coordinates are page coordinates.
+    """
+    options = options or {}
+    lang = options.get('lang', 'eng')
+    engine = get_engine(options)
+    page = PageImage(gray)
+    if not use_tiles(gray, options):
+        metrics.count('ocr_calls')
+        return engine.image_to_data(page, lang=lang, config=config)
+
+    merged = {key: [] for key in DATA_KEYS}
+    tile_height = options.get('tile_height', 2048)
+    for tile, (start, stop, core_start, core_stop) in enumerate(
+            iter_strips(gray.shape[0], tile_height, options.get('tile_overlap', 128))):
+        metrics.count('ocr_calls')
+        data = engine.image_to_data(page, lang=lang, config=config, rect=(0, start, page.width, stop - start))
+        for i, text in enumerate(data['text']):
+            centre = start + data['top'][i] + data['height'][i] / 2.0
+            if not text.strip() or not core_start <= centre < core_stop:
+                continue
+            for key in DATA_KEYS:
+                merged[key].append(data[key][i])
+            merged['top'][-1] += start
+            # Keep blocks of different strips apart
+            merged['block_num'][-1] += tile * 10000
+        check_memory(options, f"OCR of rows {start}-{stop}")
+    return merged
+
+
+def data_to_text(data):
+    """Rebuild plain text from ``image_to_data`` output, one line per tesseract line"""
+    lines = []
+    current = None
+    for i, text in enumerate(data['text']):
+        if not text.strip():
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        if key != current:
+            if current is not None and key[:2] != current[:2]:
+                lines.append('')
+            lines.append(text)
+            current = key
+        else:
+            lines[-1] += ' ' + text
+    return '\n'.join(lines)
@@ -0,0 +1,82 @@
+import csv
+import os
+import tempfile
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Border, Side
+
+MIMETYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+}
+
+# Define border style for cells
+THIN_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+
+
+class TableWriter:
+    """Stream rows into an xlsx (write-only workbook) or csv file on disk.
+
+    Rows are flushed as they are written, the whole sheet is never held in
+    memory. The file is left at ``path`` for the caller to move into the
+    filestore; it is removed if writing fails.
+    """
+
+    def __init__(self, output_format='xlsx', directory=None):
+        if output_format not in MIMETYPES:
+            raise ValueError(f"Unsupported output format {output_format!r}")
+        self.format = output_format
+        self.mimetype = MIMETYPES[output_format]
+        fd, self.path = tempfile.mkstemp(prefix='ocr_', suffix='.' + output_format, dir=directory)
+        os.close(fd)
+        self._file = None
+        self._csv = None
+        self._workbook = None
+        self._sheet = None
+        self._sheets = 0
+
+    def __enter__(self):
+        if self.format == 'csv':
+            self._file = open(self.path, 'w', newline='', encoding='utf-8')
+            self._csv = csv.writer(self._file)
+        else:
+            self._workbook = Workbook(write_only=True)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._file is not None:
+                self._file.close()
+            if self._workbook is not None and exc_type is None:
+                self._workbook.save(self.path)
+        finally:
+            if exc_type is not None and os.path.exists(self.path):
+                os.unlink(self.path)
+        return False
+
+    def add_sheet(self, title):
+        if self._workbook is not None:
+            self._sheet = self._workbook.create_sheet(title)
+        elif self._sheets:
+            # csv has a single sheet, keep the pages apart with an empty row
+            self._csv.writerow([])
+        self._sheets += 1
+
+    def write_row(self, values, bordered=False):
+        if self._csv is not None:
+            self._csv.writerow(['' if value is None else value for value in values])
+            return
+        if bordered:
+            cells = []
+            for value in values:
+                cell = WriteOnlyCell(self._sheet, value=value)
+                cell.border = THIN_BORDER
+                cells.append(cell)
+            values = cells
+        self._sheet.append(values)
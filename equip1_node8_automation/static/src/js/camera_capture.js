@@ -7,6 +7,11 @@ odoo.define('equip1_node8_automation.camera_capture', function(require) {
     const Dialog = require('web.Dialog');
     const _t = core._t;
 
+    // JPEG quality of the uploaded captures
+    const JPEG_QUALITY = 0.85;
+    // Attempts to send a chunk again before giving up the upload
+    const MAX_CHUNK_RETRIES = 5;
+
     /**
      * Custom Image Field with Camera Button
      * Extends the standard image widget to add camera capture functionality
@@ -191,31 +196,163 @@ odoo.define('equip1_node8_automation.camera_capture', function(require) {
         /**
          * Handle use image button click - save captured image
          * 
+         * The capture is downscaled to the target DPI and re-encoded on the
+         * device. Saved documents receive it through a resumable chunked
+         * upload straight into their attachment; new ones get the (smaller)
+         * image in the form, like before.
+         * 
          * @private
          */
         _onUseImage: function() {
-            try {
-                // Get image data from canvas
-                const imageData = this.canvasElement.toDataURL('image/jpeg', 0.9);
-                const base64Data = imageData.split(',')[1];
-                
-                // Set field value
-                this._setValue(base64Data);
-                
-                // Show success notification
-                this.displayNotification({
-                    type: 'success',
-                    title: _t('Success'),
-                    message: _t('Image captured successfully'),
-                    sticky: false,
+            const self = this;
+            this.cameraDialog.$el.find('.use-image-btn, .retake-btn').prop('disabled', true);
+            
+            this._rpc({route: '/ocr/upload/config'})
+                .then(function(config) {
+                    return self._encodeCapture(config.max_side).then(function(blob) {
+                        if (!self.res_id) {
+                            return self._blobToBase64(blob).then(function(base64Data) {
+                                self._setValue(base64Data);
+                            });
+                        }
+                        return self._uploadInChunks(blob, config.chunk_size).then(function() {
+                            self.trigger_up('reload');
+                        });
+                    });
+                })
+                .then(function() {
+                    // Show success notification
+                    self.displayNotification({
+                        type: 'success',
+                        title: _t('Success'),
+                        message: _t('Image captured successfully'),
+                        sticky: false,
+                    });
+                    
+                    // Close dialog
+                    self._onCloseCamera();
+                })
+                .catch(function(error) {
+                    console.error('Error saving image:', error);
+                    self._displayCameraError(error);
                 });
-                
-                // Close dialog
-                this._onCloseCamera();
-            } catch (error) {
-                console.error('Error saving image:', error);
-                this._displayCameraError(error);
+        },
+        
+        /**
+         * Scale the captured frame so that its longest side is at most
+         * maxSide pixels, then encode it as JPEG
+         * 
+         * @private
+         * @param {number} maxSide 
+         * @returns {Promise<Blob>}
+         */
+        _encodeCapture: function(maxSide) {
+            const source = this.canvasElement;
+            const scale = Math.min(1, maxSide / Math.max(source.width, source.height));
+            let canvas = source;
+            
+            if (scale < 1) {
+                canvas = document.createElement('canvas');
+                canvas.width = Math.round(source.width * scale);
+                canvas.height = Math.round(source.height * scale);
+                const context = canvas.getContext('2d');
+                context.imageSmoothingQuality = 'high';
+                context.drawImage(source, 0, 0, canvas.width, canvas.height);
+            }
+            
+            return new Promise(function(resolve, reject) {
+                canvas.toBlob(function(blob) {
+                    if (blob) {
+                        resolve(blob);
+                    } else {
+                        reject(new Error('Unable to encode the captured image'));
+                    }
+                }, 'image/jpeg', JPEG_QUALITY);
+            });
+        },
+        
+        /**
+         * @private
+         * @param {Blob} blob 
+         * @returns {Promise<string>} the base64 content, without data URL prefix
+         */
+        _blobToBase64: function(blob) {
+            return new Promise(function(resolve, reject) {
+                const reader = new FileReader();
+                reader.onload = () => resolve(reader.result.split(',')[1]);
+                reader.onerror = () => reject(reader.error);
+                reader.readAsDataURL(blob);
+            });
+        },
+        
+        /**
+         * Upload the image to the saved document in chunks of raw bytes
+         * 
+         * @private
+         * @param {Blob} blob 
+         * @param {number} chunkSize 
+         * @returns {Promise}
+         */
+        _uploadInChunks: function(blob, chunkSize) {
+            const self = this;
+            const filename = 'capture_' + new Date().toISOString().replace(/[-:.]/g, '') + '.jpg';
+            
+            return this._rpc({
+                route: '/ocr/upload/start',
+                params: {res_id: this.res_id, filename: filename, size: blob.size},
+            }).then(function(upload) {
+                return self._sendChunks(upload.upload_id, blob, chunkSize, 0, 0);
+            }).then(function(uploadId) {
+                return self._rpc({route: '/ocr/upload/finish', params: {upload_id: uploadId}});
+            });
+        },
+        
+        /**
+         * Send the chunks from offset on. After a failure, the upload resumes
+         * from what the server actually received, with an increasing delay.
+         * 
+         * @private
+         * @param {string} uploadId 
+         * @param {Blob} blob 
+         * @param {number} chunkSize 
+         * @param {number} offset 
+         * @param {number} failures consecutive failed attempts
+         * @returns {Promise<string>} the upload id, once every chunk is received
+         */
+        _sendChunks: function(uploadId, blob, chunkSize, offset, failures) {
+            const self = this;
+            if (offset >= blob.size) {
+                return Promise.resolve(uploadId);
             }
+            
+            const url = '/ocr/upload/' + uploadId + '/chunk?offset=' + offset +
+                '&csrf_token=' + encodeURIComponent(core.csrf_token);
+            return fetch(url, {
+                method: 'POST',
+                body: blob.slice(offset, offset + chunkSize),
+                headers: {'Content-Type': 'application/octet-stream'},
+                credentials: 'same-origin',
+            }).then(function(response) {
+                // 409: the server has another offset, continue from it
+                if (!response.ok && response.status !== 409) {
+                    throw new Error(_t('Upload failed: ') + response.status);
+                }
+                return response.json();
+            }).then(function(result) {
+                return self._sendChunks(uploadId, blob, chunkSize, result.received, 0);
+            }, function(error) {
+                if (failures >= MAX_CHUNK_RETRIES) {
+                    throw error;
+                }
+                return new Promise(resolve => setTimeout(resolve, 1000 * Math.pow(2, failures)))
+                    .then(function() {
+                        return self._rpc({route: '/ocr/upload/status', params: {upload_id: uploadId}})
+                            .then(status => status.received, () => offset);
+                    })
+                    .then(function(received) {
+                        return self._sendChunks(uploadId, blob, chunkSize, received, failures + 1);
+                    });
+            });
         },
         
         /**
@@ -0,0 +1,6 @@
+from . import test_ocr_document
+from . import test_ocr_api
+from . import test_chunked_upload
+from . import test_ocr_result_cache
+from . import test_ocr_batch_import
+from . import test_ocr_job
@@ -0,0 +1,10 @@
+import io
+
+from PIL import Image
+
+
+def make_png(width=120, height=60):
+    """A small blank page, enough to be stored, hashed and queued"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'white').save(buffer, format='PNG')
+    return buffer.getvalue()
@@ -0,0 +1,113 @@
+import base64
+import os
+
+from odoo import http
+from odoo.tests import HttpCase, tagged
+from odoo.tools import mute_logger
+
+CHUNK_SIZE = 64 * 1024
+
+
+@tagged('post_install', '-at_install')
+class TestChunkedUpload(HttpCase):
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate('admin', 'admin')
+        self.document = self.env['ocr.document'].create({'name': 'Camera capture'})
+        # Not a multiple of the chunk size: the last chunk is shorter
+        self.content = os.urandom(5 * CHUNK_SIZE + 1234)
+
+    def _send_chunk(self, upload_id, offset, chunk):
+        return self.url_open(
+            f'/ocr/upload/{upload_id}/chunk?offset={offset}&csrf_token={http.Request.csrf_token(self)}',
+            data=chunk,
+        )
+
+    def _start(self):
+        return self.make_jsonrpc_request('/ocr/upload/start', {
+            'res_id': self.document.id,
+            'filename': 'capture.jpg',
+            'size': len(self.content),
+        })['upload_id']
+
+    def _upload(self):
+        upload_id = self._start()
+        for offset in range(0, len(self.content), CHUNK_SIZE):
+            self._send_chunk(upload_id, offset, self.content[offset:offset + CHUNK_SIZE])
+        return upload_id
+
+    def _image_attachments(self):
+        return self.env['ir.attachment'].search([
+            ('res_model', '=', 'ocr.document'),
+            ('res_field', '=', 'image_file'),
+            ('res_id', '=', self.document.id),
+        ])
+
+    def test_chunked_upload(self):
+        upload_id = self._start()
+        for offset in range(0, len(self.content), CHUNK_SIZE):
+            response = self._send_chunk(upload_id, offset, self.content[offset:offset + CHUNK_SIZE])
+            self.assertEqual(response.status_code, 200, response.text)
+            self.assertEqual(response.json()['received'], min(offset + CHUNK_SIZE, len(self.content)))
+
+        self.make_jsonrpc_request('/ocr/upload/finish', {'upload_id': upload_id})
+        self.document.invalidate_recordset()
+        self.assertEqual(base64.b64decode(self.document.image_file), self.content)
+        self.assertEqual(self.document.image_filename, 'capture.jpg')
+        attachment = self.env['ir.attachment'].search([
+            ('res_model', '=', 'ocr.document'),
+            ('res_field', '=', 'image_file'),
+            ('res_id', '=', self.document.id),
+        ])
+        self.assertEqual(attachment.file_size, len(self.content))
+        self.assertEqual(attachment.mimetype, 'image/jpeg')
+
+    def test_resume_after_repeated_chunk(self):
+        upload_id = self._start()
+        first = self.content[:CHUNK_SIZE]
+        self.assertEqual(self._send_chunk(upload_id, 0, first).status_code, 200)
+        # The client did not get the answer and sends the same chunk again
+        response = self._send_chunk(upload_id, 0, first)
+        self.assertEqual(response.status_code, 409)
+        received = response.json()['received']
+        self.assertEqual(received, CHUNK_SIZE)
+        self.assertEqual(self.make_jsonrpc_request('/ocr/upload/status', {'upload_id': upload_id})['received'], received)
+
+        self.assertEqual(self._send_chunk(upload_id, received, self.content[received:]).status_code, 200)
+        self.make_jsonrpc_request('/ocr/upload/finish', {'upload_id': upload_id})
+        self.document.invalidate_recordset()
+        self.assertEqual(base64.b64decode(self.document.image_file), self.content)
+
+    def test_finish_twice(self):
+        upload_id = self._upload()
+        first = self.make_jsonrpc_request('/ocr/upload/finish', {'upload_id': upload_id})
+        # A retry of the client, after the file left the upload directory
+        second = self.make_jsonrpc_request('/ocr/upload/finish', {'upload_id': upload_id})
+        self.assertEqual(first, second)
+        self.assertEqual(len(self._image_attachments()), 1)
+        self.assertEqual(self.make_jsonrpc_request('/ocr/upload/status', {'upload_id': upload_id})['received'],
+                         len(self.content))
+        # No more chunks once finished
+        self.assertEqual(self._send_chunk(upload_id, len(self.content), b'more').status_code, 404)
+
+    def test_new_image_resets_results(self):
+        self.document.write({'ocr_state': 'done', 'raw_text': 'old text', 'has_grid_lines': True, 'page_count': 2})
+        self.document._set_cells([(0, 0, 0, 'old', 90.0)])
+        job = self.env['ocr.job'].create({'document_id': self.document.id})
+
+        self.make_jsonrpc_request('/ocr/upload/finish', {'upload_id': self._upload()})
+        self.document.invalidate_recordset()
+        self.assertEqual(self.document.ocr_state, 'draft')
+        self.assertFalse(self.document.raw_text)
+        self.assertFalse(self.document.has_grid_lines)
+        self.assertFalse(self.document.page_count)
+        self.assertEqual(self.document._get_cells(), [])
+        self.assertFalse(job.exists())
+        self.assertEqual(base64.b64decode(self.document.image_file), self.content)
+
+    def test_finish_while_processing(self):
+        self.document.ocr_state = 'running'
+        with self.assertRaisesRegex(Exception, 'being processed'), mute_logger('odoo.http'):
+            self.make_jsonrpc_request('/ocr/upload/finish', {'upload_id': self._upload()})
+        self.assertFalse(self._image_attachments())
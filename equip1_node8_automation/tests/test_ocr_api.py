@@ -0,0 +1,97 @@
+import base64
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import HttpCase, tagged
+
+from .common import make_png
+
+API_URL = '/ocr/api/v1/documents'
+RESULTS_URL = '/ocr/api/v1/results'
+
+
+@tagged('post_install', '-at_install')
+class TestOcrApi(HttpCase):
+
+    def setUp(self):
+        super().setUp()
+        self.env['ir.config_parameter'].sudo().set_param('ocr.cache_enabled', 'False')
+        admin = self.env.ref('base.user_admin')
+        self.api_key = self.env['res.users.apikeys'].with_user(admin)._generate(
+            None, 'OCR API test', fields.Datetime.now() + timedelta(days=1))
+        self.image = make_png()
+
+    def _upload(self, headers=None, **kwargs):
+        return self.url_open(API_URL, headers=dict({'Authorization': f'Bearer {self.api_key}'}, **(headers or {})), **kwargs)
+
+    def _results(self, query):
+        return self.url_open(f'{RESULTS_URL}?{query}', headers={'Authorization': f'Bearer {self.api_key}'})
+
+    def test_upload_queues_document(self):
+        response = self._upload(files={'files': ('scan.png', self.image, 'image/png')})
+        self.assertEqual(response.status_code, 202, response.text)
+        result = response.json()
+        self.assertEqual(len(result['documents']), 1)
+        self.assertTrue(result['documents'][0]['job_id'])
+        self.assertIsNone(result['documents'][0]['error'])
+
+        document = self.env['ocr.document'].browse(result['documents'][0]['document_id'])
+        self.assertEqual(document.ocr_state, 'queued')
+        self.assertEqual(base64.b64decode(document.image_file), self.image)
+        self.assertEqual(document.job_ids.id, result['documents'][0]['job_id'])
+
+    def test_upload_raw_body(self):
+        response = self._upload(data=self.image, headers={'Content-Type': 'image/png', 'X-Filename': 'scan.png'})
+        self.assertEqual(response.status_code, 202, response.text)
+        self.assertTrue(response.json()['documents'][0]['job_id'])
+
+    def test_upload_idempotency_key(self):
+        headers = {'Idempotency-Key': 'invoice-2024-001'}
+        first = self._upload(headers=headers, files={'files': ('scan.png', self.image, 'image/png')})
+        second = self._upload(headers=headers, files={'files': ('scan.png', self.image, 'image/png')})
+        self.assertEqual(first.status_code, 202, first.text)
+        self.assertEqual(second.status_code, 200, second.text)
+        self.assertTrue(second.json()['replayed'])
+        self.assertEqual(first.json()['batch_id'], second.json()['batch_id'])
+        self.assertEqual(first.json()['documents'], second.json()['documents'])
+
+    def test_upload_rejects_other_files(self):
+        response = self._upload(files={'files': ('notes.txt', b'not an image', 'text/plain')})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.env['ocr.document'].search([('image_filename', '=', 'notes.txt')]))
+
+
+    def test_upload_bad_priority(self):
+        batches = self.env['ocr.batch'].search([])
+        response = self._upload(data={'priority': 'urgent'}, files={'files': ('scan.png', self.image, 'image/png')})
+        self.assertEqual(response.status_code, 400, response.text)
+        self.assertEqual(response.json(), {'error': "'priority' must be a number."})
+        self.assertEqual(self.env['ocr.batch'].search([]), batches)
+
+    def test_results_bad_timeout(self):
+        batch = self.env['ocr.batch'].create({'name': 'Batch'})
+        self.env['ocr.document'].create({'name': 'Invoice', 'batch_id': batch.id})
+        for timeout in ('soon', 'nan', 'inf'):
+            response = self._results(f'batch={batch.id}&timeout={timeout}')
+            self.assertEqual(response.status_code, 400, response.text)
+            self.assertEqual(response.json(), {'error': "'timeout' must be a number."})
+
+    def test_results_inline_output(self):
+        batch = self.env['ocr.batch'].create({'name': 'Batch'})
+        document = self.env['ocr.document'].create({'name': 'Invoice', 'batch_id': batch.id, 'ocr_state': 'done'})
+        # Over several chunks of the encoding
+        content = os.urandom(500 * 1024)
+        handle, path = tempfile.mkstemp(prefix='ocr_test_', suffix='.csv')
+        with os.fdopen(handle, 'wb') as target:
+            target.write(content)
+        document._set_output_file(path, 'csv', 'text/csv')
+
+        response = self._results(f'batch={batch.id}&timeout=0&inline_output=1')
+        self.assertEqual(response.status_code, 200, response.text)
+        result, end = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual((result['document_id'], result['output_filename']), (document.id, 'Invoice_output.csv'))
+        self.assertEqual(base64.b64decode(result['output']), content)
+        self.assertEqual(end, {'complete': True, 'pending_document_ids': []})
@@ -0,0 +1,46 @@
+import base64
+import io
+import os
+import zipfile
+
+from odoo.tests import common
+
+from .common import make_png
+
+
+class TestOcrBatchImport(common.TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        ICP = self.env['ir.config_parameter'].sudo()
+        ICP.set_param('ocr.cache_enabled', 'False')
+        ICP.set_param('ocr.batch_max_file_mb', 1)
+
+    def _import(self, members):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, content in members.items():
+                archive.writestr(name, content)
+        wizard = self.env['ocr.batch.import'].create({
+            'name': 'Scans',
+            'zip_file': base64.b64encode(buffer.getvalue()),
+            'zip_filename': 'scans.zip',
+        })
+        action = wizard.action_import()
+        return self.env['ocr.batch'].browse(action['res_id'])
+
+    def test_import_archive(self):
+        first, second = make_png(), make_png(200, 100)
+        batch = self._import({
+            'page1.png': first,
+            'sub/page2.png': second,
+            'notes.txt': b'not an image',
+            'huge.tif': os.urandom(1024 * 1024 + 1),
+        })
+        documents = batch.document_ids.sorted('name')
+        self.assertEqual(documents.mapped('image_filename'), ['page1.png', 'page2.png'])
+        self.assertEqual(base64.b64decode(documents[0].image_file), first)
+        self.assertEqual(base64.b64decode(documents[1].image_file), second)
+        self.assertEqual(set(documents.mapped('ocr_state')), {'queued'})
+        self.assertIn('notes.txt: not an image or PDF', batch.skipped_files)
+        self.assertIn('huge.tif: larger than 1 MB', batch.skipped_files)
@@ -0,0 +1,65 @@
+import base64
+import os
+import tempfile
+
+from odoo.tests import common
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class TestOcrDocumentFiles(common.TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.document = self.env['ocr.document'].create({'name': 'Invoice'})
+
+    def _make_file(self, content, suffix='.xlsx'):
+        handle, path = tempfile.mkstemp(prefix='ocr_test_', suffix=suffix)
+        with os.fdopen(handle, 'wb') as target:
+            target.write(content)
+        self.addCleanup(lambda: os.path.exists(path) and os.unlink(path))
+        return path
+
+    def _check_output(self, content):
+        self.document._set_output_file(self._make_file(content), 'xlsx', XLSX_MIMETYPE)
+        attachment = self.document._get_output_attachment()
+        self.assertEqual(attachment.raw, content)
+        self.assertEqual(attachment.file_size, len(content))
+        self.assertEqual(base64.b64decode(self.document.excel_file), content)
+        self.assertEqual(self.document.excel_filename, 'Invoice_output.xlsx')
+
+    def test_set_output_file_filestore(self):
+        self.env['ir.config_parameter'].sudo().set_param('ir_attachment.location', 'file')
+        content = b'PK\x03\x04 generated sheet'
+        self._check_output(content)
+        attachment = self.document._get_output_attachment()
+        self.assertTrue(attachment.store_fname)
+        self.assertTrue(os.path.exists(attachment._full_path(attachment.store_fname)))
+
+    def test_set_output_file_database(self):
+        self.env['ir.config_parameter'].sudo().set_param('ir_attachment.location', 'db')
+        self._check_output(b'PK\x03\x04 generated sheet in the database')
+
+    def test_set_output_file_replaces_previous(self):
+        self._check_output(b'first run')
+        self._check_output(b'second run')
+        self.assertEqual(self.env['ir.attachment'].search_count([
+            ('res_model', '=', 'ocr.document'),
+            ('res_field', '=', 'excel_file'),
+            ('res_id', '=', self.document.id),
+        ]), 1)
+
+    def test_cells_confidence(self):
+        self.document._set_cells([
+            (0, 0, 0, 'Total', 80.0),
+            (0, 0, 1, '120', 90.0),
+            # Per-cell OCR and text pages do not report a confidence
+            (0, 1, 0, 'Tax', None),
+        ])
+        self.assertEqual(self.document._get_cells(), [
+            (0, 0, 0, 'Total', 80.0), (0, 0, 1, '120', 90.0), (0, 1, 0, 'Tax', None),
+        ])
+        # Left out of the average rather than counted as 0
+        [group] = self.env['ocr.document.cell']._read_group(
+            [('document_id', '=', self.document.id)], aggregates=['confidence:avg'])
+        self.assertEqual(group, (85.0,))
@@ -0,0 +1,190 @@
+import os
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import common
+
+from .common import make_png
+from ..models import ocr_job
+
+
+class DeadPool:
+    """Stands in for the executor of a pool one of whose processes died.
+
+    ``count_pages`` answers with ``page_count`` when given, as when the
+    worker dies on a page task; otherwise every call fails.
+    """
+
+    def __init__(self, page_count=None):
+        self.page_count = page_count
+
+    def call(self, name, *args):
+        if name == 'count_pages' and self.page_count:
+            return self.page_count
+        raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+
+    def submit(self, name, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool("A process in the process pool was terminated abruptly"))
+        return future
+
+
+class HungPool:
+    """Stands in for a pool whose first page task never finishes, the next ones wait behind it"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def call(self, name, *args):
+        return 1
+
+    def submit(self, name, *args):
+        future = Future()
+        if not self.submitted:
+            future.set_running_or_notify_cancel()
+        self.submitted.append(future)
+        return future
+
+
+class TestOcrJobQueue(common.TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.Job = self.env['ocr.job']
+        # Only the jobs of the test are claimed
+        self.Job.search([('state', 'in', ('queued', 'running'))]).write({'state': 'done'})
+        self.documents = self.env['ocr.document'].create([{'name': f'Scan {index}'} for index in range(3)])
+
+    def test_enqueue(self):
+        jobs = self.Job._enqueue(self.documents, priority=5)
+        self.assertEqual(jobs.document_id, self.documents)
+        self.assertEqual(set(jobs.mapped('state')), {'queued'})
+        self.assertEqual(set(jobs.mapped('priority')), {5})
+        self.assertEqual(set(self.documents.mapped('ocr_state')), {'queued'})
+
+    def test_claim_jobs(self):
+        low = self.Job._enqueue(self.documents[:2], priority=20)
+        urgent = self.Job._enqueue(self.documents[2], priority=1)
+
+        claimed = self.Job._claim_jobs(2)
+        # By priority, then in the order they were queued
+        self.assertEqual(claimed, urgent | low[0])
+        self.assertEqual(set(claimed.mapped('state')), {'running'})
+        self.assertEqual(set(claimed.mapped('attempts')), {1})
+        self.assertTrue(all(claimed.mapped('date_started')))
+        self.assertEqual(set(claimed.document_id.mapped('ocr_state')), {'running'})
+
+        self.assertEqual(self.Job._claim_jobs(2), low[1])
+        self.assertFalse(self.Job._claim_jobs(2))
+
+    def test_mark_failed_retries(self):
+        self.env['ir.config_parameter'].sudo().set_param('ocr.job_retry_base', 60)
+        job = self.Job._enqueue(self.documents[0])
+        self.assertFalse(job.next_attempt)
+        self.Job._claim_jobs(1)
+        before = fields.Datetime.now()
+        job._mark_failed("tesseract crashed", max_attempts=2)
+        self.assertEqual((job.state, job.document_id.ocr_state), ('queued', 'queued'))
+        # Not claimed again right away, by the same runner loop
+        self.assertGreaterEqual(job.next_attempt, before + timedelta(seconds=60))
+        self.assertLessEqual(job.next_attempt, before + timedelta(seconds=76))
+        self.assertFalse(self.Job._claim_jobs(1))
+
+        job.next_attempt = fields.Datetime.now() - timedelta(seconds=1)
+        self.assertEqual(self.Job._claim_jobs(1), job)
+        job._mark_failed("tesseract crashed", max_attempts=2)
+        self.assertEqual((job.state, job.document_id.ocr_state), ('failed', 'failed'))
+        self.assertEqual(job.error, "tesseract crashed")
+        self.assertFalse(self.Job._claim_jobs(1))
+
+    def test_retry_backoff(self):
+        self.env['ir.config_parameter'].sudo().set_param('ocr.job_retry_base', 60)
+        self.env['ir.config_parameter'].sudo().set_param('ocr.job_retry_max', 200)
+        job = self.Job._enqueue(self.documents[0])
+        for attempts, delay in ((1, 60), (2, 120), (3, 200), (4, 200)):
+            job.attempts = attempts
+            before = fields.Datetime.now()
+            job._mark_failed("tesseract crashed", max_attempts=10)
+            self.assertGreaterEqual(job.next_attempt, before + timedelta(seconds=delay))
+            self.assertLessEqual(job.next_attempt, before + timedelta(seconds=delay * 1.25 + 1))
+
+        job.write({'state': 'failed', 'attempts': 10})
+        job.action_requeue()
+        self.assertFalse(job.next_attempt)
+        self.assertEqual(self.Job._claim_jobs(1), job)
+
+    def test_requeue_stale_jobs(self):
+        job = self.Job._enqueue(self.documents[0])
+        self.Job._claim_jobs(1)
+        self.assertFalse(self.Job._requeue_stale_jobs(timeout=600))
+        job.date_started = fields.Datetime.now() - timedelta(hours=1)
+        self.assertEqual(self.Job._requeue_stale_jobs(timeout=600), job)
+        self.assertEqual(job.state, 'queued')
+
+    def _run_on_dead_pool(self, pool, **settings):
+        self.env['ir.config_parameter'].sudo().set_param('ocr.cache_enabled', 'False')
+        resets = []
+        self.patch(ocr_job, 'get_executor', lambda *args: pool)
+        self.patch(ocr_job, 'reset_executor', lambda: resets.append(True))
+        # The runner commits after each step, the test transaction must not
+        self.patch(self.env.cr, 'commit', lambda: None)
+        jobs = self.Job._enqueue(self.documents)
+        claimed = self.Job._claim_jobs(10)
+        claimed._run_in_pool(dict(self.Job._get_queue_settings(), **settings))
+        return jobs, resets
+
+    def test_worker_died_counting_pages(self):
+        jobs, resets = self._run_on_dead_pool(DeadPool())
+        # The pool is recreated, every job of the batch is retried
+        self.assertEqual(resets, [True])
+        self.assertEqual(set(jobs.mapped('state')), {'queued'})
+        self.assertIn('OCR worker aborted', jobs[0].error)
+        self.assertEqual(set(self.documents.mapped('ocr_state')), {'queued'})
+
+    def test_worker_died_on_page(self):
+        jobs, resets = self._run_on_dead_pool(DeadPool(page_count=2))
+        self.assertEqual(resets, [True])
+        self.assertEqual(set(jobs.mapped('state')), {'queued'})
+        self.assertEqual(set(jobs.mapped('page_count')), {2})
+
+    def test_job_timeout(self):
+        pool = HungPool()
+        jobs, resets = self._run_on_dead_pool(pool, timeout=0)
+        # Only the job whose page started ran out of time
+        self.assertIn('did not finish within 0 seconds', jobs[0].error)
+        self.assertIn('OCR worker aborted', jobs[1].error)
+        # Its page cannot be cancelled: the pool processes are killed
+        self.assertEqual(resets, [True])
+        self.assertEqual(set(jobs.mapped('state')), {'queued'})
+        self.assertTrue(all(future.cancelled() for future in pool.submitted[1:]))
+
+
+class TestCreateFromFiles(common.TransactionCase):
+
+    def test_create_from_files(self):
+        batch = self.env['ocr.batch'].create({'name': 'Upload'})
+        contents = {'invoice.png': make_png(), 'receipt.png': make_png(80, 160)}
+        tmp_dir = tempfile.mkdtemp(prefix='ocr_test_')
+        self.addCleanup(os.rmdir, tmp_dir)
+        files = []
+        for filename, content in contents.items():
+            path = os.path.join(tmp_dir, filename)
+            with open(path, 'wb') as target:
+                target.write(content)
+            files.append((filename, path))
+
+        documents = self.env['ocr.document']._create_from_files(files, batch)
+        self.assertEqual(documents.mapped('name'), ['invoice', 'receipt'])
+        self.assertEqual(documents.batch_id, batch)
+        for document in documents:
+            image = document._get_image_source()
+            if isinstance(image, str):
+                with open(image, 'rb') as image_file:
+                    image = image_file.read()
+            self.assertEqual(image, contents[document.image_filename])
+            self.assertTrue(document.with_context(bin_size=True).image_file)
+        # The files were moved into the attachment store, not copied
+        self.assertFalse(os.listdir(tmp_dir))
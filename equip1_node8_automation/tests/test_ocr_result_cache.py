@@ -0,0 +1,56 @@
+import os
+import tempfile
+
+from odoo.tests import common
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class TestOcrResultCache(common.TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        # The counters are incremented through registry.cursor(): keep it
+        # in the transaction of the test
+        self.registry.enter_test_mode(self.cr)
+        self.addCleanup(self.registry.leave_test_mode)
+        self.Cache = self.env['ocr.result.cache']
+        self.Stats = self.env['ocr.result.cache.stats']
+
+    def _processed_document(self, content):
+        document = self.env['ocr.document'].create({'name': 'Delivery note', 'raw_text': 'Item\tQty'})
+        handle, path = tempfile.mkstemp(prefix='ocr_test_', suffix='.xlsx')
+        with os.fdopen(handle, 'wb') as target:
+            target.write(content)
+        self.addCleanup(lambda: os.path.exists(path) and os.unlink(path))
+        document._set_output_file(path, 'xlsx', XLSX_MIMETYPE)
+        return document
+
+    def test_counters(self):
+        hits, misses = self.Stats._get_counters()
+        key = self.Cache._compute_key(b'image bytes', {})
+        self.assertFalse(self.Cache._lookup(key))
+        # A miss which never stores a result is counted as well
+        self.assertFalse(self.Cache._lookup(key))
+        self.Cache._store(key, self._processed_document(b'sheet'))
+        self.assertTrue(self.Cache._lookup(key))
+        self.assertEqual(self.Stats._get_counters(), (hits + 1, misses + 2))
+
+        # Evicting the entry does not lose the lookups it served
+        self.env['ir.config_parameter'].sudo().set_param('ocr.cache_max_entries', 0)
+        self.Cache._evict()
+        self.assertFalse(self.Cache.search([('key', '=', key)]))
+        stats = self.Cache._get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (hits + 1, misses + 2))
+
+    def test_apply_keeps_output(self):
+        content = b'PK\x03\x04 cached sheet'
+        key = self.Cache._compute_key(b'other image bytes', {})
+        self.Cache._store(key, self._processed_document(content))
+
+        document = self.env['ocr.document'].create({'name': 'Same delivery note'})
+        self.Cache._lookup(key)._apply_to(document)
+        self.assertEqual(document.ocr_state, 'done')
+        self.assertEqual(document.raw_text, 'Item\tQty')
+        self.assertEqual(document._get_output_attachment().raw, content)
+        self.assertEqual(document.excel_filename, 'Same delivery note_output.xlsx')
@@ -0,0 +1 @@
+from . import ocr_batch_import
@@ -0,0 +1,111 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+import zlib
+
+from odoo import models, fields, _
+from odoo.exceptions import UserError
+
+IMPORT_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp', '.tif', '.tiff', '.pdf')
+
+
+class OcrBatchImport(models.TransientModel):
+    _name = 'ocr.batch.import'
+    _description = 'Import OCR Documents from a ZIP Archive'
+
+    name = fields.Char(string='Batch Name', required=True, default=lambda self: fields.Datetime.to_string(fields.Datetime.now()))
+    zip_file = fields.Binary(string='ZIP Archive', required=True, attachment=True)
+    zip_filename = fields.Char(string='ZIP Filename')
+
+    def _open_archive(self):
+        """Open the uploaded archive from the filestore, without loading it in memory."""
+        self.ensure_one()
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'zip_file'),
+            ('res_id', '=', self.id),
+        ], limit=1)
+        source = attachment._full_path(attachment.store_fname) if attachment.store_fname else io.BytesIO(attachment.raw)
+        try:
+            return zipfile.ZipFile(source)
+        except zipfile.BadZipFile:
+            raise UserError(_("The uploaded file is not a valid ZIP archive."))
+
+    @staticmethod
+    def _extract_member(archive, info, path, max_size):
+        """Stream a member of the archive to ``path``; its size, or None when over ``max_size``.
+
+        The size announced in the archive is not trusted, the bytes
+        actually extracted are counted.
+        """
+        size = 0
+        with archive.open(info) as member, open(path, 'wb') as target:
+            for chunk in iter(lambda: member.read(1024 * 1024), b''):
+                size += len(chunk)
+                if size > max_size:
+                    break
+                target.write(chunk)
+        if size > max_size:
+            os.unlink(path)
+            return None
+        return size
+
+    def action_import(self):
+        self.ensure_one()
+        ICP = self.env['ir.config_parameter'].sudo()
+        max_files = int(ICP.get_param('ocr.batch_max_files', 1000))
+        max_file_size = int(ICP.get_param('ocr.batch_max_file_mb', 50)) * 1024 * 1024
+        # Extracted members are attached in chunks of at most this much data
+        chunk_size = int(ICP.get_param('ocr.batch_chunk_mb', 64)) * 1024 * 1024
+
+        batch = self.env['ocr.batch'].create({'name': self.name})
+        skipped = []
+        documents = self.env['ocr.document']
+        tmp_dir = tempfile.mkdtemp(prefix='ocr_import_')
+        try:
+            with self._open_archive() as archive:
+                files = []
+                pending_size = 0
+                for index, info in enumerate(archive.infolist()):
+                    filename = os.path.basename(info.filename)
+                    if info.is_dir() or not filename or filename.startswith('.') or info.filename.startswith('__MACOSX/'):
+                        continue
+                    if not filename.lower().endswith(IMPORT_EXTENSIONS):
+                        skipped.append(f"{info.filename}: not an image or PDF")
+                        continue
+                    if len(documents) + len(files) >= max_files:
+                        skipped.append(f"{info.filename}: more than {max_files} files in the archive")
+                        continue
+
+                    path = os.path.join(tmp_dir, f"{index}_{filename}")
+                    try:
+                        size = self._extract_member(archive, info, path, max_file_size)
+                    except (zipfile.BadZipFile, zlib.error, EOFError) as e:
+                        skipped.append(f"{info.filename}: cannot be extracted ({e})")
+                        continue
+                    if size is None:
+                        skipped.append(f"{info.filename}: larger than {max_file_size // (1024 * 1024)} MB")
+                        continue
+                    files.append((filename, path))
+                    pending_size += size
+                    if pending_size >= chunk_size:
+                        documents |= documents._create_from_files(files, batch)
+                        files, pending_size = [], 0
+                if files:
+                    documents |= documents._create_from_files(files, batch)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        batch.skipped_files = '\n'.join(skipped)
+        if not documents:
+            raise UserError(_("The archive does not contain any image or PDF file to process."))
+
+        documents.with_context(ocr_job_priority=20).action_process_document()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'ocr.batch',
+            'res_id': batch.id,
+            'view_mode': 'form',
+        }
@@ -21,9 +21,12 @@ Long description of module's purpose
 
     # always loaded
     'data': [
-        # 'security/ir.model.access.csv',
+        'security/ir.model.access.csv',
+        'data/ir_cron.xml',
         # 'views/purchase_order_views.xml',
         'views/res_config_settings.xml',
+        'views/telegram_outbox_views.xml',
+        'views/telegram_update_views.xml',
     ],
     # only loaded in demonstration mode
     'demo': [
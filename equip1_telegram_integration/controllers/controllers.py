@@ -1,6 +1,6 @@
+import hmac
 import json
 import logging
-import requests
 from odoo import http
 from odoo.http import request
 
@@ -9,72 +9,22 @@ _logger = logging.getLogger(__name__)
 class TelegramWebhookController(http.Controller):
     @http.route('/telegram/po/webhook', type='json', auth='public', methods=['POST'], csrf=False)
     def telegram_webhook(self, **kwargs):
-        data = json.loads(request.httprequest.data)
-        print("Menerima webhook dari telegram: %s", data)
-
-        if 'callback_query' in data:
-            callback_data = data['callback_query']['data']
-            chat_id = data['callback_query']['message']['chat']['id']
-            message_id = data['callback_query']['message']['message_id']
-
-            try:
-                action, record_id = callback_data.split('_',2)[1:]
-                record_id = int(record_id)
-
-                PurchaseOrder = request.env['purchase.order'].sudo().browse(record_id)
-                if not PurchaseOrder.exists():
-                    self._answer_telegram_callback(chat_id, "PO tidak di temukan")
-                    return
-
-                if action == 'approve':
-                    PurchaseOrder.button_approve()
-                    # pastikan perubahan tersimpan sebelum memanggil API Telegram
-                    request.env.cr.commit()
-                    final_text = f"✅ PO {PurchaseOrder.name} telah disetujui."
-                elif action == 'reject':
-                    try:
-                        PurchaseOrder.button_cancel()
-                        request.env.cr.commit()
-                        final_text = f"❌ PO {PurchaseOrder.name} telah ditolak."
-                    except Exception as cancel_err:
-                        _logger.exception("Gagal membatalkan PO %s: %s", PurchaseOrder.name, cancel_err)
-                        # Jika batal gagal (contoh: ada vendor bill yang belum dibatalkan)
-                        final_text = (
-                            f"⚠️ Gagal menolak PO {PurchaseOrder.name}.\n"
-                            f"Alasan: {str(cancel_err)}"
-                        )
-                else:
-                    final_text = "Tindakan tidak dikenali."
-                self._update_telegram_message(chat_id, message_id, final_text)
-            except Exception as e:
-                _logger.error("Gagal memproses callback query: %s", e)
-                self._answer_telegram_callback(chat_id, "Gagal memproses callback query")
+        """Menyimpan update lalu langsung menjawab Telegram.
+
+        Persetujuan PO dan balasan ke Telegram dikerjakan oleh cron
+        (telegram.update), agar webhook tidak timeout dan dikirim ulang
+        oleh Telegram ketika alur PO lambat.
+        """
+        secret = request.env['ir.config_parameter'].sudo().get_param('telegram.webhook_secret')
+        received = request.httprequest.headers.get('X-Telegram-Bot-Api-Secret-Token') or ''
+        if secret and not hmac.compare_digest(received, secret):
+            _logger.warning("Webhook Telegram dengan secret token yang salah dari %s", request.httprequest.remote_addr)
+            return 'OK'
+
+        try:
+            data = json.loads(request.httprequest.data)
+        except ValueError:
+            return 'OK'
+        _logger.debug("Menerima webhook dari telegram: %s", data)
+        request.env['telegram.update']._receive(data)
         return 'OK'
-
-    def _get_bot_token(self):
-        return request.env['ir.config_parameter'].sudo().get_param('telegram.po_bot_token')
-
-    def _answer_telegram_callback(self, chat_id, text):
-        bot_token = self._get_bot_token()
-        if not bot_token: return
-
-        api_url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        payload = {
-            'chat_id': chat_id,
-            'text': text,
-        }
-        requests.post(api_url, json=payload, timeout=5)
-
-    def _update_telegram_message(self, chat_id, message_id, text):
-        """Mengedit pesan asli untuk menghapus tombol dan menampilkan status."""
-        bot_token = self._get_bot_token()
-        if not bot_token: return
-
-        api_url = f"https://api.telegram.org/bot{bot_token}/editMessageText"
-        payload = {
-            'chat_id': chat_id,
-            'message_id': message_id,
-            'text': text,
-            'reply_markup': json.dumps({})  # Menghapus keyboard
-        }
-        requests.post(api_url, json=payload, timeout=5)
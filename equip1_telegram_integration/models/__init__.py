@@ -1,2 +1,4 @@
 from . import res_config_settings
 from . import purchase_order
+from . import telegram_outbox
+from . import telegram_update
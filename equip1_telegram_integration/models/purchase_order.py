@@ -1,29 +1,113 @@
-import requests
+from collections import defaultdict
+
 from odoo import models, fields, api, _
+from odoo.tools import split_every, str2bool
 import json
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# PO per pesan digest; 2 tombol per PO, di bawah batas keyboard Telegram
+DIGEST_PAGE_SIZE = 20
+# Telegram menolak inline keyboard dengan lebih dari 100 tombol
+MAX_DIGEST_PAGE_SIZE = 50
+
+
+def _escape_markdown(text):
+    """Escape karakter Markdown (legacy) Telegram, hanya berlaku di luar entity"""
+    for char in ('_', '*', '`', '['):
+        text = text.replace(char, '\\' + char)
+    return text
+
+
 class PurchaseOrder(models.Model):
     _inherit = 'purchase.order'
 
     telegram_approval_sent = fields.Boolean('Telegram Approval Sent', default=False, copy=False)
+    # "<chat_id>:<message_id>" pesan digest tempat PO ini menunggu persetujuan
+    telegram_digest_ref = fields.Char('Telegram Digest Message', copy=False, index=True, readonly=True)
 
     def button_confirm(self):
         res = super(PurchaseOrder, self).button_confirm()
+        ICP = self.env['ir.config_parameter'].sudo()
+        if len(self) > 1 and str2bool(ICP.get_param('telegram.po_digest_mode', 'False')):
+            self._send_telegram_approval_digest()
+            return res
         for order in self:
-            print("ini adalah button confirm")
+            _logger.debug("PO %s dikonfirmasi, meminta persetujuan lewat Telegram", order.name)
             order._send_telegram_approval_request()
         return res
 
+    def _get_telegram_approver_chat_id(self):
+        """Chat Telegram yang menyetujui PO ini"""
+        self.ensure_one()
+        return self.env['ir.config_parameter'].sudo().get_param('telegram.po_manager_chat_id')
+
+    def _send_telegram_approval_digest(self):
+        """Satu pesan ringkasan per halaman PO untuk setiap chat penyetuju.
+
+        Dipakai saat banyak PO dikonfirmasi sekaligus (akhir bulan): ratusan
+        PO menjadi beberapa pesan, masing-masing dengan tombol setujui/tolak
+        per baris.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        if not ICP.get_param('telegram.po_bot_token'):
+            _logger.warning("Token bot Telegram belum dikonfigurasi, digest PO tidak dikirim")
+            return
+        try:
+            page_size = int(ICP.get_param('telegram.po_digest_page_size', DIGEST_PAGE_SIZE))
+        except ValueError:
+            _logger.warning("telegram.po_digest_page_size bukan angka, memakai %s", DIGEST_PAGE_SIZE)
+            page_size = DIGEST_PAGE_SIZE
+        page_size = min(max(1, page_size), MAX_DIGEST_PAGE_SIZE)
+
+        # Dibaca sekaligus untuk semua PO, bukan satu query per baris pesan
+        self.fetch(['name', 'partner_id', 'amount_total', 'currency_id'])
+        self.partner_id.fetch(['name'])
+        self.currency_id.fetch(['symbol'])
+
+        order_ids_by_chat = defaultdict(list)
+        for order in self:
+            chat_id = order._get_telegram_approver_chat_id()
+            if chat_id:
+                order_ids_by_chat[chat_id].append(order.id)
+
+        Outbox = self.env['telegram.outbox']
+        for chat_id, order_ids in order_ids_by_chat.items():
+            pages = list(split_every(page_size, order_ids))
+            for page_number, page_ids in enumerate(pages, 1):
+                orders = self.browse(page_ids)
+                lines = [
+                    f"{index}. {_escape_markdown(order.name)} — {_escape_markdown(order.partner_id.name or '')} — "
+                    f"{order.amount_total:,.2f} {_escape_markdown(order.currency_id.symbol or '')}"
+                    for index, order in enumerate(orders, (page_number - 1) * page_size + 1)
+                ]
+                message = (
+                    f"🔔 *Permintaan Persetujuan PO* ({page_number}/{len(pages)})\n\n"
+                    + "\n".join(lines)
+                    + f"\n\nTotal {len(order_ids)} PO. Mohon tinjau dan berikan persetujuan Anda."
+                )
+                keyboard = {'inline_keyboard': orders._get_telegram_digest_keyboard()}
+                Outbox._enqueue('sendMessage', {
+                    'chat_id': chat_id,
+                    'text': message,
+                    'parse_mode': 'Markdown',
+                    'reply_markup': json.dumps(keyboard)
+                }, record=orders)
+
+    def _get_telegram_digest_keyboard(self):
+        """Satu baris tombol setujui/tolak per PO"""
+        return [[
+            {'text': f'✅ {order.name}', 'callback_data': f'po_approve_{order.id}'},
+            {'text': f'❌ {order.name}', 'callback_data': f'po_reject_{order.id}'}
+        ] for order in self]
+
     def _send_telegram_approval_request(self):
         self.ensure_one()
         ICP = self.env['ir.config_parameter'].sudo()
-        bot_token = ICP.get_param('telegram.po_bot_token')
-        chat_id = ICP.get_param('telegram.po_manager_chat_id')
-        if not bot_token or not chat_id:
-            print('Telegram PO bot token or chat ID not configured')
+        chat_id = self._get_telegram_approver_chat_id()
+        if not ICP.get_param('telegram.po_bot_token') or not chat_id:
+            _logger.warning("Token bot atau chat ID Telegram PO belum dikonfigurasi, PO %s tidak dikirim", self.name)
             return
 
         message = (
@@ -41,7 +125,6 @@ class PurchaseOrder(models.Model):
             ]]
         }
 
-        api_url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
         payload = {
             'chat_id': chat_id,
             'text': message,
@@ -49,10 +132,15 @@ class PurchaseOrder(models.Model):
             'reply_markup': json.dumps(keyboard)
         }
 
-        try:
-            response = requests.post(api_url, json=payload, timeout=10)
-            response.raise_for_status()
-            self.write({'telegram_approval_sent': True})
-            print(f"Permintaan persetujuan untuk PO {self.name} terkirim ke Telegram.")
-        except requests.exceptions.RequestException as e:
-            print(f"Gagal mengirim permintaan persetujuan PO {self.name}: {e}")
\ No newline at end of file
+        # dikirim oleh cron setelah commit, konfirmasi PO tidak menunggu Telegram
+        self.env['telegram.outbox']._enqueue('sendMessage', payload, record=self)
+
+    def _telegram_outbox_sent(self, outbox, result):
+        """Dipanggil oleh dispatcher outbox setelah pesan terkirim"""
+        values = {'telegram_approval_sent': True}
+        message_id = (result or {}).get('message_id')
+        if outbox.res_ids and message_id:
+            # Tombol digest disusun ulang dari PO-nya saat salah satunya diproses
+            values['telegram_digest_ref'] = f"{outbox.payload['chat_id']}:{message_id}"
+        self.write(values)
+        _logger.info("Permintaan persetujuan untuk PO %s terkirim ke Telegram.", ', '.join(self.mapped('name')))
@@ -5,4 +5,7 @@ class ResConfigSettings(models.TransientModel):
 
     telegram_bot_token = fields.Char(string='Telegram Bot Token', config_parameter='telegram.po_bot_token')
     telegram_manager_chat_id = fields.Char(string='Manager Chat ID', config_parameter='telegram.po_manager_chat_id')
-    telegram_webhook_url = fields.Char(string='Odoo Webhook URL', help="URL publik Odoo untuk menerima respon dari Telegram. Contoh: https://xxxx.ngrok.io", config_parameter='telegram.po_webhook_url')
\ No newline at end of file
+    telegram_webhook_url = fields.Char(string='Odoo Webhook URL', help="URL publik Odoo untuk menerima respon dari Telegram. Contoh: https://xxxx.ngrok.io", config_parameter='telegram.po_webhook_url')
+    telegram_api_base_url = fields.Char(string='Bot API URL', help="Alamat Bot API Telegram, kosongkan untuk https://api.telegram.org. Isi dengan server lokal untuk pengujian.", config_parameter='telegram.api_base_url')
+    telegram_webhook_secret = fields.Char(string='Webhook Secret Token', help="Secret token yang didaftarkan lewat setWebhook. Jika diisi, update tanpa header X-Telegram-Bot-Api-Secret-Token yang sama ditolak.", config_parameter='telegram.webhook_secret')
+    telegram_po_digest_mode = fields.Boolean(string='Digest Mode', help="Saat banyak PO dikonfirmasi sekaligus, kirim ringkasan per halaman dengan tombol per PO, bukan satu pesan per PO.", config_parameter='telegram.po_digest_mode')
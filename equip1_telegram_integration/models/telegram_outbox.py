@@ -0,0 +1,180 @@
+import logging
+import random
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+from ..telegram_client import TelegramError, get_client
+
+_logger = logging.getLogger(__name__)
+
+
+class TelegramOutbox(models.Model):
+    """Pesan Telegram yang menunggu dikirim.
+
+    Pesan ditulis dalam transaksi yang sama dengan perubahan yang
+    memicunya: jika transaksi di-rollback, pesannya ikut hilang dan tidak
+    pernah terkirim. Cron dispatcher mengirimnya setelah commit, dengan
+    retry dan backoff eksponensial.
+    """
+    _name = 'telegram.outbox'
+    _description = 'Telegram Outbox'
+    _order = 'id desc'
+
+    method = fields.Char(string='Bot API Method', required=True, readonly=True, default='sendMessage')
+    payload = fields.Json(string='Payload', readonly=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ], string='Status', default='pending', required=True, readonly=True, index=True)
+    attempts = fields.Integer(string='Attempts', default=0, readonly=True)
+    next_attempt = fields.Datetime(string='Next Attempt', default=fields.Datetime.now, readonly=True)
+    date_sent = fields.Datetime(string='Sent On', readonly=True)
+    last_error = fields.Text(string='Last Error', readonly=True)
+    res_model = fields.Char(string='Related Model', readonly=True)
+    res_id = fields.Many2oneReference(string='Related Record', model_field='res_model', readonly=True)
+    # Pesan yang mewakili beberapa record sekaligus (digest)
+    res_ids = fields.Json(string='Related Records', readonly=True)
+
+    def init(self):
+        # Dispatcher hanya mencari pesan pending yang sudah waktunya dikirim
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS telegram_outbox_pending_idx
+                ON telegram_outbox (next_attempt, id)
+             WHERE state = 'pending'
+        """)
+
+    @api.model
+    def _enqueue(self, method, payload, record=None):
+        """Antrekan satu panggilan Bot API, dikirim setelah transaksi di-commit.
+
+        ``record`` (satu atau beberapa record) diberi tahu lewat
+        ``_telegram_outbox_sent`` setelah pesannya terkirim.
+        """
+        values = {'method': method, 'payload': payload}
+        if record:
+            values['res_model'] = record._name
+            if len(record) == 1:
+                values['res_id'] = record.id
+            else:
+                values['res_ids'] = record.ids
+        message = self.sudo().create(values)
+        # Trigger ikut di-rollback bersama pesannya
+        self.env.ref('equip1_telegram_integration.ir_cron_dispatch_telegram_outbox').sudo()._trigger()
+        return message
+
+    @api.model
+    def _get_dispatch_settings(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        return {
+            'batch_size': max(1, int(ICP.get_param('telegram.outbox_batch_size', 20))),
+            'max_batches': max(1, int(ICP.get_param('telegram.outbox_max_batches', 50))),
+            'max_attempts': max(1, int(ICP.get_param('telegram.outbox_max_attempts', 8))),
+            'retry_base': float(ICP.get_param('telegram.outbox_retry_base', 10)),
+            'retry_max': float(ICP.get_param('telegram.outbox_retry_max', 3600)),
+        }
+
+    @api.model
+    def _cron_dispatch(self):
+        settings = self._get_dispatch_settings()
+        bot_token = self.env['ir.config_parameter'].sudo().get_param('telegram.po_bot_token')
+        if not bot_token:
+            _logger.warning("Token bot Telegram belum dikonfigurasi, outbox tidak dikirim")
+            return
+
+        client = get_client(self.env)
+        for _batch in range(settings['max_batches']):
+            messages = self._claim_batch(settings['batch_size'])
+            if not messages:
+                break
+            for message in messages:
+                message._dispatch(client, bot_token, settings)
+            # Melepas lock batch ini; yang sudah terkirim tidak dikirim ulang
+            self.env.cr.commit()
+        else:
+            # Masih ada antrean, lanjutkan di run berikutnya
+            self.env.ref('equip1_telegram_integration.ir_cron_dispatch_telegram_outbox').sudo()._trigger()
+            return
+
+        # Bangunkan cron tepat saat retry berikutnya jatuh tempo
+        next_message = self.search([('state', '=', 'pending')], order='next_attempt', limit=1)
+        if next_message:
+            self.env.ref('equip1_telegram_integration.ir_cron_dispatch_telegram_outbox').sudo()._trigger(
+                next_message.next_attempt)
+
+    @api.model
+    def _claim_batch(self, limit):
+        """Kunci pesan pending yang jatuh tempo.
+
+        ``SKIP LOCKED`` membuat beberapa dispatcher bisa berjalan bersamaan
+        tanpa mengirim pesan yang sama dua kali.
+        """
+        self.env.cr.execute("""
+            SELECT id FROM telegram_outbox
+             WHERE state = 'pending'
+               AND next_attempt <= (now() at time zone 'UTC')
+          ORDER BY next_attempt, id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, (limit,))
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _dispatch(self, client, bot_token, settings):
+        self.ensure_one()
+        try:
+            result = client.call(bot_token, self.method, self.payload)
+        except TelegramError as e:
+            if e.transient:
+                # Rate limit, gangguan jaringan atau di sisi Telegram: coba lagi nanti
+                return self._retry_later(str(e), settings, e.retry_after)
+            # Permintaan ditolak (4xx): mengulang tidak akan berhasil
+            _logger.error("Pesan Telegram %s ditolak: %s", self.id, e)
+            self.write({'state': 'failed', 'attempts': self.attempts + 1, 'last_error': str(e)})
+            return
+
+        self.write({
+            'state': 'sent',
+            'attempts': self.attempts + 1,
+            'date_sent': fields.Datetime.now(),
+            'last_error': False,
+        })
+        res_ids = self.res_ids or ([self.res_id] if self.res_id else [])
+        if self.res_model and res_ids:
+            records = self.env[self.res_model].browse(res_ids).exists()
+            if records and hasattr(records, '_telegram_outbox_sent'):
+                # Pesan sudah terkirim: kegagalan di sini tidak boleh
+                # mengembalikan status 'sent' dan mengirim pesannya lagi
+                try:
+                    with self.env.cr.savepoint():
+                        records._telegram_outbox_sent(self, result)
+                except Exception:
+                    _logger.exception("Gagal memproses pesan Telegram %s yang sudah terkirim", self.id)
+
+    def _retry_later(self, error, settings, retry_after=None):
+        attempts = self.attempts + 1
+        if attempts >= settings['max_attempts']:
+            _logger.error("Pesan Telegram %s gagal setelah %s percobaan: %s", self.id, attempts, error)
+            self.write({'state': 'failed', 'attempts': attempts, 'last_error': error})
+            return
+        delay = retry_after or min(settings['retry_base'] * 2 ** (attempts - 1), settings['retry_max'])
+        # Jitter agar pesan yang gagal bersamaan tidak dicoba ulang bersamaan
+        delay *= 1 + random.uniform(0, 0.25)
+        self.write({
+            'attempts': attempts,
+            'next_attempt': fields.Datetime.now() + timedelta(seconds=delay),
+            'last_error': error,
+        })
+
+    def action_retry(self):
+        self.filtered(lambda m: m.state == 'failed').write({
+            'state': 'pending',
+            'attempts': 0,
+            'next_attempt': fields.Datetime.now(),
+        })
+        self.env.ref('equip1_telegram_integration.ir_cron_dispatch_telegram_outbox').sudo()._trigger()
+
+    @api.autovacuum
+    def _gc_sent_messages(self):
+        days = int(self.env['ir.config_parameter'].sudo().get_param('telegram.outbox_keep_days', 30))
+        self.search([('state', '=', 'sent'), ('date_sent', '<', fields.Datetime.now() - timedelta(days=days))]).unlink()
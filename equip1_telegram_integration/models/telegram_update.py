@@ -0,0 +1,220 @@
+import json
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+CALLBACK_ACTIONS = ('approve', 'reject')
+# Status PO yang masih bisa disetujui atau ditolak dari Telegram
+PENDING_STATES = ('draft', 'sent', 'to approve')
+
+
+class BigInteger(fields.Integer):
+    """Integer yang disimpan sebagai bigint: update_id Telegram bisa melebihi 32 bit.
+
+    Kolom int4 yang sudah ada diubah ke int8 oleh ORM saat modul diupdate.
+    """
+    column_type = ('int8', 'int8')
+
+
+class TelegramUpdate(models.Model):
+    """Update dari webhook Telegram yang menunggu diproses.
+
+    Webhook hanya memvalidasi dan menyimpan update lalu langsung menjawab
+    Telegram; persetujuan PO dan balasan ke Telegram dikerjakan oleh cron,
+    di luar request webhook.
+    """
+    _name = 'telegram.update'
+    _description = 'Telegram Update'
+    _order = 'id desc'
+
+    update_id = BigInteger(string='Update ID', readonly=True)
+    callback_query_id = fields.Char(string='Callback Query ID', readonly=True)
+    payload = fields.Json(string='Payload', readonly=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='Status', default='pending', required=True, readonly=True, index=True)
+    date_done = fields.Datetime(string='Processed On', readonly=True)
+    error = fields.Text(string='Error', readonly=True)
+
+    _sql_constraints = [
+        ('update_id_unique', 'unique(update_id)', 'This Telegram update was already received.'),
+    ]
+
+    def init(self):
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS telegram_update_pending_idx
+                ON telegram_update (id)
+             WHERE state = 'pending'
+        """)
+        # Tombol yang sama bisa datang lagi dengan update_id lain
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS telegram_update_callback_query_id_idx
+                ON telegram_update (callback_query_id)
+             WHERE callback_query_id IS NOT NULL
+        """)
+
+    @api.model
+    def _parse_callback(self, update):
+        """``(action, id PO)`` dari callback_data ``po_<action>_<id>``, None jika bukan"""
+        callback_data = (update.get('callback_query') or {}).get('data') or ''
+        parts = callback_data.split('_', 2)
+        if len(parts) != 3 or parts[0] != 'po' or parts[1] not in CALLBACK_ACTIONS or not parts[2].isdigit():
+            return None
+        return parts[1], int(parts[2])
+
+    @api.model
+    def _receive(self, update):
+        """Simpan update yang valid untuk diproses cron; None jika diabaikan atau duplikat"""
+        if not isinstance(update, dict) or not isinstance(update.get('update_id'), int):
+            return None
+        callback = update.get('callback_query')
+        if not callback or not (callback.get('message') or {}).get('chat'):
+            # Hanya tombol persetujuan PO yang diproses
+            return None
+        # Telegram mengirim ulang update jika webhook lambat: update yang
+        # sudah pernah diterima dikenali lewat indeks unik, tanpa membaca PO
+        self.env.cr.execute("""
+            INSERT INTO telegram_update (update_id, callback_query_id, payload, state,
+                                         create_uid, create_date, write_uid, write_date)
+                 VALUES (%s, %s, %s, 'pending', %s, now() at time zone 'UTC', %s, now() at time zone 'UTC')
+            ON CONFLICT DO NOTHING
+              RETURNING id
+        """, (update['update_id'], callback.get('id'), json.dumps(update), self.env.uid, self.env.uid))
+        row = self.env.cr.fetchone()
+        if not row:
+            _logger.debug("Update Telegram %s sudah pernah diterima", update['update_id'])
+            return None
+        self.env.ref('equip1_telegram_integration.ir_cron_process_telegram_updates').sudo()._trigger()
+        return self.browse(row[0])
+
+    @api.model
+    def _cron_process(self, batch_size=50):
+        while True:
+            self.env.cr.execute("""
+                SELECT id FROM telegram_update
+                 WHERE state = 'pending'
+              ORDER BY id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+            """, (batch_size,))
+            updates = self.browse([row[0] for row in self.env.cr.fetchall()])
+            if not updates:
+                return
+            for update in updates:
+                try:
+                    with self.env.cr.savepoint():
+                        update._process()
+                except Exception as e:
+                    _logger.exception("Gagal memproses update Telegram %s", update.update_id)
+                    update._mark('failed', str(e))
+            # balasan ke Telegram ada di outbox, ikut ter-commit di sini
+            self.env.cr.commit()
+
+    def _process(self):
+        self.ensure_one()
+        callback = self.payload['callback_query']
+        chat_id = callback['message']['chat']['id']
+        message_id = callback['message']['message_id']
+        Outbox = self.env['telegram.outbox']
+
+        parsed = self._parse_callback(self.payload)
+        if not parsed:
+            final_text = "Tindakan tidak dikenali."
+            self._mark('done')
+        else:
+            action, order_id = parsed
+            order = self.env['purchase.order'].sudo().browse(order_id).exists()
+            if not order:
+                Outbox._enqueue('sendMessage', {'chat_id': chat_id, 'text': "PO tidak di temukan"})
+                self._mark('done')
+                return
+            if order.state not in PENDING_STATES:
+                # Tombol lama, atau ditekan lagi sebelum keyboard diperbarui
+                final_text = f"ℹ️ PO {order.name} sudah diproses sebelumnya."
+                self._mark('done')
+            else:
+                try:
+                    with self.env.cr.savepoint():
+                        if action == 'approve':
+                            order.button_approve()
+                            final_text = f"✅ PO {order.name} telah disetujui."
+                        else:
+                            order.button_cancel()
+                            final_text = f"❌ PO {order.name} telah ditolak."
+                    self._mark('done')
+                except Exception as e:
+                    _logger.exception("Gagal memproses %s PO %s: %s", action, order.name, e)
+                    # Jika batal gagal (contoh: ada vendor bill yang belum dibatalkan)
+                    final_text = (
+                        f"⚠️ Gagal {'menyetujui' if action == 'approve' else 'menolak'} PO {order.name}.\n"
+                        f"Alasan: {e}"
+                    )
+                    self._mark('failed', str(e))
+
+        digest = self._get_digest_orders(callback)
+        if digest:
+            # Pesan digest: tombolnya disusun ulang dari status PO saat ini,
+            # bukan dari keyboard yang dibawa callback (bisa sudah usang jika
+            # dua tombol ditekan berurutan). Teks digest tidak diubah, status
+            # tampil sebagai notifikasi.
+            pending = digest.filtered(lambda o: o.state in PENDING_STATES)
+            Outbox._enqueue('editMessageReplyMarkup', {
+                'chat_id': chat_id,
+                'message_id': message_id,
+                'reply_markup': json.dumps({'inline_keyboard': pending._get_telegram_digest_keyboard()}),
+            })
+            Outbox._enqueue('answerCallbackQuery', {
+                'callback_query_id': callback['id'],
+                'text': final_text,
+            })
+            return
+
+        # Mengedit pesan asli untuk menghapus tombol dan menampilkan status
+        Outbox._enqueue('editMessageText', {
+            'chat_id': chat_id,
+            'message_id': message_id,
+            'text': final_text,
+            'reply_markup': json.dumps({}),  # Menghapus keyboard
+        })
+
+    @api.model
+    def _get_digest_orders(self, callback):
+        """PO pesan digest tempat tombol ditekan, kosong untuk pesan satu PO"""
+        message = callback['message']
+        PurchaseOrder = self.env['purchase.order'].sudo()
+        orders = PurchaseOrder.search([
+            ('telegram_digest_ref', '=', f"{message['chat']['id']}:{message['message_id']}"),
+        ], order='id')
+        if orders:
+            return orders
+        # Digest yang terkirim sebelum referensinya disimpan: PO-nya dibaca
+        # dari keyboard, statusnya tetap dari database
+        keyboard = (message.get('reply_markup') or {}).get('inline_keyboard') or []
+        order_ids = list(dict.fromkeys(
+            parsed[1]
+            for row in keyboard
+            for button in row
+            if (parsed := self._parse_callback({'callback_query': {'data': button.get('callback_data')}}))
+        ))
+        return PurchaseOrder.browse(order_ids).exists() if len(order_ids) > 1 else PurchaseOrder
+
+    def _mark(self, state, error=False):
+        values = {'state': state, 'error': error, 'date_done': fields.Datetime.now()}
+        if state == 'done':
+            # Cukup update_id dan callback_query_id untuk mengenali duplikat
+            values['payload'] = False
+        self.write(values)
+
+    @api.autovacuum
+    def _gc_processed_updates(self):
+        # Telegram berhenti mengirim ulang sebuah update setelah 24 jam
+        hours = int(self.env['ir.config_parameter'].sudo().get_param('telegram.update_keep_hours', 48))
+        self.search([
+            ('state', '!=', 'pending'),
+            ('create_date', '<', fields.Datetime.now() - timedelta(hours=hours)),
+        ]).unlink()
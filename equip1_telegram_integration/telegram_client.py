@@ -0,0 +1,104 @@
+"""Klien HTTP Bot API Telegram, satu per proses worker.
+
+Semua panggilan ke Telegram memakai ``requests.Session`` yang sama sehingga
+koneksi TCP/TLS ke api.telegram.org dipakai ulang (keep-alive) alih-alih
+dibuka ulang di setiap panggilan. Alamat Bot API bisa diarahkan ke server
+pengganti lokal lewat parameter sistem ``telegram.api_base_url``.
+"""
+import logging
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = 'https://api.telegram.org'
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class TelegramError(Exception):
+    """Panggilan Bot API yang gagal.
+
+    ``status`` kosong untuk gangguan jaringan (timeout, koneksi putus).
+    """
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def transient(self):
+        """Apakah panggilan yang sama bisa berhasil jika diulang nanti"""
+        return self.status is None or self.status == 429 or self.status >= 500
+
+
+class TelegramClient:
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, connect_timeout=5.0, read_timeout=10.0, retries=2, pool_size=8):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        # Hanya mengulang kegagalan koneksi dan gateway: pesan yang sudah
+        # diterima Telegram (read timeout) tidak dikirim dua kali di sini
+        retry = Retry(
+            total=retries, connect=retries, read=0, status=retries,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({'POST'}),
+            backoff_factor=0.5,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def call(self, bot_token, method, payload, timeout=None):
+        """Panggil ``method`` Bot API dan kembalikan ``result``-nya"""
+        url = f"{self.base_url}/bot{bot_token}/{method}"
+        try:
+            response = self.session.post(url, json=payload, timeout=timeout or self.timeout)
+        except requests.exceptions.RequestException as e:
+            raise TelegramError(str(e)) from e
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        if response.ok and data.get('ok', True):
+            return data.get('result')
+        raise TelegramError(
+            f"HTTP {response.status_code}: {data.get('description') or response.text[:500]}",
+            status=response.status_code,
+            retry_after=(data.get('parameters') or {}).get('retry_after'),
+        )
+
+    def close(self):
+        self.session.close()
+
+
+def get_client(env):
+    """Klien bersama untuk proses ini, sesuai parameter sistem ``telegram.api_*``"""
+    ICP = env['ir.config_parameter'].sudo()
+    settings = (
+        ICP.get_param('telegram.api_base_url') or DEFAULT_BASE_URL,
+        float(ICP.get_param('telegram.api_connect_timeout', 5)),
+        float(ICP.get_param('telegram.api_read_timeout', 10)),
+        int(ICP.get_param('telegram.api_retries', 2)),
+        int(ICP.get_param('telegram.api_pool_size', 8)),
+    )
+    # Koneksi tidak boleh dibagi dengan proses hasil fork (prefork workers)
+    key = (os.getpid(), settings)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                # Pengaturan berubah atau proses hasil fork: klien lama
+                # dilepas tanpa ditutup, mungkin masih dipakai thread lain
+                _clients.clear()
+                client = _clients[key] = TelegramClient(*settings)
+    return client
@@ -0,0 +1,3 @@
+from . import test_purchase_order_digest
+from . import test_telegram_outbox
+from . import test_telegram_update
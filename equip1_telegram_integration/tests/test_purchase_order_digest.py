@@ -0,0 +1,55 @@
+import json
+
+from odoo.tests import common
+
+
+class TestPurchaseOrderDigest(common.TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        ICP = self.env['ir.config_parameter'].sudo()
+        ICP.set_param('telegram.po_bot_token', '123:test')
+        ICP.set_param('telegram.po_manager_chat_id', '4242')
+        ICP.set_param('telegram.po_digest_mode', 'True')
+        self.partner = self.env['res.partner'].create({'name': 'PT Sumber_Makmur'})
+        self.Outbox = self.env['telegram.outbox']
+
+    def _confirm(self, count):
+        orders = self.env['purchase.order'].create([{'partner_id': self.partner.id} for _i in range(count)])
+        existing = self.Outbox.search([])
+        orders.button_confirm()
+        return orders, self.Outbox.search([]) - existing
+
+    def test_digest_pages(self):
+        self.env['ir.config_parameter'].sudo().set_param('telegram.po_digest_page_size', 10)
+        orders, messages = self._confirm(25)
+        self.assertEqual(len(messages), 3)
+        self.assertEqual(set(messages.mapped('method')), {'sendMessage'})
+        buttons = [
+            button['callback_data']
+            for message in messages
+            for row in json.loads(message.payload['reply_markup'])['inline_keyboard']
+            for button in row
+        ]
+        self.assertCountEqual(buttons, [f'po_{action}_{order.id}' for order in orders for action in ('approve', 'reject')])
+        # The vendor name is escaped for Telegram Markdown
+        self.assertIn('PT Sumber\\_Makmur', messages[0].payload['text'])
+        self.assertCountEqual(sum((message.res_ids for message in messages), []), orders.ids)
+
+    def test_digest_page_size_capped(self):
+        self.env['ir.config_parameter'].sudo().set_param('telegram.po_digest_page_size', 80)
+        _orders, messages = self._confirm(60)
+        for message in messages:
+            keyboard = json.loads(message.payload['reply_markup'])['inline_keyboard']
+            self.assertLessEqual(sum(len(row) for row in keyboard), 100)
+        self.assertEqual(len(messages), 2)
+
+    def test_digest_page_size_not_a_number(self):
+        self.env['ir.config_parameter'].sudo().set_param('telegram.po_digest_page_size', 'twenty')
+        _orders, messages = self._confirm(5)
+        self.assertEqual(len(messages), 1)
+
+    def test_single_order_without_digest(self):
+        orders, messages = self._confirm(1)
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages.res_id, orders.id)
@@ -0,0 +1,80 @@
+from odoo import fields
+from odoo.tests import common
+
+from ..telegram_client import TelegramError
+
+
+class FakeClient:
+    """Stands in for TelegramClient: answers every call with ``result`` or raises ``error``"""
+
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = []
+
+    def call(self, bot_token, method, payload, timeout=None):
+        self.calls.append((method, payload))
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class TestTelegramOutbox(common.TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.Outbox = self.env['telegram.outbox']
+        self.settings = self.Outbox._get_dispatch_settings()
+        self.order = self.env['purchase.order'].create({
+            'partner_id': self.env['res.partner'].create({'name': 'Vendor'}).id,
+        })
+        self.message = self.Outbox._enqueue('sendMessage', {'chat_id': '4242', 'text': 'PO'}, record=self.order)
+        # Due for the dispatcher, whose now() is the start of the test transaction
+        self.message.next_attempt = fields.Datetime.subtract(fields.Datetime.now(), days=1)
+
+    def test_enqueue(self):
+        self.assertEqual(self.message.state, 'pending')
+        self.assertEqual((self.message.res_model, self.message.res_id), ('purchase.order', self.order.id))
+        self.assertIn(self.message, self.Outbox._claim_batch(100))
+
+    def test_dispatch_sent(self):
+        client = FakeClient(result={'message_id': 7})
+        self.message._dispatch(client, '123:test', self.settings)
+        self.assertEqual(client.calls, [('sendMessage', {'chat_id': '4242', 'text': 'PO'})])
+        self.assertEqual(self.message.state, 'sent')
+        self.assertEqual(self.message.attempts, 1)
+        self.assertTrue(self.order.telegram_approval_sent)
+        self.assertNotIn(self.message, self.Outbox._claim_batch(100))
+
+    def test_dispatch_rejected(self):
+        self.message._dispatch(FakeClient(error=TelegramError("HTTP 400: chat not found", status=400)), '123:test', self.settings)
+        self.assertEqual(self.message.state, 'failed')
+        self.assertIn('chat not found', self.message.last_error)
+        self.assertFalse(self.order.telegram_approval_sent)
+
+    def test_dispatch_retried(self):
+        self.message._dispatch(FakeClient(error=TelegramError("HTTP 429", status=429, retry_after=30)), '123:test', self.settings)
+        self.assertEqual(self.message.state, 'pending')
+        self.assertEqual(self.message.attempts, 1)
+        self.assertGreaterEqual(self.message.next_attempt, fields.Datetime.now())
+        # Not due before retry_after
+        self.assertNotIn(self.message, self.Outbox._claim_batch(100))
+
+    def test_dispatch_gives_up(self):
+        self.message.attempts = self.settings['max_attempts'] - 1
+        self.message._dispatch(FakeClient(error=TelegramError("timed out")), '123:test', self.settings)
+        self.assertEqual(self.message.state, 'failed')
+
+    def test_dispatch_hook_failure_keeps_sent(self):
+        PurchaseOrder = type(self.order)
+
+        def broken_hook(records, outbox, result):
+            records.write({'telegram_approval_sent': True})
+            raise ValueError("broken hook")
+
+        self.patch(PurchaseOrder, '_telegram_outbox_sent', broken_hook)
+        with self.assertLogs('odoo.addons.equip1_telegram_integration.models.telegram_outbox', level='ERROR'):
+            self.message._dispatch(FakeClient(result={'message_id': 7}), '123:test', self.settings)
+        self.assertEqual(self.message.state, 'sent')
+        # The writes of the failed hook were rolled back with its savepoint
+        self.assertFalse(self.order.telegram_approval_sent)
@@ -0,0 +1,122 @@
+import json
+
+from odoo.tests import common
+
+
+class TestTelegramUpdate(common.TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.Update = self.env['telegram.update']
+        self.Outbox = self.env['telegram.outbox']
+        self.order = self.env['purchase.order'].create({
+            'partner_id': self.env['res.partner'].create({'name': 'Vendor'}).id,
+        })
+
+    def _update(self, update_id, action='approve', query_id=None, keyboard=None):
+        message = {'message_id': 7, 'chat': {'id': 4242}}
+        if keyboard:
+            message['reply_markup'] = {'inline_keyboard': keyboard}
+        return {
+            'update_id': update_id,
+            'callback_query': {
+                'id': query_id or f'query-{update_id}',
+                'data': f'po_{action}_{self.order.id}',
+                'message': message,
+            },
+        }
+
+    def _process(self, update):
+        existing = self.Outbox.search([])
+        record = self.Update._receive(update)
+        record._process()
+        return record, self.Outbox.search([]) - existing
+
+    def test_receive_duplicates(self):
+        update = self.Update._receive(self._update(1001))
+        self.assertEqual((update.update_id, update.callback_query_id, update.state), (1001, 'query-1001', 'pending'))
+        # Resent by Telegram with the same update_id
+        self.assertIsNone(self.Update._receive(self._update(1001)))
+        # The same button press delivered again under another update_id
+        self.assertIsNone(self.Update._receive(self._update(1002, query_id='query-1001')))
+        self.assertEqual(self.Update.search([('update_id', 'in', (1001, 1002))]), update)
+
+    def test_receive_big_update_id(self):
+        update = self.Update._receive(self._update(2 ** 40 + 1))
+        self.assertEqual(update.update_id, 2 ** 40 + 1)
+        self.assertIsNone(self.Update._receive(self._update(2 ** 40 + 1)))
+
+    def test_receive_ignored(self):
+        self.assertIsNone(self.Update._receive({'update_id': 'nope'}))
+        self.assertIsNone(self.Update._receive(['not', 'an', 'update']))
+        self.assertIsNone(self.Update._receive({'update_id': 1003, 'message': {'text': 'hello'}}))
+        self.assertFalse(self.Update.search([('update_id', '=', 1003)]))
+
+    def test_process_approve(self):
+        update, messages = self._process(self._update(1004))
+        self.assertEqual(self.order.state, 'purchase')
+        self.assertEqual(update.state, 'done')
+        self.assertFalse(update.payload)
+        self.assertEqual(messages.method, 'editMessageText')
+        self.assertIn(self.order.name, messages.payload['text'])
+
+    def test_process_reject(self):
+        _update, messages = self._process(self._update(1005, action='reject'))
+        self.assertEqual(self.order.state, 'cancel')
+        self.assertEqual(messages.method, 'editMessageText')
+
+    def _digest(self, count=3):
+        """Orders of a digest message sent as message 7 of chat 4242"""
+        orders = self.order | self.env['purchase.order'].create([
+            {'partner_id': self.order.partner_id.id} for _i in range(count - 1)])
+        message = self.env['telegram.outbox']._enqueue('sendMessage', {'chat_id': 4242, 'text': 'Digest'}, record=orders)
+        orders._telegram_outbox_sent(message, {'message_id': 7})
+        return orders
+
+    def _markup(self, messages):
+        markup = messages.filtered(lambda m: m.method == 'editMessageReplyMarkup').payload['reply_markup']
+        return json.loads(markup)['inline_keyboard']
+
+    def test_process_digest(self):
+        orders = self._digest()
+        keyboard = orders._get_telegram_digest_keyboard()
+        _update, messages = self._process(self._update(1006, keyboard=keyboard))
+        # Only the row of the processed order is removed from the digest
+        self.assertEqual(sorted(messages.mapped('method')), ['answerCallbackQuery', 'editMessageReplyMarkup'])
+        self.assertEqual(self._markup(messages), keyboard[1:])
+        answer = messages.filtered(lambda m: m.method == 'answerCallbackQuery').payload
+        self.assertEqual(answer['callback_query_id'], 'query-1006')
+        self.assertIn(self.order.name, answer['text'])
+
+    def test_process_digest_taps_race(self):
+        orders = self._digest()
+        keyboard = orders._get_telegram_digest_keyboard()
+        self._process(self._update(1007, keyboard=keyboard))
+        # Tapped before the first edit reached Telegram: same keyboard
+        second = self._update(1008, keyboard=keyboard)
+        second['callback_query']['data'] = f'po_reject_{orders[1].id}'
+        _update, messages = self._process(second)
+        # The row of the first order does not come back
+        self.assertEqual(self._markup(messages), keyboard[2:])
+
+        # A tap on the stale row is answered, the order is not processed twice
+        _update, messages = self._process(self._update(1009, action='reject', keyboard=keyboard))
+        self.assertEqual(self.order.state, 'purchase')
+        answer = messages.filtered(lambda m: m.method == 'answerCallbackQuery').payload
+        self.assertIn('sudah diproses', answer['text'])
+        self.assertEqual(self._markup(messages), keyboard[2:])
+
+    def test_process_digest_last_row(self):
+        orders = self._digest(count=2)
+        orders[1].button_cancel()
+        _update, messages = self._process(self._update(1010, keyboard=orders._get_telegram_digest_keyboard()))
+        # The digest keeps its text, only its last buttons go away
+        self.assertEqual(sorted(messages.mapped('method')), ['answerCallbackQuery', 'editMessageReplyMarkup'])
+        self.assertEqual(self._markup(messages), [])
+
+    def test_process_already_processed(self):
+        self.order.button_cancel()
+        _update, messages = self._process(self._update(1011))
+        self.assertEqual(self.order.state, 'cancel')
+        self.assertEqual(messages.method, 'editMessageText')
+        self.assertIn('sudah diproses', messages.payload['text'])